@@ -0,0 +1,191 @@
+"""
+Admission control for expensive (LLM-backed) Flask endpoints.
+
+Each controller enforces a global concurrency limit and a per-client limit.
+Requests over the global limit wait in a bounded FIFO queue for at most
+max_queue_time seconds. Requests that cannot be admitted (queue full, client
+over its limit, or queue time exceeded) are rejected immediately with
+429 Too Many Requests and a Retry-After estimate, instead of piling up work
+that would only time out.
+
+The limits are kept in process memory. When an app runs as several worker
+processes (serve.py), each process gets its share of the configured limits
+so the total across workers stays at the configured values.
+"""
+
+import collections
+import contextlib
+import functools
+import math
+import threading
+import time
+
+from flask import request
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Concurrency limiter with a bounded wait queue.
+
+    Args:
+        name (str): Name used in stats and logs
+        max_concurrent (int): Requests allowed in flight at once
+        max_per_client (int): Requests one client may have in flight or queued
+        max_queue (int): Requests allowed to wait for a free slot
+        max_queue_time (float): Seconds a request may wait before it is rejected
+        workers (int): Worker processes sharing the limits; each process
+            enforces its share, and at least 1 of each
+    """
+
+    def __init__(self, name, max_concurrent, max_per_client, max_queue, max_queue_time, workers=1):
+        self.name = name
+        self.workers = max(1, workers)
+        self.max_concurrent = max(1, max_concurrent // self.workers)
+        self.max_per_client = max(1, max_per_client // self.workers)
+        self.max_queue = max(1, max_queue // self.workers)
+        self.max_queue_time = max_queue_time
+        self._condition = threading.Condition()
+        self._queue = collections.deque()
+        self._in_flight = 0
+        self._per_client = collections.Counter()
+        self._avg_service_time = 1.0
+        self._admitted = 0
+        self._rejected = collections.Counter()
+
+    def acquire(self, client_id):
+        """
+        Wait for a slot for client_id.
+
+        Raises:
+            AdmissionRejected: If the request cannot be admitted
+        """
+        with self._condition:
+            if self._per_client[client_id] >= self.max_per_client:
+                self._reject('client_limit')
+            if self._in_flight < self.max_concurrent and not self._queue:
+                self._admit(client_id)
+                return
+            if len(self._queue) >= self.max_queue:
+                self._reject('queue_full')
+
+            # Wait in FIFO order until this request reaches the head of the
+            # queue and a slot is free
+            ticket = object()
+            self._queue.append(ticket)
+            self._per_client[client_id] += 1
+            deadline = time.monotonic() + self.max_queue_time
+            try:
+                while not (self._queue[0] is ticket and self._in_flight < self.max_concurrent):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._reject('queue_timeout')
+                    self._condition.wait(remaining)
+            finally:
+                self._queue.remove(ticket)
+                self._decrement(client_id)
+                self._condition.notify_all()
+            self._admit(client_id)
+
+    def release(self, client_id, service_time=None):
+        """Free the slot held by client_id"""
+        with self._condition:
+            self._in_flight -= 1
+            self._decrement(client_id)
+            if service_time is not None:
+                # Exponentially weighted average, used for Retry-After estimates
+                self._avg_service_time = 0.8 * self._avg_service_time + 0.2 * service_time
+            self._condition.notify_all()
+
+    def _decrement(self, client_id):
+        self._per_client[client_id] -= 1
+        if self._per_client[client_id] <= 0:
+            del self._per_client[client_id]
+
+    def _admit(self, client_id):
+        self._in_flight += 1
+        self._per_client[client_id] += 1
+        self._admitted += 1
+
+    def _reject(self, reason):
+        self._rejected[reason] += 1
+        # Roughly how long until the current backlog has drained through the slots
+        backlog = self._in_flight + len(self._queue) + 1
+        retry_after = max(1, math.ceil(self._avg_service_time * backlog / self.max_concurrent))
+        raise AdmissionRejected(reason, retry_after)
+
+    def stats(self):
+        """Return current and cumulative admission counters"""
+        with self._condition:
+            return {
+                'name': self.name,
+                'in_flight': self._in_flight,
+                'queued': len(self._queue),
+                'clients': len(self._per_client),
+                # Limits below are this worker's share
+                'workers': self.workers,
+                'max_concurrent': self.max_concurrent,
+                'max_per_client': self.max_per_client,
+                'max_queue': self.max_queue,
+                'max_queue_time': self.max_queue_time,
+                'avg_service_time': round(self._avg_service_time, 3),
+                'admitted_total': self._admitted,
+                'rejected_total': dict(self._rejected)
+            }
+
+    @contextlib.contextmanager
+    def slot(self, client_id):
+        """
+        Hold a slot for client_id for the duration of a with block, for work
+        that is admitted piece by piece rather than per request.
+
+        Raises:
+            AdmissionRejected: If the work cannot be admitted
+        """
+        self.acquire(client_id)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(client_id, time.monotonic() - started)
+
+    def limit(self, on_reject):
+        """
+        Decorator for Flask views. on_reject(rejection) builds the response for a
+        rejected request; a Retry-After header is added to it.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                client_id = request.remote_addr or 'unknown'
+                try:
+                    self.acquire(client_id)
+                except AdmissionRejected as rejection:
+                    print(f"Admission '{self.name}' rejected request from {client_id}: {rejection.reason}")
+                    response = on_reject(rejection)
+                    response.status_code = 429
+                    response.headers['Retry-After'] = str(rejection.retry_after)
+                    return response
+                started = time.monotonic()
+                try:
+                    response = view(*args, **kwargs)
+                except BaseException:
+                    self.release(client_id, time.monotonic() - started)
+                    raise
+                if getattr(response, 'is_streamed', False):
+                    # A streamed body is generated after the view returns, so
+                    # the slot is held until the response has been sent
+                    response.call_on_close(lambda: self.release(client_id, time.monotonic() - started))
+                else:
+                    self.release(client_id, time.monotonic() - started)
+                return response
+            return wrapper
+        return decorator
@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+"""
+Regression benchmark for the generation pipeline.
+
+Runs generate_html_from_custom_fields() over the inputs of
+generation_corpus.json (versioned, in increasing size) against a
+deterministic local stand-in for the LLM and the options API, so runs are
+repeatable, free and need no network. For each input it records:
+- wall time of each stage and in total (stages are inclusive and summed over
+  threads, so nested and parallel stages add up to more than the total)
+- calls, prompt tokens and completion tokens of each LLM step (html, rows,
+  javascript); tokens are estimated the same way on every machine
+- size of the page, specs.json and script
+- fallbacks: the fallback script, and concurrent scripts discarded because
+  the page did not honour the field contract
+- structural checks: specs.json has exactly one entry per field line, and the
+  page and script pass the quality gates
+
+The results are compared with the stored baseline (bench_generation_baseline.json)
+and the run fails with exit status 1 when an input got slower, used more
+tokens, calls or fallbacks, produced larger output, or fails a check. All
+measurements but wall time are deterministic, so any growth counts; after an
+intended change, record a new baseline.
+
+The stand-in writes pages from the field lines in the prompt (names and
+controls as field_contract plans them), so what is measured is the pipeline's
+own prompts, parsing, checks and assembly, not a model. --latency adds a fixed
+delay to every LLM call to show the effect of the pipeline's parallelism.
+Timings are only comparable on the machine that recorded the baseline; use
+--ignore-time elsewhere.
+
+Usage:
+    python bench_generation.py                      # compare with the baseline
+    python bench_generation.py --update-baseline    # record a new baseline
+    python bench_generation.py --only survey_12 --runs 5
+    python bench_generation.py --concurrent         # with CONCURRENT_PIPELINE on
+"""
+
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from types import SimpleNamespace
+
+# Generation must not reuse earlier results, so the caches are off
+for cache_setting in ('FRAGMENT_CACHE', 'JS_CACHE', 'SHARED_CACHE', 'ROUTING_LOG'):
+    os.environ[cache_setting] = ''
+
+import field_contract
+import form_analyzer
+import generate_table
+import llm_client
+import model_router
+import page_optimizer
+import template_update
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CORPUS_PATH = os.path.join(ROOT, 'generation_corpus.json')
+BASELINE_PATH = os.path.join(ROOT, 'bench_generation_baseline.json')
+
+# Differences in wall time below this are noise, whatever the tolerance
+TIME_NOISE_SECONDS = 0.02
+
+TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+
+# (stage, module, function) timed during generation
+STAGES = [
+    ('specs', form_analyzer, 'derive_specs'),
+    ('quality_gate', model_router, 'check_generated_form'),
+    ('quality_gate', model_router, 'check_javascript'),
+    ('stitch', generate_table, 'stitch_chunked_form'),
+    ('javascript', generate_table, 'generate_javascript'),
+    ('javascript', generate_table, 'generate_contract_javascript'),
+    ('fallback_script', generate_table, 'generate_fallback_javascript'),
+    ('optimize', page_optimizer, 'optimize_page')
+]
+
+
+def estimate_tokens(text):
+    """Approximate token count: words and punctuation marks"""
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def _section(text, start, end):
+    # Text between two markers of a prompt, or "" if the start marker is missing
+    index = text.find(start)
+    if index == -1:
+        return ""
+    index += len(start)
+    stop = text.find(end, index)
+    return text[index:] if stop == -1 else text[index:stop]
+
+
+class StandInLLM:
+    """
+    Deterministic replacement for the OpenAI client. Answers the HTML, row and
+    JavaScript prompts with output that follows the prompt's field lines.
+
+    Args:
+        latency (float): Seconds every call takes
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        started = time.perf_counter()
+        prompt = "\n".join(message['content'] for message in messages)
+        if self.latency:
+            time.sleep(self.latency)
+        if messages[0]['role'] == 'system' and 'JavaScript' in messages[0]['content']:
+            kind, content = 'javascript', self.javascript(messages[-1]['content'])
+        elif messages[-1]['content'].startswith('Generate additional table rows'):
+            kind, content = 'rows', self.rows(messages[-1]['content'])
+        else:
+            kind, content = 'html', self.page(messages[-1]['content'])
+        usage = SimpleNamespace(prompt_tokens=estimate_tokens(prompt), completion_tokens=estimate_tokens(content))
+        with self._lock:
+            self.calls.append({
+                'kind': kind,
+                'model': model,
+                'prompt_tokens': usage.prompt_tokens,
+                'completion_tokens': usage.completion_tokens,
+                'seconds': time.perf_counter() - started
+            })
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+    @staticmethod
+    def _rows(contract):
+        return re.findall(r'<tr data-mo-ta=.*?</tr>', field_contract.contract_html(contract), flags=re.S)
+
+    def page(self, prompt):
+        lines = template_update.parse_field_lines(
+            _section(prompt, "containing the following default fields:\n", "\n\n- Also include") + "\n" +
+            _section(prompt, "even if the descriptions are brief):\n", "\n\n- A submit button")
+        )
+        title = _section(prompt, "(as an h1 element):\n", "\n").strip()
+        rows = "\n".join(self._rows(field_contract.plan_contract(lines)))
+        return f"""```html
+<!DOCTYPE html>
+<html lang="vi">
+<head>
+    <meta charset="UTF-8">
+    <title>{title}</title>
+    <style>
+        .form-container {{ max-width: 600px; margin: 0 auto; box-shadow: 0 10px 25px rgba(0,0,0,0.1); }}
+        td {{ padding: 10px; }}
+        input, select, textarea {{ width: 100%; padding: 12px; border-radius: 8px; }}
+    </style>
+</head>
+<body>
+    <div class="form-container">
+        <h1>{title}</h1>
+        <div id="loadingSpinner">Đang tải dữ liệu...</div>
+        <div id="messageDiv"></div>
+        <form id="mainForm">
+            <table>
+{rows}
+            </table>
+            <button type="submit">Gửi</button>
+        </form>
+    </div>
+</body>
+</html>
+```"""
+
+    def rows(self, prompt):
+        lines = template_update.parse_field_lines(_section(prompt, "descriptions are brief):\n", "\n\nThis is an existing row"))
+        existing = set(_section(prompt, "(do not reuse them):\n", "\n\n").split(", "))
+        contract = field_contract.plan_contract(lines)
+        for field in contract['fields']:
+            name, suffix = field['name'], 2
+            while name in existing:
+                name = f"{field['name']}_{suffix}"
+                suffix += 1
+            field['name'] = name
+            existing.add(name)
+        return "```html\n" + "\n".join(self._rows(contract)) + "\n```"
+
+    def javascript(self, prompt):
+        endpoint = _section(prompt, "\nAPI: ", "\n").strip()
+        names = re.findall(r'^- (\S+): \S+$', _section(prompt, "only part of it:\n", "\n\nAPI:"), flags=re.M)
+        fill = "\n".join(f"        setValue('{name}', data['{name}']);" for name in names)
+        return f"""```javascript
+document.addEventListener('DOMContentLoaded', function() {{
+    fetchDataFromAPI();
+    document.querySelector('form').addEventListener('submit', submitForm);
+}});
+
+async function fetchDataFromAPI() {{
+    const spinner = document.getElementById('loadingSpinner');
+    try {{
+        const response = await fetch('{endpoint}');
+        const result = await response.json();
+        const data = result.data || {{}};
+{fill}
+    }} catch (error) {{
+        showMessage('Không thể tải dữ liệu', 'error');
+    }} finally {{
+        spinner.style.display = 'none';
+    }}
+}}
+
+function setValue(name, value) {{
+    document.getElementsByName(name).forEach(function(input) {{
+        if (input.type === 'radio' || input.type === 'checkbox') {{
+            input.checked = String(input.value) === String(value) || value === true;
+        }} else if (value !== undefined) {{
+            input.value = value;
+        }}
+    }});
+}}
+
+function showMessage(text, type) {{
+    const messageDiv = document.getElementById('messageDiv');
+    messageDiv.textContent = text;
+    messageDiv.className = type;
+}}
+
+async function submitForm(event) {{
+    event.preventDefault();
+    const payload = Object.fromEntries(new FormData(event.target).entries());
+    const response = await fetch('{endpoint}/submit', {{
+        method: 'POST',
+        headers: {{ 'Content-Type': 'application/json' }},
+        body: JSON.stringify(payload)
+    }});
+    showMessage(response.ok ? 'Gửi thành công' : 'Gửi thất bại', response.ok ? 'success' : 'error');
+}}
+```"""
+
+
+class StageTimer:
+    """Wall time and calls per stage, summed over threads"""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def wrap(self, stage, function):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.seconds[stage] += time.perf_counter() - started
+                    self.calls[stage] += 1
+        return timed
+
+
+@contextlib.contextmanager
+def instrumented(timer, llm, option_sets, concurrent):
+    """Run generation against the stand-ins, with every stage timed"""
+    def fetch_option_sets(keys):
+        return {key: option_sets[key] for key in keys if key in option_sets}
+
+    patches = [(module, name, timer.wrap(stage, getattr(module, name))) for stage, module, name in STAGES]
+    patches += [
+        (generate_table, 'fetch_option_sets', timer.wrap('options', fetch_option_sets)),
+        (generate_table, 'CONCURRENT_PIPELINE', concurrent),
+        (llm_client, '_client', llm)
+    ]
+    originals = [(module, name, getattr(module, name)) for module, name, _ in patches]
+    for module, name, value in patches:
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for module, name, value in originals:
+            setattr(module, name, value)
+
+
+def structural_checks(result, field_lines, api_endpoint):
+    """
+    Check a generation against its inputs
+
+    Args:
+        result (dict): Return value of generate_html_from_custom_fields()
+        field_lines (list): Default and custom field definition lines
+        api_endpoint (str): Endpoint the script must fetch from
+
+    Returns:
+        tuple: ({check name: passed}, list of problems)
+    """
+    if not result:
+        return {'generated': False}, ["Generation failed"]
+    problems = []
+    try:
+        specs = json.loads(result['specs'])
+    except ValueError as e:
+        return {'generated': True, 'specs_parse': False}, [f"specs.json does not parse: {str(e)}"]
+
+    lines = list(dict.fromkeys(field_lines))
+    described = [entry.get('mo_ta') for entry in specs]
+    missing = [line for line in lines if line not in described]
+    unknown = [line for line in described if line not in lines]
+    problems += [f"No specs entry for: {line}" for line in missing]
+    problems += [f"specs entry for unknown line: {line}" for line in unknown]
+    if len(specs) != len(lines):
+        problems.append(f"{len(specs)} specs entries for {len(lines)} field lines")
+
+    scripts = re.findall(r'<script>(.*?)</script>', result['html'], flags=re.S)
+    form_problems = model_router.check_generated_form(result['html'], result['specs'], lines)
+    script_problems = model_router.check_javascript(scripts[-1] if scripts else "", api_endpoint)
+    problems += form_problems + script_problems
+    checks = {
+        'generated': True,
+        'specs_parse': True,
+        'specs_cover_inputs': not missing,
+        'specs_from_inputs': not unknown,
+        'one_spec_per_input': len(specs) == len(lines),
+        'form_gate': not form_problems,
+        'script_gate': not script_problems
+    }
+    return checks, problems
+
+
+def run_input(item, default_fields, option_sets, runs=3, latency=0.0, concurrent=False, verbose=False):
+    """
+    Generate one corpus input `runs` times
+
+    Args:
+        item (dict): Corpus input ('name', 'custom_fields')
+        default_fields (str): Content of default_field.txt
+        option_sets (dict): Options the stand-in options API returns
+        runs (int): Runs; wall times are the median
+        latency (float): Seconds every LLM call takes
+        concurrent (bool): Run with CONCURRENT_PIPELINE on
+        verbose (bool): Show the pipeline's own output
+
+    Returns:
+        dict: Measurements of the input
+    """
+    template_name = f"bench_{item['name']}"
+    field_lines = template_update.parse_field_lines(default_fields + "\n" + item['custom_fields'])
+    timings = defaultdict(list)
+    for _ in range(runs):
+        generate_table.generation_cache.clear()
+        timer = StageTimer()
+        llm = StandInLLM(latency)
+        output = sys.stdout if verbose else io.StringIO()
+        with instrumented(timer, llm, option_sets, concurrent), contextlib.redirect_stdout(output):
+            started = time.perf_counter()
+            result = generate_table.generate_html_from_custom_fields(item['custom_fields'], template_name)
+            timings['total'].append(time.perf_counter() - started)
+            api_endpoint = generate_table.build_api_endpoint(template_name)
+        for stage, seconds in timer.seconds.items():
+            timings[stage].append(seconds)
+        for call in llm.calls:
+            timings[f"llm_{call['kind']}"].append(call['seconds'])
+
+    llm_steps = {}
+    for call in llm.calls:
+        step = llm_steps.setdefault(call['kind'], {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0})
+        step['calls'] += 1
+        step['prompt_tokens'] += call['prompt_tokens']
+        step['completion_tokens'] += call['completion_tokens']
+
+    checks, problems = structural_checks(result, field_lines, api_endpoint)
+    scripts = re.findall(r'<script>(.*?)</script>', result['html'], flags=re.S) if result else []
+    return {
+        'fields': len(dict.fromkeys(field_lines)),
+        'seconds': {stage: round(statistics.median(values), 4) for stage, values in sorted(timings.items())},
+        'llm': llm_steps,
+        'tokens': {
+            'prompt': sum(step['prompt_tokens'] for step in llm_steps.values()),
+            'completion': sum(step['completion_tokens'] for step in llm_steps.values())
+        },
+        'bytes': {
+            'html': len(result['html'].encode('utf-8')) if result else 0,
+            'specs': len(result['specs'].encode('utf-8')) if result else 0,
+            'script': len(scripts[-1].encode('utf-8')) if scripts else 0
+        },
+        'fallbacks': {
+            'script': timer.calls['fallback_script'],
+            'contract': max(timer.calls['javascript'] - 1, 0)
+        },
+        'checks': checks,
+        'problems': problems
+    }
+
+
+def compare(results, baseline, time_tolerance=0.5, token_tolerance=0.0, size_tolerance=0.0):
+    """
+    Compare measurements with a baseline
+
+    Args:
+        results (dict): Measurements by input name
+        baseline (dict): Baseline measurements by input name
+        time_tolerance (float): Allowed relative growth of wall times (None skips them)
+        token_tolerance (float): Allowed relative growth of token counts
+        size_tolerance (float): Allowed relative growth of output sizes
+
+    Returns:
+        list: Regressions found, as messages
+    """
+    regressions = []
+    for name, current in results.items():
+        regressions += [f"{name}: check {check} fails" for check, passed in current['checks'].items() if not passed]
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+
+        def grew(label, now, before, tolerance, noise=0):
+            if now > before * (1 + tolerance) and now - before > noise:
+                regressions.append(f"{name}: {label} {before} -> {now}")
+
+        for key in ('prompt', 'completion'):
+            grew(f"{key} tokens", current['tokens'][key], previous['tokens'][key], token_tolerance)
+        for key, size in current['bytes'].items():
+            grew(f"{key} bytes", size, previous['bytes'].get(key, 0), size_tolerance)
+        grew("LLM calls", sum(step['calls'] for step in current['llm'].values()),
+             sum(step['calls'] for step in previous['llm'].values()), 0)
+        for key, count in current['fallbacks'].items():
+            grew(f"{key} fallbacks", count, previous['fallbacks'].get(key, 0), 0)
+        if time_tolerance is not None:
+            for stage, seconds in current['seconds'].items():
+                if stage in previous['seconds']:
+                    grew(f"{stage} seconds", seconds, previous['seconds'][stage], time_tolerance, TIME_NOISE_SECONDS)
+    return regressions
+
+
+def load_json(path, default=None):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def print_table(results):
+    print(f"{'input':<16} {'fields':>6} {'total ms':>9} {'prompt tok':>11} {'compl tok':>10} "
+          f"{'html bytes':>11} {'calls':>6} {'fallbacks':>9}  checks")
+    for name, result in results.items():
+        failed = [check for check, passed in result['checks'].items() if not passed]
+        print(f"{name:<16} {result['fields']:>6} {result['seconds']['total'] * 1000:>9.1f} "
+              f"{result['tokens']['prompt']:>11} {result['tokens']['completion']:>10} {result['bytes']['html']:>11} "
+              f"{sum(step['calls'] for step in result['llm'].values()):>6} {sum(result['fallbacks'].values()):>9}  "
+              f"{'ok' if not failed else 'FAILED: ' + ', '.join(failed)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regression benchmark for the generation pipeline")
+    parser.add_argument('--corpus', default=CORPUS_PATH, help="corpus file (default: %(default)s)")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="baseline file (default: %(default)s)")
+    parser.add_argument('--update-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('--only', nargs='+', help="run only these inputs")
+    parser.add_argument('--runs', type=int, default=3, help="runs per input; wall times are the median")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds every LLM call takes")
+    parser.add_argument('--concurrent', action='store_true', help="run with CONCURRENT_PIPELINE on")
+    parser.add_argument('--time-tolerance', type=float, default=0.5, help="allowed growth of wall times")
+    # Token counts and sizes are deterministic, so by default any growth is reported
+    parser.add_argument('--token-tolerance', type=float, default=0.0, help="allowed growth of token counts")
+    parser.add_argument('--size-tolerance', type=float, default=0.0, help="allowed growth of output sizes")
+    parser.add_argument('--ignore-time', action='store_true', help="do not compare wall times")
+    parser.add_argument('--output', help="also write the results to this JSON file")
+    parser.add_argument('--verbose', action='store_true', help="show the pipeline's output")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    corpus = load_json(args.corpus)
+    with open('default_field.txt', 'r') as f:
+        default_fields = f.read().strip()
+    pipeline = 'concurrent' if args.concurrent else 'sequential'
+    items = [item for item in corpus['inputs'] if not args.only or item['name'] in args.only]
+
+    print(f"Corpus version {corpus['version']}, {len(items)} input(s), {pipeline} pipeline, "
+          f"{args.runs} run(s), {args.latency}s LLM latency")
+    # The first generation in a process also pays for imports and compiling patterns
+    run_input(items[0], default_fields, corpus.get('option_sets', {}), 1)
+    results = {}
+    for item in items:
+        results[item['name']] = run_input(item, default_fields, corpus.get('option_sets', {}),
+                                          args.runs, args.latency, args.concurrent, args.verbose)
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    baseline = load_json(args.baseline, {})
+    recorded = baseline.get('pipelines', {}).get(pipeline)
+    if args.update_baseline:
+        # Inputs not run this time keep their baseline, unless the corpus or latency changed
+        if baseline.get('corpus_version') != corpus['version']:
+            baseline = {'corpus_version': corpus['version'], 'pipelines': {}}
+        inputs = recorded['inputs'] if recorded and recorded['latency'] == args.latency else {}
+        baseline['pipelines'][pipeline] = {'latency': args.latency, 'inputs': {**inputs, **results}}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline for the {pipeline} pipeline written to {args.baseline}")
+        recorded = None
+    elif recorded is None or baseline.get('corpus_version') != corpus['version']:
+        print(f"No baseline for corpus version {corpus['version']} and the {pipeline} pipeline; "
+              f"record one with --update-baseline")
+        recorded = None
+
+    # Wall times are only comparable at the same simulated latency
+    time_tolerance = None if args.ignore_time or (recorded and recorded['latency'] != args.latency) \
+        else args.time_tolerance
+    regressions = compare(results, recorded['inputs'] if recorded else {}, time_tolerance,
+                          args.token_tolerance, args.size_tolerance)
+    for name, result in results.items():
+        for problem in result['problems'][:5]:
+            print(f"  {name}: {problem}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s):")
+        for regression in regressions:
+            print(f"  {regression}")
+        raise SystemExit(1)
+    print("\nNo regressions" + (" against the baseline" if recorded else ""))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+JSON serialisation and compression benchmark for mock payloads.
+
+Builds /api/mock responses of 1, 100 and 10,000 records for a template (from
+the seeded stream generator, so no LLM is called) and reports:
+- serialisation time: Flask's previous default (stdlib json, ASCII-escaped,
+  sorted keys), stdlib without escaping, and json_backend (orjson if installed)
+- parse time: stdlib json.loads and json_backend.loads
+- bytes on the wire: escaped, UTF-8, gzip and (if installed) brotli, with the
+  compression time
+
+Usage:
+    python bench_json.py
+    python bench_json.py --template test1 --sizes 1 100 10000 --runs 5
+"""
+
+import argparse
+import json
+import time
+
+import compression
+import json_backend
+import mocking_be
+
+
+def best_time(func, runs):
+    # Best of `runs` timings, each repeating func enough to take at least ~20 ms
+    repeat = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= 0.02:
+            break
+        repeat *= 10
+    timings = [elapsed / repeat]
+    for _ in range(runs - 1):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        timings.append((time.perf_counter() - started) / repeat)
+    return min(timings)
+
+
+def build_payload(template_name, count):
+    with open(f'templates/{template_name}/specs.json', 'r', encoding='utf-8') as f:
+        specs = json.load(f)
+    records = [mocking_be.generate_seeded_mock_data(specs, template_name, 0, index) for index in range(count)]
+    return {'success': True, 'template': template_name, 'count': count, 'data': records, 'generated_by': 'llm'}
+
+
+def format_ms(seconds):
+    return f"{seconds * 1000:9.3f} ms"
+
+
+def bench(template_name, count, runs):
+    payload = build_payload(template_name, count)
+    escaped = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('ascii')
+    utf8 = json_backend.dumps_bytes(payload, sort_keys=True)
+
+    print(f"\n{count} record(s)")
+    print("  serialise")
+    print(f"    stdlib, escaped (before) {format_ms(best_time(lambda: json.dumps(payload, sort_keys=True, separators=(',', ':')), runs))}")
+    print(f"    stdlib, UTF-8            {format_ms(best_time(lambda: json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':')), runs))}")
+    print(f"    {json_backend.BACKEND + ', UTF-8':<24} {format_ms(best_time(lambda: json_backend.dumps_bytes(payload, sort_keys=True), runs))}")
+    print("  parse")
+    print(f"    stdlib                   {format_ms(best_time(lambda: json.loads(utf8), runs))}")
+    print(f"    {json_backend.BACKEND:<24} {format_ms(best_time(lambda: json_backend.loads(utf8), runs))}")
+    print("  bytes on the wire")
+    print(f"    escaped (before)         {len(escaped):>12,}")
+    print(f"    UTF-8                    {len(utf8):>12,}")
+    for encoding in compression.ENCODINGS:
+        compressed = compression.compress_bytes(utf8, encoding)
+        seconds = best_time(lambda: compression.compress_bytes(utf8, encoding), runs)
+        print(f"    {encoding:<24} {len(compressed):>12,}  ({format_ms(seconds).strip()} to compress)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON serialisation and compression of mock payloads")
+    parser.add_argument('--template', default='test1', help="Template whose specs shape the records")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 10000], help="Record counts")
+    parser.add_argument('--runs', type=int, default=5, help="Timing runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    print(f"JSON backend: {json_backend.BACKEND}; compression: {', '.join(compression.ENCODINGS)}")
+    for count in args.sizes:
+        bench(args.template, count, args.runs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the three entry points.
+
+For each of server.py, mocking_be.py and mocking_option_value.py this reports:
+- import time: a `python -X importtime` breakdown of the slowest imports
+- time to first request: wall time from starting a fresh process until the
+  app answers its first HTTP request
+
+Usage:
+    python bench_startup.py                 # all entry points, 3 runs each
+    python bench_startup.py --runs 5 --top 15
+    python bench_startup.py --preload       # with PRELOAD_CLIENTS=1, as a pre-fork master would
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Module, and a cheap URL that does not call the LLM
+ENTRY_POINTS = [
+    ('server', '/admission'),
+    ('mocking_be', '/api/health'),
+    ('mocking_option_value', '/health')
+]
+
+
+def _env(preload, options_file):
+    env = dict(os.environ)
+    env['PRELOAD_CLIENTS'] = '1' if preload else '0'
+    env['OPTIONS_FILE'] = options_file
+    # Creating the OpenAI client requires a key, even though no call is made
+    env.setdefault('OPENAI_API_KEY', 'benchmark')
+    return env
+
+
+def _importtime(code, env):
+    # (cumulative ms, indent level, module name) for every import `code` triggers
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{code} failed:\n{result.stderr[-2000:]}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or line.count('|') != 2:
+            continue
+        _, cumulative, name = line.split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((int(cumulative) / 1000, level, name.strip()))
+    return imports
+
+
+def import_breakdown(module, env, top):
+    """
+    Import a module in a fresh interpreter with -X importtime
+
+    Args:
+        module (str): Module to import
+        env (dict): Environment for the interpreter
+        top (int): Number of slowest imports to return
+
+    Returns:
+        tuple: (total import time in ms, list of (cumulative ms, package) for the
+               slowest packages the module imports directly)
+    """
+    # Modules the interpreter imports at startup are not the module's cost
+    startup = {name for _, _, name in _importtime('pass', env)}
+
+    total = 0.0
+    packages = {}
+    for cumulative_ms, level, name in _importtime(f'import {module}', env):
+        if name == module:
+            total = cumulative_ms
+        elif level == 1 and name not in startup:
+            package = name.split('.')[0]
+            packages[package] = packages.get(package, 0.0) + cumulative_ms
+    slowest = sorted(((ms, package) for package, ms in packages.items()), reverse=True)[:top]
+    return total, slowest
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_request(module, path, env, timeout=60):
+    """
+    Start the module's Flask app in a fresh process and time the first response
+
+    Args:
+        module (str): Module defining `app`
+        path (str): URL path to request
+        env (dict): Environment for the process
+        timeout (float): Seconds to wait for the app
+
+    Returns:
+        float: Seconds from process start until the first response
+    """
+    port = _free_port()
+    code = (f"import {module}; "
+            f"{module}.app.run(host='127.0.0.1', port={port}, debug=False, use_reloader=False)")
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', code], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        url = f"http://127.0.0.1:{port}{path}"
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"{module} exited with code {process.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=timeout) as response:
+                    response.read()
+                return time.perf_counter() - started
+            except urllib.error.HTTPError:
+                # Any HTTP response means the app is serving
+                return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.005)
+        raise RuntimeError(f"{module} did not answer within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and time to first request of each entry point")
+    parser.add_argument('--runs', type=int, default=3, help="Runs per entry point; the median is reported")
+    parser.add_argument('--top', type=int, default=10, help="Slowest imports to list per entry point")
+    parser.add_argument('--preload', action='store_true', help="Set PRELOAD_CLIENTS=1 (eager client creation)")
+    parser.add_argument('--only', help="Comma-separated entry point modules to benchmark")
+    args = parser.parse_args()
+
+    selected = set(args.only.split(',')) if args.only else None
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = _env(args.preload, os.path.join(tmp_dir, 'option_values.json'))
+        summary = []
+        for module, path in ENTRY_POINTS:
+            if selected and module not in selected:
+                continue
+            import_runs = []
+            slowest = []
+            first_request_runs = []
+            for _ in range(args.runs):
+                total, slowest = import_breakdown(module, env, args.top)
+                import_runs.append(total)
+                first_request_runs.append(time_to_first_request(module, path, env))
+
+            print(f"\n{module} (PRELOAD_CLIENTS={env['PRELOAD_CLIENTS']})")
+            print(f"  {'cumulative ms':>14}  package")
+            for ms, package in slowest:
+                print(f"  {ms:>14.1f}  {package}")
+            summary.append((module, statistics.median(import_runs), statistics.median(first_request_runs)))
+
+    print(f"\n{'entry point':<24}{'import (ms)':>14}{'first request (ms)':>22}")
+    for module, import_ms, first_request in summary:
+        print(f"{module:<24}{import_ms:>14.1f}{first_request * 1000:>22.1f}")
+
+
+if __name__ == "__main__":
+    main()
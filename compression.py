@@ -0,0 +1,132 @@
+"""
+Negotiated response compression for the Flask apps.
+
+Responses of a compressible type are compressed with the best encoding the
+client accepts: brotli ("br") if the brotli package is installed, otherwise
+gzip. Buffered responses are only compressed from COMPRESS_MIN_BYTES up,
+where the saving outweighs the CPU cost; streamed responses (NDJSON) are
+compressed chunk by chunk and flushed after each chunk, so records still reach
+the client as they are generated.
+
+Settings:
+- COMPRESS_MIN_BYTES: smallest buffered body to compress (default 1024; 0 compresses everything)
+- COMPRESS_GZIP_LEVEL: gzip level, 1-9 (default 6)
+- COMPRESS_BROTLI_QUALITY: brotli quality, 0-11 (default 5, fast enough for dynamic responses)
+- COMPRESS_RESPONSES=0 disables compression
+"""
+
+import gzip
+import os
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_RESPONSES = os.getenv('COMPRESS_RESPONSES', '1') == '1'
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))
+COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', '6'))
+COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', '5'))
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript',
+    'text/html', 'text/plain', 'text/css', 'text/javascript'
+}
+
+# In order of preference when the client accepts several equally
+ENCODINGS = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def compress_bytes(data, encoding):
+    """
+    Compress a whole body
+
+    Args:
+        data (bytes): Body
+        encoding (str): "br" or "gzip"
+
+    Returns:
+        bytes: Compressed body
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESS_GZIP_LEVEL)
+
+
+def compress_stream(chunks, encoding):
+    """
+    Compress a streamed body, flushing after every chunk
+
+    Args:
+        chunks (iterable): Body chunks (str or bytes)
+        encoding (str): "br" or "gzip"
+
+    Yields:
+        bytes: Compressed chunks
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+        compress, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        # wbits=31 writes a gzip header and trailer
+        compressor = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 31)
+        compress, flush, finish = compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk:
+                yield compress(chunk) + flush()
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def choose_encoding():
+    """Best encoding the current request accepts, or None"""
+    return request.accept_encodings.best_match(ENCODINGS)
+
+
+def compress_response(response):
+    """
+    after_request hook that compresses the response if the client accepts it
+
+    Args:
+        response (Response): The response
+
+    Returns:
+        Response: The same response, compressed when worthwhile
+    """
+    if (response.direct_passthrough or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return response
+        response.set_data(compress_bytes(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def install(app):
+    """
+    Enable response compression for a Flask app
+
+    Args:
+        app (Flask): The app
+    """
+    if COMPRESS_RESPONSES:
+        app.after_request(compress_response)
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+Static export of all templates.
+
+Generated forms are static pages, so they do not need Flask to be served.
+This walks templates/ and writes a self-contained site for nginx or a CDN:
+
+    <out>/index.html                  list of the forms
+    <out>/forms/<name>/index.html     optimised page, plus the other files of the template folder
+    <out>/assets/<name>-<hash>.css    stylesheets, shared by pages with identical styles
+    <out>/manifest.json               sha256 and size of every file, and the sources of each form
+
+Text files get precompressed .gz variants (and .br when the brotli package is
+installed) for nginx's gzip_static/brotli_static or a CDN. Pages still load
+their data from the mock API in the browser; they are not hydrated.
+
+The export is incremental: the manifest records a hash of each template's
+sources, and templates whose sources did not change are not rebuilt. Files
+are only rewritten when their content changes, forms whose template was
+deleted are removed, and so are assets no page uses any more.
+
+Usage:
+    python export_static.py                       # to EXPORT_DIR (default static_export/)
+    python export_static.py --out /var/www/forms
+    python export_static.py --force               # rebuild every form
+"""
+
+import argparse
+import gzip
+import hashlib
+import html as html_lib
+import json
+import os
+import re
+import shutil
+import time
+from datetime import datetime
+
+import jinja2
+
+import page_optimizer
+from template_store import write_file_atomic
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+TEMPLATES_DIR = os.path.join(ROOT, 'templates')
+STATIC_DIR = os.path.join(ROOT, 'static')
+EXPORT_DIR = os.getenv('EXPORT_DIR', os.path.join(ROOT, 'static_export'))
+EXPORT_GZIP_LEVEL = int(os.getenv('EXPORT_GZIP_LEVEL', '9'))
+EXPORT_BROTLI_QUALITY = int(os.getenv('EXPORT_BROTLI_QUALITY', '11'))
+
+# Bump when the export output changes, so existing exports are rebuilt
+EXPORT_FORMAT_VERSION = 1
+COMPRESSIBLE_EXTENSIONS = ('.html', '.css', '.js', '.json', '.svg', '.txt', '.xml')
+ENCODINGS = [('gzip', '.gz')] + ([('br', '.br')] if brotli is not None else [])
+TEMPLATE_NAME_PATTERN = re.compile(r'^[a-zA-Z0-9_-]+$')
+STATIC_REFERENCE_PATTERN = re.compile(r'''((?:href|src)=)(["'])/static/([^"'?#]+)\2''', re.I)
+HASHED_NAME_PATTERN = re.compile(r'-[0-9a-f]{16}\.[^.]+$')
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=EXPORT_BROTLI_QUALITY)
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=EXPORT_GZIP_LEVEL, mtime=0)
+
+
+def _export_settings():
+    return f"{EXPORT_FORMAT_VERSION}:{EXPORT_GZIP_LEVEL}:{EXPORT_BROTLI_QUALITY}:{','.join(e for e, _ in ENCODINGS)}"
+
+
+def _output_path(out_dir, rel_path):
+    return os.path.join(out_dir, *rel_path.split('/'))
+
+
+def write_output(out_dir, rel_path, data):
+    """
+    Write a file of the export and its precompressed variants, skipping
+    files whose content has not changed
+
+    Args:
+        out_dir (str): Export directory
+        rel_path (str): Path inside the export, with "/" separators
+        data (bytes): File content
+
+    Returns:
+        tuple: (manifest entry {'sha256', 'bytes', 'encodings'}, number of files written)
+    """
+    path = _output_path(out_dir, rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written = 0
+    current = None
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            current = f.read()
+    if current != data:
+        write_file_atomic(path, data)
+        written += 1
+
+    entry = {'sha256': _sha256(data), 'bytes': len(data), 'encodings': {}}
+    if not rel_path.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+        return entry, written
+    for encoding, suffix in ENCODINGS:
+        variant_path = path + suffix
+        if not written and os.path.exists(variant_path):
+            entry['encodings'][encoding] = os.path.getsize(variant_path)
+            continue
+        compressed = _compress(data, encoding)
+        if len(compressed) < len(data):
+            write_file_atomic(variant_path, compressed)
+            entry['encodings'][encoding] = len(compressed)
+            written += 1
+        elif os.path.exists(variant_path):
+            os.remove(variant_path)
+    return entry, written
+
+
+def remove_output(out_dir, rel_path):
+    """Remove a file of the export and its precompressed variants"""
+    path = _output_path(out_dir, rel_path)
+    for suffix in ('', '.gz', '.br'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def list_templates(templates_dir):
+    """
+    Names of the templates that have a page
+
+    Args:
+        templates_dir (str): Templates directory
+
+    Returns:
+        list: Sorted template names
+    """
+    if not os.path.isdir(templates_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(templates_dir)
+        if TEMPLATE_NAME_PATTERN.match(name) and os.path.isfile(os.path.join(templates_dir, name, 'index.html'))
+    )
+
+
+def _source_files(template_dir):
+    # (path relative to the template folder, absolute path), hidden files excluded
+    files = []
+    for directory, subdirs, filenames in os.walk(template_dir):
+        subdirs[:] = sorted(d for d in subdirs if not d.startswith('.'))
+        for filename in sorted(filenames):
+            if filename.startswith('.') or filename.endswith('.tmp'):
+                continue
+            path = os.path.join(directory, filename)
+            files.append((os.path.relpath(path, template_dir).replace(os.sep, '/'), path))
+    return files
+
+
+def _static_path(static_dir, reference):
+    # Absolute path of a /static/ reference, or None if it points outside static_dir
+    path = os.path.realpath(os.path.join(static_dir, *reference.split('/')))
+    if not path.startswith(os.path.realpath(static_dir) + os.sep):
+        return None
+    return path
+
+
+def source_hash(template_dir, static_dir=STATIC_DIR):
+    """
+    Hash of everything a template's export is built from
+
+    Args:
+        template_dir (str): Template folder
+        static_dir (str): The server's static directory, for /static/ references
+
+    Returns:
+        str: sha256 of the folder's files, the static files they reference
+             (which build_page copies into the export) and the export settings
+    """
+    digest = hashlib.sha256(_export_settings().encode('utf-8'))
+    references = set()
+    for rel_path, path in _source_files(template_dir):
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest.update(f"\0{rel_path}\0{_sha256(data)}".encode('utf-8'))
+        references.update(match.group(3) for match in
+                          STATIC_REFERENCE_PATTERN.finditer(data.decode('utf-8', errors='replace')))
+    for reference in sorted(references):
+        path = _static_path(static_dir, reference)
+        if path is None or not os.path.isfile(path):
+            # Left as a link by build_page, so only its absence matters
+            file_hash = 'missing'
+        else:
+            with open(path, 'rb') as f:
+                file_hash = _sha256(f.read())
+        digest.update(f"\0/static/{reference}\0{file_hash}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def page_title(html, default):
+    """The <title> of a page, or `default` if it has none"""
+    match = re.search(r'<title[^>]*>(.*?)</title\s*>', html, flags=re.S | re.I)
+    title = html_lib.unescape(match.group(1)).strip() if match else ''
+    return title or default
+
+
+def build_page(environment, name, static_dir, assets_dir):
+    """
+    Render and optimise a form page for the export
+
+    Args:
+        environment (jinja2.Environment): Loads from the templates directory, as Flask does
+        name (str): Template name
+        static_dir (str): The server's static directory, for /static/ references
+        assets_dir (str): The export's assets directory
+
+    Returns:
+        tuple: (page html, {asset file name: content bytes})
+    """
+    # The same rendering /view/<name> does, without request-specific hydration
+    html = page_optimizer.minify_html(environment.get_template(f'{name}/index.html').render())
+    assets = {}
+
+    def link_static_file(match):
+        path = _static_path(static_dir, match.group(3))
+        if path is None or not os.path.isfile(path):
+            return match.group(0)
+        with open(path, 'rb') as f:
+            data = f.read()
+        filename = os.path.basename(path)
+        if not HASHED_NAME_PATTERN.search(filename):
+            stem, extension = os.path.splitext(filename)
+            filename = f"{stem}-{_sha256(data)[:16]}{extension}"
+        assets[filename] = data
+        return f"{match.group(1)}{match.group(2)}../../assets/{filename}{match.group(2)}"
+
+    html = STATIC_REFERENCE_PATTERN.sub(link_static_file, html)
+    html, stylesheet = page_optimizer.extract_stylesheet(html, assets_dir, '../../assets')
+    if stylesheet:
+        with open(stylesheet, 'rb') as f:
+            assets[os.path.basename(stylesheet)] = f.read()
+    return html, assets
+
+
+def build_index(templates):
+    """
+    Index page linking every exported form
+
+    Args:
+        templates (dict): Manifest entries by template name
+
+    Returns:
+        str: HTML page
+    """
+    items = "\n".join(
+        f'        <li><a href="forms/{name}/">{html_lib.escape(entry["title"])}</a> <code>{name}</code></li>'
+        for name, entry in sorted(templates.items())
+    )
+    return page_optimizer.minify_html(f"""<!DOCTYPE html>
+<html lang="vi">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Template Directory</title>
+    <style>
+        body {{ font-family: Arial, sans-serif; max-width: 800px; margin: 0 auto; padding: 20px; }}
+        li {{ margin: 8px 0; }}
+        code {{ color: #666; }}
+    </style>
+</head>
+<body>
+    <h1>Template Directories</h1>
+    <ul>
+{items}
+    </ul>
+</body>
+</html>""")
+
+
+def load_manifest(out_dir):
+    """The manifest of a previous export, or an empty one"""
+    path = os.path.join(out_dir, 'manifest.json')
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'templates': {}, 'assets': {}}
+    manifest.setdefault('templates', {})
+    manifest.setdefault('assets', {})
+    return manifest
+
+
+def _is_current(entry, digest, out_dir):
+    if not entry or entry.get('source_hash') != digest:
+        return False
+    paths = list(entry.get('files', {})) + entry.get('assets', [])
+    return all(os.path.exists(_output_path(out_dir, rel_path)) for rel_path in paths)
+
+
+def export_site(templates_dir=TEMPLATES_DIR, out_dir=EXPORT_DIR, static_dir=STATIC_DIR, force=False):
+    """
+    Export every template as a static site, rebuilding only changed templates
+
+    Args:
+        templates_dir (str): Templates directory
+        out_dir (str): Export directory, created if needed
+        static_dir (str): The server's static directory
+        force (bool): Rebuild every template
+
+    Returns:
+        dict: Names built, unchanged, removed and failed, files written, and
+              total and gzip size of the export
+    """
+    start_time = time.time()
+    os.makedirs(out_dir, exist_ok=True)
+    assets_dir = os.path.join(out_dir, 'assets')
+    previous = load_manifest(out_dir)
+    environment = jinja2.Environment(loader=jinja2.FileSystemLoader(templates_dir),
+                                     autoescape=jinja2.select_autoescape())
+    summary = {'built': [], 'unchanged': [], 'removed': [], 'failed': [], 'files_written': 0}
+    templates = {}
+    assets = {}
+
+    for name in list_templates(templates_dir):
+        template_dir = os.path.join(templates_dir, name)
+        digest = source_hash(template_dir, static_dir)
+        entry = previous['templates'].get(name)
+        if not force and _is_current(entry, digest, out_dir):
+            templates[name] = entry
+            for rel_path in entry['assets']:
+                if rel_path in previous['assets']:
+                    assets.setdefault(rel_path, previous['assets'][rel_path])
+            summary['unchanged'].append(name)
+            continue
+
+        try:
+            page, page_assets = build_page(environment, name, static_dir, assets_dir)
+        except (jinja2.TemplateError, OSError) as e:
+            print(f"Error exporting template {name}: {str(e)}")
+            summary['failed'].append(name)
+            if entry:
+                templates[name] = entry
+                for rel_path in entry['assets']:
+                    assets.setdefault(rel_path, previous['assets'].get(rel_path, {}))
+            continue
+
+        files = {}
+        prefix = f"forms/{name}"
+        files[f"{prefix}/index.html"], written = write_output(out_dir, f"{prefix}/index.html", page.encode('utf-8'))
+        summary['files_written'] += written
+        for rel_path, path in _source_files(template_dir):
+            if rel_path == 'index.html':
+                continue
+            with open(path, 'rb') as f:
+                files[f"{prefix}/{rel_path}"], written = write_output(out_dir, f"{prefix}/{rel_path}", f.read())
+            summary['files_written'] += written
+        for filename, data in page_assets.items():
+            rel_path = f"assets/{filename}"
+            if rel_path not in assets:
+                assets[rel_path], written = write_output(out_dir, rel_path, data)
+                summary['files_written'] += written
+
+        # Files this template no longer has
+        for rel_path in (entry or {}).get('files', {}):
+            if rel_path not in files:
+                remove_output(out_dir, rel_path)
+        templates[name] = {
+            'source_hash': digest,
+            'title': page_title(page, name),
+            'files': files,
+            'assets': sorted(f"assets/{filename}" for filename in page_assets)
+        }
+        summary['built'].append(name)
+
+    for name in sorted(set(previous['templates']) - set(templates)):
+        shutil.rmtree(_output_path(out_dir, f"forms/{name}"), ignore_errors=True)
+        summary['removed'].append(name)
+
+    # Assets no page uses any more
+    used = {rel_path for entry in templates.values() for rel_path in entry['assets']}
+    if os.path.isdir(assets_dir):
+        for filename in os.listdir(assets_dir):
+            base = re.sub(r'\.(gz|br)$', '', filename)
+            if f"assets/{base}" not in used:
+                os.remove(os.path.join(assets_dir, filename))
+
+    index, written = write_output(out_dir, 'index.html', build_index(templates).encode('utf-8'))
+    summary['files_written'] += written
+    manifest = {
+        'version': EXPORT_FORMAT_VERSION,
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'encodings': [encoding for encoding, _ in ENCODINGS],
+        'index': index,
+        'templates': templates,
+        'assets': {rel_path: assets[rel_path] for rel_path in sorted(used) if rel_path in assets}
+    }
+    write_file_atomic(os.path.join(out_dir, 'manifest.json'),
+                      json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True))
+
+    entries = [index] + list(manifest['assets'].values())
+    entries += [file for entry in templates.values() for file in entry['files'].values()]
+    summary['total_bytes'] = sum(file['bytes'] for file in entries)
+    summary['gzip_bytes'] = sum(file['encodings'].get('gzip', file['bytes']) for file in entries)
+    summary['seconds'] = round(time.time() - start_time, 3)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export all templates as a precompressed static site")
+    parser.add_argument('--out', default=EXPORT_DIR, help="export directory (default: %(default)s)")
+    parser.add_argument('--templates', default=TEMPLATES_DIR, help="templates directory (default: %(default)s)")
+    parser.add_argument('--force', action='store_true', help="rebuild every form, not only changed ones")
+    args = parser.parse_args()
+
+    summary = export_site(args.templates, args.out, force=args.force)
+    print(f"Exported to {args.out} in {summary['seconds']}s: {len(summary['built'])} built, "
+          f"{len(summary['unchanged'])} unchanged, {len(summary['removed'])} removed, "
+          f"{len(summary['failed'])} failed, {summary['files_written']} file(s) written")
+    print(f"Site size: {summary['total_bytes']} bytes, {summary['gzip_bytes']} bytes gzipped")
+    if summary['failed']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+"""
+Field contract for the concurrent generation pipeline.
+
+Before any LLM call, the field definition lines are turned into a contract:
+the name attribute, field type and (for select and radio fields with listed
+options) the option values of every field, plus the element ids the page
+script relies on. The HTML prompt is given the contract as mandatory, and the
+script is generated at the same time from a minimal page built from the
+contract instead of from the generated page. verify_html() then checks that
+the generated page honours the contract before the script is injected.
+"""
+
+import html as html_lib
+import re
+import unicodedata
+
+import form_analyzer
+import model_router
+import template_update
+
+# Contract type -> control types (as reported by form_analyzer) that satisfy it
+ACCEPTED_CONTROLS = {
+    'text': {'text', 'search', 'url', 'password', 'time'},
+    'tel': {'tel', 'text'},
+    'email': {'email', 'text'},
+    'date': {'date', 'text'},
+    'datetime': {'datetime-local', 'date', 'text'},
+    'number': {'number', 'range', 'text'},
+    'select': {'select', 'radio'},
+    'radio': {'radio', 'select'},
+    'rating': {'radio', 'range', 'number', 'select'},
+    'textarea': {'textarea', 'text'},
+    'checkbox': {'checkbox'}
+}
+
+# Contract type -> control described in the HTML prompt and used in the contract page
+CONTROL_MARKUP = {
+    'text': 'input type="text"',
+    'tel': 'input type="tel"',
+    'email': 'input type="email"',
+    'date': 'input type="date"',
+    'datetime': 'input type="datetime-local"',
+    'number': 'input type="number"',
+    'select': 'select',
+    'radio': 'input type="radio"',
+    'rating': 'input type="radio" (values 1..N)',
+    'textarea': 'textarea',
+    'checkbox': 'input type="checkbox"'
+}
+
+OPTIONS_PATTERN = re.compile(r'(?:options?|lựa chọn|gồm)\s*(?:are|is|là|:)?\s*(.+)$', re.IGNORECASE)
+
+
+def field_name(line):
+    """
+    The name attribute a definition line's field gets
+
+    Args:
+        line (str): Field definition line
+
+    Returns:
+        str: The field name of "field_name: ..." lines, otherwise a snake_case
+             ASCII slug of the text before the first colon
+    """
+    match = template_update.FIELD_NAME_PATTERN.match(line)
+    if match:
+        return match.group(1).lower()
+    label = line.split(':', 1)[0].replace('đ', 'd').replace('Đ', 'D')
+    text = ''.join(c for c in unicodedata.normalize('NFKD', label) if not unicodedata.combining(c)).lower()
+    slug = re.sub(r'[^a-z0-9]+', '_', text).strip('_')[:40].strip('_') or 'field'
+    return f"field_{slug}" if slug[0].isdigit() else slug
+
+
+def field_options(line):
+    """
+    Option values listed in a select or radio definition line
+
+    Args:
+        line (str): Field definition line, with option placeholders resolved
+
+    Returns:
+        list: The options, or an empty list when the line does not list at least two
+    """
+    match = OPTIONS_PATTERN.search(line)
+    if not match:
+        return []
+    options = [option.strip(' .;"\'') for option in re.split(r',|\s+(?:and|or|và|hoặc)\s+|/', match.group(1))]
+    options = [option for option in options if option]
+    if len(options) < 2 or any(len(option) > 40 for option in options):
+        return []
+    return options
+
+
+def plan_contract(prompt_lines):
+    """
+    Fix the field contract of a form from its definition lines
+
+    Args:
+        prompt_lines (list): Field definition lines as sent to the model (placeholders resolved)
+
+    Returns:
+        dict: 'fields' (list of {'name', 'type', 'options', 'label', 'line'} in
+              form order) and 'required_ids'
+    """
+    fields = []
+    used = set()
+    for line in prompt_lines:
+        name = base = field_name(line)
+        suffix = 2
+        while name in used:
+            name = f"{base}_{suffix}"
+            suffix += 1
+        used.add(name)
+        field_type = model_router.infer_field_type(line) or 'text'
+        fields.append({
+            'name': name,
+            'type': field_type,
+            'options': field_options(line) if field_type in ('select', 'radio') else [],
+            'label': line.split(':', 1)[0].strip(),
+            'line': line
+        })
+    return {'fields': fields, 'required_ids': list(model_router.REQUIRED_IDS)}
+
+
+def format_for_prompt(contract):
+    """
+    The contract as a section of the HTML prompt
+
+    Args:
+        contract (dict): From plan_contract()
+
+    Returns:
+        str: Prompt text
+    """
+    lines = ["FIELD CONTRACT (the page script is written against it at the same time, so it is mandatory):"]
+    for field in contract['fields']:
+        control = CONTROL_MARKUP[field['type']]
+        options = f" with option values exactly: {', '.join(field['options'])}" if field['options'] else ""
+        lines.append(f"- name=\"{field['name']}\": <{control}>{options}, for the field \"{field['line']}\"")
+    lines.append(f"- Element ids: {', '.join(field_id for field_id in contract['required_ids'])}")
+    lines.append("Use exactly these name attributes, control types and option values, in this order.")
+    return "\n".join(lines)
+
+
+def field_map(contract):
+    """The contract in the "name: type" form of the JavaScript prompt's field map"""
+    return "\n".join(f"- {field['name']}: {field['type']}" for field in contract['fields'])
+
+
+def contract_html(contract):
+    """
+    Minimal page with the contract's controls and element ids, for the
+    JavaScript prompt and the script cache signature
+
+    Args:
+        contract (dict): From plan_contract()
+
+    Returns:
+        str: HTML page
+    """
+    rows = []
+    for field in contract['fields']:
+        name = html_lib.escape(field['name'])
+        if field['type'] == 'select':
+            options = "".join(f'<option value="{html_lib.escape(option)}">{html_lib.escape(option)}</option>'
+                              for option in field['options'])
+            control = f'<select id="{name}" name="{name}">{options}</select>'
+        elif field['type'] in ('radio', 'rating'):
+            values = field['options'] or [str(value) for value in range(1, 6)]
+            control = "".join(f'<input type="radio" name="{name}" value="{html_lib.escape(value)}">'
+                              for value in values)
+        elif field['type'] == 'textarea':
+            control = f'<textarea id="{name}" name="{name}"></textarea>'
+        else:
+            control = f'<{CONTROL_MARKUP[field["type"]]} id="{name}" name="{name}">'
+        rows.append(f'            <tr data-mo-ta="{html_lib.escape(field["line"])}">'
+                    f'<td><label for="{name}">{html_lib.escape(field["label"])}</label></td><td>{control}</td></tr>')
+    ids = "\n".join(f'    <div id="{html_lib.escape(field_id)}"></div>' for field_id in contract['required_ids'])
+    return ("<!DOCTYPE html>\n<html lang=\"vi\">\n<body>\n" + ids + "\n    <form>\n        <table>\n"
+            + "\n".join(rows) + "\n        </table>\n        <button type=\"submit\">Gửi</button>\n"
+            "    </form>\n</body>\n</html>")
+
+
+def verify_html(html, contract):
+    """
+    Check that a generated page honours the contract
+
+    Args:
+        html (str): Generated page
+        contract (dict): From plan_contract()
+
+    Returns:
+        list: Problems found; empty if the page honours the contract
+    """
+    analysis = form_analyzer.analyze_form(html)
+    problems = [f"Missing required element id '{field_id}'"
+                for field_id in contract['required_ids'] if field_id not in analysis['ids']]
+    controls = {}
+    for control in analysis['fields']:
+        controls.setdefault(control['name'], control)
+    for field in contract['fields']:
+        control = controls.get(field['name'])
+        if control is None:
+            problems.append(f"Missing field '{field['name']}'")
+            continue
+        if control['type'] not in ACCEPTED_CONTROLS[field['type']]:
+            problems.append(f"Field '{field['name']}' is a {control['type']} control, expected {field['type']}")
+        available = set(control['options']) | set(control.get('option_labels') or [])
+        missing = [option for option in field['options'] if option not in available]
+        if missing:
+            problems.append(f"Field '{field['name']}' lacks option(s) {', '.join(missing)}")
+    return problems
@@ -0,0 +1,239 @@
+"""
+Local analysis of generated form HTML.
+
+Parses a page with the standard library HTML parser and reports the form
+controls it contains (name, type, options, label) and the element ids on the
+page, plus structural problems such as unclosed or mismatched tags. The
+specs.json for a generated page is derived from this analysis, so the spec
+always matches the inputs actually on the page.
+"""
+
+from html.parser import HTMLParser
+
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'param', 'source', 'track', 'wbr'
+}
+# Elements whose end tag may be omitted in valid HTML
+OPTIONAL_END_TAGS = {'p', 'li', 'option', 'optgroup', 'tr', 'td', 'th', 'thead', 'tbody', 'tfoot', 'colgroup', 'dt', 'dd'}
+
+# Control type -> specs.json "kieu_du_lieu"
+FIELD_TYPES = {
+    'text': 'text', 'search': 'text', 'url': 'text', 'password': 'text', 'time': 'text',
+    'tel': 'tel',
+    'email': 'email',
+    'date': 'date', 'month': 'date', 'week': 'date',
+    'datetime-local': 'datetime',
+    'number': 'number',
+    'range': 'rating',
+    'select': 'select',
+    'textarea': 'textarea',
+    'checkbox': 'checkbox',
+    'radio': 'radio'
+}
+RATING_HINTS = ('rating', 'star', 'danh_gia', 'hai_long', 'score')
+
+
+class _FormParser(HTMLParser):
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.fields = []
+        self.fields_by_name = {}
+        self.ids = []
+        self.labels_for = {}
+        self.errors = []
+        self._stack = []
+        self._select = None
+        self._option = None
+        self._label = None
+        self._cell_text = []
+        self._row_source = None
+
+    def handle_starttag(self, tag, attrs):
+        attributes = dict(attrs)
+        if attributes.get('id'):
+            self.ids.append(attributes['id'])
+
+        if tag not in VOID_ELEMENTS:
+            self._stack.append(tag)
+
+        if tag == 'label':
+            self._label = {'for': attributes.get('for'), 'text': []}
+        elif tag == 'tr':
+            self._cell_text = []
+            self._row_source = attributes.get('data-mo-ta')
+        elif tag == 'input':
+            input_type = (attributes.get('type') or 'text').lower()
+            if input_type in ('submit', 'button', 'reset', 'hidden', 'image'):
+                return
+            field = self._field(attributes, input_type)
+            if field is not None and input_type in ('radio', 'checkbox') and attributes.get('value') is not None:
+                field['options'].append(attributes['value'])
+        elif tag == 'select':
+            self._select = self._field(attributes, 'select')
+        elif tag == 'option':
+            if self._option is not None:
+                self._close_option()
+            self._option = {'value': attributes.get('value'), 'text': []}
+        elif tag == 'textarea':
+            self._field(attributes, 'textarea')
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS and self._stack and self._stack[-1] == tag:
+            self._stack.pop()
+
+    def handle_endtag(self, tag):
+        if tag == 'label' and self._label is not None:
+            text = ' '.join(''.join(self._label['text']).split()).rstrip(':').strip()
+            if self._label['for'] and text:
+                self.labels_for[self._label['for']] = text
+            self._label = None
+        elif tag == 'option' and self._option is not None:
+            self._close_option()
+        elif tag == 'select':
+            if self._option is not None:
+                self._close_option()
+            self._select = None
+        elif tag == 'tr':
+            self._row_source = None
+
+        if tag in VOID_ELEMENTS:
+            return
+        if tag not in self._stack:
+            self.errors.append(f"Unexpected closing tag </{tag}> at line {self.getpos()[0]}")
+            return
+        # Pop implicitly closed elements; only those with optional end tags are valid
+        while self._stack:
+            open_tag = self._stack.pop()
+            if open_tag == tag:
+                break
+            if open_tag not in OPTIONAL_END_TAGS:
+                self.errors.append(f"Unclosed <{open_tag}> before </{tag}> at line {self.getpos()[0]}")
+
+    def handle_data(self, data):
+        if self._label is not None:
+            self._label['text'].append(data)
+        if self._option is not None:
+            self._option['text'].append(data)
+        self._cell_text.append(data)
+
+    def _close_option(self):
+        text = ' '.join(''.join(self._option['text']).split())
+        value = self._option['value'] if self._option['value'] is not None else text
+        if self._select is not None and value:
+            self._select['options'].append(value)
+            self._select['option_labels'].append(text)
+        self._option = None
+
+    def _field(self, attributes, field_type):
+        name = attributes.get('name')
+        if not name:
+            return None
+        field = self.fields_by_name.get(name)
+        if field is None:
+            field = {
+                'name': name,
+                'type': field_type,
+                'id': attributes.get('id'),
+                'required': 'required' in attributes,
+                'options': [],
+                'option_labels': [],
+                'label': None,
+                'row_text': ' '.join(''.join(self._cell_text).split()).rstrip(':').strip() or None,
+                'source': attributes.get('data-mo-ta') or self._row_source,
+                'attributes': attributes
+            }
+            self.fields_by_name[name] = field
+            self.fields.append(field)
+            self._cell_text = []
+        return field
+
+    def close(self):
+        super().close()
+        for tag in self._stack:
+            if tag not in OPTIONAL_END_TAGS and tag not in ('html', 'body', 'head'):
+                self.errors.append(f"Unclosed <{tag}> at end of document")
+
+
+def analyze_form(html):
+    """
+    Analyse the form controls and structure of an HTML page
+
+    Args:
+        html (str): HTML document or fragment
+
+    Returns:
+        dict: 'fields' (list of controls in document order, each with name, type,
+              id, required, options, option_labels, label, source (the
+              data-mo-ta of the control or its row) and attributes),
+              'ids' (list of element ids) and 'errors' (structural problems)
+    """
+    parser = _FormParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception as e:
+        parser.errors.append(f"HTML parse error: {str(e)}")
+
+    for field in parser.fields:
+        own_label = parser.labels_for.get(field['id'])
+        if field['type'] in ('radio', 'checkbox') and len(field['options']) > 1:
+            # Labels inside a radio group name the options (e.g. stars), so
+            # prefer the text that precedes the group in its row
+            field['label'] = field['row_text'] or own_label
+        else:
+            field['label'] = own_label or field['row_text']
+
+    return {
+        'fields': parser.fields,
+        'ids': parser.ids,
+        'errors': parser.errors
+    }
+
+
+def field_data_type(field):
+    """
+    Map an analysed form control to its specs.json "kieu_du_lieu"
+
+    Args:
+        field (dict): A field from analyze_form()
+
+    Returns:
+        str: The kieu_du_lieu value
+    """
+    data_type = FIELD_TYPES.get(field['type'], 'text')
+    hints = ' '.join(filter(None, [field['name'], field['attributes'].get('class')])).lower()
+    if data_type == 'radio':
+        # A group of numbered choices (e.g. 1-5 stars) is a rating scale
+        numeric = len(field['options']) >= 3 and all(value.strip().isdigit() for value in field['options'])
+        if numeric or any(hint in hints for hint in RATING_HINTS):
+            return 'rating'
+    elif data_type == 'number' and any(hint in hints for hint in RATING_HINTS):
+        return 'rating'
+    return data_type
+
+
+def derive_specs(html):
+    """
+    Build specs.json entries for every named form control on a page
+
+    Args:
+        html (str): HTML document or fragment
+
+    Returns:
+        list: specs.json entries in document order. "mo_ta" is included when the
+              control or its table row carries a data-mo-ta attribute.
+    """
+    specs = []
+    for field in analyze_form(html)['fields']:
+        entry = {
+            'ten_hien_thi': field['label'] or field['name'],
+            'ten_field': field['name'],
+            'kieu_du_lieu': field_data_type(field)
+        }
+        if field['source']:
+            entry['mo_ta'] = ' '.join(field['source'].split())
+        specs.append(entry)
+    return specs
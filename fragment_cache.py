@@ -0,0 +1,248 @@
+"""
+Field-level cache of generated form rows.
+
+Every page generated by the LLM is cut into its field rows. Each row's markup
+and specs.json entries are stored under a key made from the field type and
+the normalised definition line, together with the page "shell" (the page with
+its field rows removed, see template_update.make_shell). A later form whose
+fields were mostly seen before is assembled from the cached rows inside that
+shell, and only the rows never seen before are generated.
+
+Rows are only reused inside the shell they were generated with, so their CSS
+classes always exist in the assembled page.
+
+The cache is a SQLite database, so it survives restarts and is shared by
+worker processes. Least recently used rows and shells are evicted once the
+configured limits are exceeded. Hit/miss counters are kept per process.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import model_router
+import template_update
+
+FRAGMENT_CACHE_PATH = os.getenv("FRAGMENT_CACHE", "fragment_cache.db")
+FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv("FRAGMENT_CACHE_MAX_ENTRIES", "5000"))
+FRAGMENT_CACHE_MAX_SHELLS = int(os.getenv("FRAGMENT_CACHE_MAX_SHELLS", "50"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shells (
+    shell_id TEXT PRIMARY KEY,
+    html TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fragments (
+    shell_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    markup TEXT NOT NULL,
+    specs TEXT NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (shell_id, key)
+);
+CREATE INDEX IF NOT EXISTS fragments_last_used ON fragments (last_used);
+"""
+
+
+def fragment_key(line):
+    """
+    Cache key for a field definition line
+
+    Args:
+        line (str): Field definition line, with option placeholders resolved
+
+    Returns:
+        str: "<field type>|<normalised line>"
+    """
+    field_type = model_router.infer_field_type(line) or 'unknown'
+    return f"{field_type}|{template_update.normalize_field_line(line)}"
+
+
+class FragmentCache:
+    """
+    SQLite-backed store of page shells and the field rows generated in them.
+
+    Args:
+        path (str): Database file
+        max_entries (int): Maximum number of cached rows
+        max_shells (int): Maximum number of cached page shells
+    """
+
+    def __init__(self, path, max_entries=5000, max_shells=50):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_shells = max_shells
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    def _connection(self):
+        # Connections must not cross a fork, so each process opens its own
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._pid = os.getpid()
+        return self._conn
+
+    def best_shell(self, keys):
+        """
+        Find the cached shell that has rows for the most of the given keys
+
+        Args:
+            keys (list): Fragment keys of the form being built
+
+        Returns:
+            tuple: (shell_id, shell html, {key: {'markup', 'specs'}}), or None if
+                   no shell has any of the keys
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return None
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                f"SELECT shell_id FROM fragments WHERE key IN ({placeholders}) "
+                f"GROUP BY shell_id ORDER BY COUNT(*) DESC, MAX(last_used) DESC LIMIT 1",
+                keys
+            ).fetchone()
+            shell = row and conn.execute(
+                "SELECT shell_id, html FROM shells WHERE shell_id = ?", (row[0],)
+            ).fetchone()
+            if not shell:
+                self._stats['misses'] += len(keys)
+                return None
+
+            fragments = {}
+            for key, markup, specs in conn.execute(
+                f"SELECT key, markup, specs FROM fragments WHERE shell_id = ? AND key IN ({placeholders})",
+                [shell[0]] + keys
+            ):
+                fragments[key] = {'markup': markup, 'specs': json.loads(specs)}
+            self._stats['hits'] += len(fragments)
+            self._stats['misses'] += len(keys) - len(fragments)
+
+            now = time.time()
+            with conn:
+                conn.execute("UPDATE shells SET last_used = ? WHERE shell_id = ?", (now, shell[0]))
+                conn.executemany(
+                    "UPDATE fragments SET last_used = ?, hits = hits + 1 WHERE shell_id = ? AND key = ?",
+                    [(now, shell[0], key) for key in fragments]
+                )
+            return shell[0], shell[1], fragments
+
+    def store_page(self, shell_html, fragments):
+        """
+        Cache a page shell and the rows generated in it
+
+        Args:
+            shell_html (str): Shell made by template_update.make_shell()
+            fragments (dict): Maps fragment key to {'markup', 'specs'}
+
+        Returns:
+            str: The shell id
+        """
+        shell_id = hashlib.sha256(shell_html.encode('utf-8')).hexdigest()[:16]
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO shells (shell_id, html, last_used) VALUES (?, ?, ?)",
+                    (shell_id, shell_html, time.time())
+                )
+        self.store_fragments(shell_id, fragments)
+        return shell_id
+
+    def store_fragments(self, shell_id, fragments):
+        """
+        Cache rows generated for an existing shell
+
+        Args:
+            shell_id (str): Id returned by store_page() or best_shell()
+            fragments (dict): Maps fragment key to {'markup', 'specs'}
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO fragments (shell_id, key, markup, specs, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(shell_id, key, fragment['markup'], json.dumps(fragment['specs'], ensure_ascii=False), now)
+                     for key, fragment in fragments.items()]
+                )
+                self._stats['stores'] += len(fragments)
+                self._evict(conn)
+
+    def _evict(self, conn):
+        # Least recently used shells go first, taking their rows with them
+        stale_shells = [row[0] for row in conn.execute(
+            "SELECT shell_id FROM shells ORDER BY last_used DESC LIMIT -1 OFFSET ?", (self.max_shells,)
+        )]
+        for shell_id in stale_shells:
+            removed = conn.execute("DELETE FROM fragments WHERE shell_id = ?", (shell_id,)).rowcount
+            conn.execute("DELETE FROM shells WHERE shell_id = ?", (shell_id,))
+            self._stats['evictions'] += removed
+
+        excess = conn.execute("SELECT COUNT(*) FROM fragments").fetchone()[0] - self.max_entries
+        if excess > 0:
+            removed = conn.execute(
+                "DELETE FROM fragments WHERE rowid IN "
+                "(SELECT rowid FROM fragments ORDER BY last_used LIMIT ?)", (excess,)
+            ).rowcount
+            self._stats['evictions'] += removed
+
+    def stats(self):
+        """
+        Hit statistics for this process and the size of the cache
+
+        Returns:
+            dict: Counters, hit rate, cached rows and shells, and the most reused rows
+        """
+        with self._lock:
+            conn = self._connection()
+            entries = conn.execute("SELECT COUNT(*) FROM fragments").fetchone()[0]
+            shells = conn.execute("SELECT COUNT(*) FROM shells").fetchone()[0]
+            top = conn.execute(
+                "SELECT key, SUM(hits) FROM fragments GROUP BY key HAVING SUM(hits) > 0 "
+                "ORDER BY SUM(hits) DESC LIMIT 10"
+            ).fetchall()
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats.update({
+            'hit_rate': round(stats['hits'] / lookups, 3) if lookups else 0.0,
+            'entries': entries,
+            'shells': shells,
+            'max_entries': self.max_entries,
+            'max_shells': self.max_shells,
+            'top_fragments': [{'key': key, 'hits': hits} for key, hits in top]
+        })
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Return the shared fragment cache, opening it on first use
+
+    Returns:
+        FragmentCache: The cache, or None when FRAGMENT_CACHE is set to an empty string
+    """
+    global _cache
+    if not FRAGMENT_CACHE_PATH:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = FragmentCache(FRAGMENT_CACHE_PATH, FRAGMENT_CACHE_MAX_ENTRIES, FRAGMENT_CACHE_MAX_SHELLS)
+    return _cache
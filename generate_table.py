@@ -1,46 +1,205 @@
 from dotenv import load_dotenv
 import os
-from jinja2 import Template
-import requests
+import json
+import re
+import hashlib
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import template_update
+import form_analyzer
+import page_optimizer
+import similarity_index
+import llm_client
+import model_router
+import fragment_cache
+import js_cache
+import field_contract
+import shared_cache
+import template_store
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Get the OpenAI API key from the environment variable
-openai_api_key = os.getenv("OPENAI_API_KEY")
+# The OpenAI client, requests and jinja2 are loaded on first use (see preload())
 
-from openai import OpenAI
+# Post-generation page optimisation settings
+OPTIMIZE_PAGES = os.getenv("OPTIMIZE_PAGES", "1") == "1"
+EXTRACT_PAGE_CSS = os.getenv("EXTRACT_PAGE_CSS", "0") == "1"
+PAGE_BYTE_BUDGET = int(os.getenv("PAGE_BYTE_BUDGET", "0"))
+# Pages over the budget are kept and reported unless rejecting them is turned on
+PAGE_BUDGET_REJECT = os.getenv("PAGE_BUDGET_REJECT", "0") == "1"
 
-# Initialize the OpenAI client
-client = OpenAI(api_key=openai_api_key)
+# A form is assembled from cached field rows when at least this share of its
+# fields is cached; otherwise the whole page is generated
+FRAGMENT_MIN_COVERAGE = float(os.getenv("FRAGMENT_MIN_COVERAGE", "0.5"))
 
-def fetch_options_from_api():
+# Forms with more fields than CHUNKED_GENERATION_THRESHOLD are generated in
+# chunks: a page skeleton first, then the remaining rows in parallel calls of
+# at most GENERATION_CHUNK_SIZE fields each
+CHUNKED_GENERATION_THRESHOLD = int(os.getenv("CHUNKED_GENERATION_THRESHOLD", "40"))
+GENERATION_CHUNK_SIZE = int(os.getenv("GENERATION_CHUNK_SIZE", "15"))
+GENERATION_CHUNK_WORKERS = int(os.getenv("GENERATION_CHUNK_WORKERS", "8"))
+
+# With CONCURRENT_PIPELINE=1 the HTML and JavaScript calls run at the same time
+# against a field contract planned locally (see field_contract.py)
+CONCURRENT_PIPELINE = os.getenv("CONCURRENT_PIPELINE", "0") == "1"
+
+# Options API settings. A form's option sets are fetched in one batched call
+# and cached per key with the ETag (store version) they were fetched at; the
+# next call revalidates them with If-None-Match, which costs a 304 while
+# nothing has changed. OPTIONS_CACHE_TTL only bounds how long an entry is
+# kept, and so how long it can be served while the API is unreachable.
+OPTIONS_API_URL = os.getenv("OPTIONS_API_URL", "http://localhost:6000/api/options")
+OPTION_PLACEHOLDER_PATTERN = re.compile(r'\{([A-Za-z_][A-Za-z0-9_]*)\}')
+option_cache = shared_cache.make_cache('options', ttl=float(os.getenv("OPTIONS_CACHE_TTL", "3600")))
+
+# Finished generations are cached briefly, so a resubmitted form (possibly
+# landing on another worker) does not call the LLM again
+generation_cache = shared_cache.make_cache('generation', ttl=float(os.getenv("GENERATION_CACHE_TTL", "600")),
+                                           max_entries=256)
+# Files read after the HTML prompt is built; they are part of the cache key too
+GENERATION_SUPPORT_FILES = ('javascript_generation_prompt.txt', 'row_prompt_template.txt', 'default_fetch_data.txt')
+
+# Options used for a placeholder when the options API cannot provide it
+OPTION_FALLBACKS = {
+    'status_survey': ["Active", "Inactive"]
+}
+
+def preload():
+    """
+    Load the LLM client and the libraries generation needs now rather than on
+    the first request, e.g. in a master process before forking workers
     """
-    Fetch options from the options API
+    import jinja2
+    import requests
+    llm_client.preload()
+
+def find_option_placeholders(field_definitions):
     """
+    Find the {name} option placeholders used in field definitions
+    
+    Args:
+        field_definitions (str): Field definitions text
+    
+    Returns:
+        list: Placeholder names in order of first appearance
+    """
+    names = []
+    for name in OPTION_PLACEHOLDER_PATTERN.findall(field_definitions):
+        if name not in names:
+            names.append(name)
+    return names
+
+def fetch_option_sets(keys):
+    """
+    Fetch several option sets from the options API in a single request.
+    When every key is cached at the same ETag, the request carries
+    If-None-Match and a 304 means the cached sets are still current; otherwise
+    all keys are fetched and cached at the new ETag. If the API cannot be
+    reached, cached sets are used as they are.
+    
+    Args:
+        keys (list): Option set names
+    
+    Returns:
+        dict: Maps each key the API knows to its list of options
+    """
+    cached = {}
+    for key in keys:
+        entry = option_cache.get(key)
+        if entry is not None:
+            cached[key] = entry
+    # Unknown keys are cached with no options, so they do not end up in the result
+    cached_sets = {key: entry['options'] for key, entry in cached.items() if entry['options']}
+    if not keys:
+        return cached_sets
+    
+    headers = {}
+    etags = {entry['etag'] for entry in cached.values()}
+    if len(cached) == len(keys) and len(etags) == 1 and None not in etags:
+        headers['If-None-Match'] = etags.pop()
+    
+    import requests
     try:
-        response = requests.get('http://localhost:6000/api/options')
+        response = requests.get(OPTIONS_API_URL, params={'keys': ",".join(keys)}, headers=headers, timeout=5)
+        if response.status_code == 304:
+            return cached_sets
         if response.status_code == 200:
             data = response.json()
-            if data.get('success') and data.get('data'):
-                return data['data']
+            if data.get('success') and isinstance(data.get('data'), dict):
+                etag = response.headers.get('ETag')
+                option_sets = {}
+                for key, options in data['data'].items():
+                    option_cache.set(key, {'options': options, 'etag': etag})
+                    option_sets[key] = options
+                if data.get('missing'):
+                    # Remember unknown keys too, so they can be revalidated along with the rest
+                    print(f"Options API has no option sets for: {data['missing']}")
+                    for key in data['missing']:
+                        option_cache.set(key, {'options': [], 'etag': etag})
+                return option_sets
         print(f"Failed to fetch options: {response.status_code} - {response.text}")
-        return []
     except Exception as e:
         print(f"Error fetching options from API: {str(e)}")
-        return []
+    return cached_sets
 
-def replace_options_placeholder(field_definitions, options):
+def replace_options_placeholder(field_definitions, option_sets):
     """
-    Replace {status_survey} placeholder with actual options from API
+    Replace {name} placeholders with the options of the matching option set.
+    Placeholders the API could not resolve use OPTION_FALLBACKS, or are left
+    in place for the LLM to interpret when no fallback exists.
+    
+    Args:
+        field_definitions (str): Field definitions text
+        option_sets (dict): Maps placeholder name to its list of options
+    
+    Returns:
+        str: Field definitions with placeholders replaced
     """
-    if not options:
-        # If no options available, use default fallback
-        return field_definitions.replace("{status_survey}", "Active, Inactive")
+    def replace(match):
+        name = match.group(1)
+        options = option_sets.get(name) or OPTION_FALLBACKS.get(name)
+        if not options:
+            print(f"Warning: no options available for placeholder {{{name}}}")
+            return match.group(0)
+        # Format options for select box
+        return ", ".join(options)
     
-    # Format options for select box
-    options_text = ", ".join(options)
-    return field_definitions.replace("{status_survey}", options_text)
+    return OPTION_PLACEHOLDER_PATTERN.sub(replace, field_definitions)
+
+def build_api_endpoint(template_name):
+    """
+    Build the mock data API endpoint a template's page fetches its data from
+    
+    Args:
+        template_name (str): The template name to render into the endpoint
+    
+    Returns:
+        str: The API endpoint URL, or an empty string if it could not be built
+    """
+    try:
+        with open('default_fetch_data.txt', 'r', encoding='utf-8') as f:
+            fetch_data_content = f.read().strip()
+        
+        # Extract the API endpoint from the curl command
+        lines = fetch_data_content.split('\n')
+        curl_line = lines[0]  # First line contains the curl command
+        
+        # Use Jinja2 to render the template_name in the API endpoint
+        from jinja2 import Template
+        template = Template(curl_line)
+        rendered_curl = template.render(template_name=template_name)
+        
+        # Extract just the URL from the curl command
+        url_match = re.search(r'"([^"]*)"', rendered_curl)
+        if url_match:
+            api_endpoint = url_match.group(1)
+            print(f"Generated API endpoint: {api_endpoint}")
+            return api_endpoint
+    except Exception as e:
+        print(f"Error loading fetch data template: {str(e)}")
+    return ""
 
 def generate_fallback_javascript(api_endpoint):
     """
@@ -176,10 +335,222 @@ document.addEventListener('DOMContentLoaded', function() {{
 }});
 """
 
+def generate_javascript(js_html, field_map, api_endpoint, field_types, structure_html, template_name=None):
+    """
+    Step 2: generates the script that loads the form's data and handles submission.
+    Scripts are cached by the structure of the form (see js_cache.py), so a form
+    with the same controls as an earlier one makes no LLM call.
+    
+    Args:
+        js_html (str): Page (or skeleton) shown to the model
+        field_map (str): "- name: type" line for every field of the form
+        api_endpoint (str): Endpoint the script fetches the form's data from
+        field_types (list): Field type of each field, for model routing
+        structure_html (str): Page whose structure keys the script cache
+        template_name (str): The template name, kept out of the cache key
+    
+    Returns:
+        str: The JavaScript; the fallback script if generation fails
+    """
+    # A form with the same controls, ids and endpoint as an earlier one reuses its script
+    script_cache = js_cache.get_cache()
+    if script_cache:
+        js_signature, js_structure = js_cache.form_signature(structure_html, api_endpoint, template_name)
+        cached_js = script_cache.get(js_signature, api_endpoint)
+        if cached_js:
+            print("Reusing cached JavaScript for a form with the same structure")
+            return cached_js
+    
+    js_content, passed = request_javascript(js_html, field_map, api_endpoint, field_types)
+    if js_content is None:
+        return generate_fallback_javascript(api_endpoint)
+    if script_cache and passed:
+        script_cache.set(js_signature, js_structure, js_content, api_endpoint, template_name)
+    return js_content
+
+def cache_javascript(structure_html, js_content, api_endpoint, template_name=None):
+    """
+    Store a script generated elsewhere (the concurrent pipeline) under the
+    structure of the page it is used with
+    
+    Args:
+        structure_html (str): Page whose structure keys the script cache
+        js_content (str): The script
+        api_endpoint (str): Endpoint the script fetches the form's data from
+        template_name (str): The template name, kept out of the cache key
+    """
+    script_cache = js_cache.get_cache()
+    if not script_cache:
+        return
+    js_signature, js_structure = js_cache.form_signature(structure_html, api_endpoint, template_name)
+    script_cache.set(js_signature, js_structure, js_content, api_endpoint, template_name)
+
+def generate_contract_javascript(contract, api_endpoint, field_types):
+    """
+    Concurrent pipeline: generates the script from the minimal page built
+    from the field contract, while the HTML is still being generated. The
+    script cache is not used, since the real page is not known yet.
+    
+    Args:
+        contract (dict): Field contract from field_contract.plan_contract()
+        api_endpoint (str): Endpoint the script fetches the form's data from
+        field_types (list): Field type of each field, for model routing
+    
+    Returns:
+        tuple: (JavaScript or None, whether it passed the quality gate), as
+               returned by request_javascript()
+    """
+    contract_page = field_contract.contract_html(contract)
+    return request_javascript(contract_page, field_contract.field_map(contract), api_endpoint, field_types)
+
+def settle_script_future(js_future):
+    """
+    Cancel a concurrently generated script that will not be used, or wait for
+    it if its LLM call is already running, so the call does not outlive the
+    request (and the admission slot) that started it.
+    
+    Args:
+        js_future (Future): The pending script, or None
+    """
+    if js_future is None or js_future.cancel():
+        return
+    try:
+        js_future.result()
+    except Exception as e:
+        print(f"Discarded concurrent JavaScript generation failed: {str(e)}")
+
+def request_javascript(js_html, field_map, api_endpoint, field_types):
+    """
+    Asks the LLM for the form's script, escalating through the routed models
+    until one passes the JavaScript quality gate. The script cache is not used.
+    
+    Args:
+        js_html (str): Page (or skeleton) shown to the model
+        field_map (str): "- name: type" line for every field of the form
+        api_endpoint (str): Endpoint the script fetches the form's data from
+        field_types (list): Field type of each field, for model routing
+    
+    Returns:
+        tuple: (JavaScript, or None if no usable script was generated,
+                whether it passed the quality gate)
+    """
+    try:
+        print("Making second API call to OpenAI for JavaScript generation...")
+        
+        # Read JavaScript generation prompt template
+        try:
+            with open('javascript_generation_prompt.txt', 'r', encoding='utf-8') as f:
+                js_prompt_template = f.read().strip()
+            print(f"Successfully loaded JavaScript prompt template ({len(js_prompt_template)} characters)")
+        except Exception as e:
+            print(f"Error loading JavaScript prompt template: {str(e)}")
+            # Use fallback if prompt template fails
+            print("Using fallback JavaScript due to prompt template error...")
+            return None, False
+        
+        # Create JavaScript generation prompt
+        js_prompt = js_prompt_template.format(
+            api_endpoint=api_endpoint if api_endpoint else "No API endpoint provided",
+            html_content=js_html,
+            field_map=field_map
+        )
+        
+        js_route = model_router.choose_route('javascript', field_types)
+        js_content = ""
+        used_model = None
+        problems = []
+        for attempt, (model, max_tokens) in enumerate(js_route['models'], start=1):
+            try:
+                js_response = llm_client.chat_completion(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": "You are a JavaScript expert. You MUST generate COMPLETE JavaScript code, not fragments. Always include all necessary functions and complete all code blocks."},
+                        {"role": "user", "content": js_prompt}
+                    ],
+                    temperature=0.1,
+                    max_tokens=max_tokens,
+                    presence_penalty=0.0,
+                    frequency_penalty=0.0,
+                    top_p=0.9
+                )
+            except llm_client.CircuitOpenError:
+                raise
+            except Exception as e:
+                print(f"Error generating JavaScript content with {model}: {str(e)}")
+                problems = [str(e)]
+                continue
+            
+            print(f"Received JavaScript response from OpenAI (length: {len(js_response.choices[0].message.content)} characters)")
+            
+            js_content = js_response.choices[0].message.content.strip()
+            
+            # Debug: Print the raw response
+            print(f"Raw JavaScript response (first 200 chars): '{js_content[:200]}'")
+            
+            # Extract JavaScript from markdown if present
+            if "```javascript" in js_content:
+                js_content = js_content.split("```javascript")[1].split("```")[0].strip()
+                print("Extracted JavaScript from ```javascript``` block")
+            elif "```js" in js_content:
+                js_content = js_content.split("```js")[1].split("```")[0].strip()
+                print("Extracted JavaScript from ```js``` block")
+            else:
+                print("No markdown code blocks found, using raw content")
+            
+            # Debug: Print the extracted content
+            print(f"Extracted JavaScript content (first 200 chars): '{js_content[:200]}'")
+            
+            used_model = model
+            problems = model_router.check_javascript(js_content, api_endpoint)
+            if not problems:
+                break
+            print(f"Quality gate failed for {model} JavaScript: {problems}")
+        
+        if used_model:
+            model_router.routing_stats.record(js_route, used_model, attempt, not problems)
+        else:
+            model_router.routing_stats.record_failure(js_route, problems)
+        
+        # Validate JavaScript content
+        if not js_content or len(js_content) < 50:
+            print("Warning: Generated JavaScript content is too short or empty")
+            print(f"JavaScript content: '{js_content}'")
+            
+            # Generate fallback JavaScript
+            print("Generating fallback JavaScript due to incomplete LLM response...")
+            return None, False
+        return js_content, not problems
+    except Exception as e:
+        print(f"Error generating JavaScript content: {str(e)}")
+        print("Using fallback JavaScript due to LLM generation error...")
+        return None, False
+
+def insert_javascript(html_content, js_content):
+    """
+    Inserts a script before the page's closing </body> tag, or appends it
+    when the page has none.
+    
+    Args:
+        html_content (str): The page
+        js_content (str): The script
+    
+    Returns:
+        str: The page with the script
+    """
+    script = f"""
+    <script>
+{js_content}
+    </script>
+"""
+    if "</body>" in html_content:
+        return html_content.replace("</body>", script + "</body>")
+    return html_content + script
+
 def generate_html_from_custom_fields(custom_fields, template_name=None):
     """
     Generates HTML table structure and specs.json based on provided custom field information.
     Uses a two-step approach: first generate HTML, then generate JavaScript based on actual HTML structure.
+    specs.json is derived locally from the generated form rather than generated by the model.
     
     Args:
         custom_fields (str): A string containing field definitions provided by the user
@@ -190,25 +561,30 @@ def generate_html_from_custom_fields(custom_fields, template_name=None):
     """
     print(f"Starting HTML generation with custom fields: {custom_fields[:100]}...")
     
-    # Fetch options from API
-    print("Fetching options from API...")
-    options = fetch_options_from_api()
-    print(f"Fetched options: {options}")
-    
     # Read default field definitions from default_field.txt
     try:
         with open('default_field.txt', 'r') as f:
             default_field_definitions = f.read().strip()
         print(f"Successfully loaded default field definitions ({len(default_field_definitions)} characters)")
-        
-        # Replace options placeholder with actual options from API
-        default_field_definitions = replace_options_placeholder(default_field_definitions, options)
-        print(f"Updated field definitions with options: {default_field_definitions}")
-        
     except Exception as e:
         print(f"Error loading default field definitions: {str(e)}")
         return None
     
+    # specs.json keeps the definition lines as written, before options are resolved
+    field_lines = template_update.parse_field_lines(default_field_definitions + "\n" + custom_fields)
+    
+    # Resolve every option placeholder in the default and custom fields with one API call
+    placeholders = find_option_placeholders(default_field_definitions + "\n" + custom_fields)
+    if placeholders:
+        print(f"Fetching option sets from API: {placeholders}")
+        option_sets = fetch_option_sets(placeholders)
+        print(f"Fetched option sets: {option_sets}")
+        
+        # Replace options placeholders with actual options from API
+        default_field_definitions = replace_options_placeholder(default_field_definitions, option_sets)
+        custom_fields = replace_options_placeholder(custom_fields, option_sets)
+        print(f"Updated field definitions with options: {default_field_definitions}")
+    
     # Read default submit functionality 
     try:
         with open('default_submit_fn.txt', 'r') as f:
@@ -228,30 +604,7 @@ def generate_html_from_custom_fields(custom_fields, template_name=None):
         form_title = "Form lấy ý kiến khách hàng"
     
     # Read and prepare API fetch data template
-    api_endpoint = ""
-    if template_name:
-        try:
-            with open('default_fetch_data.txt', 'r', encoding='utf-8') as f:
-                fetch_data_content = f.read().strip()
-            
-            # Extract the API endpoint from the curl command
-            lines = fetch_data_content.split('\n')
-            curl_line = lines[0]  # First line contains the curl command
-            
-            # Use Jinja2 to render the template_name in the API endpoint
-            template = Template(curl_line)
-            rendered_curl = template.render(template_name=template_name)
-            
-            # Extract just the URL from the curl command
-            import re
-            url_match = re.search(r'"([^"]*)"', rendered_curl)
-            if url_match:
-                api_endpoint = url_match.group(1)
-                print(f"Generated API endpoint: {api_endpoint}")
-            
-        except Exception as e:
-            print(f"Error loading fetch data template: {str(e)}")
-            api_endpoint = ""
+    api_endpoint = build_api_endpoint(template_name) if template_name else ""
     
     # Read HTML generation prompt template from external file
     try:
@@ -271,180 +624,618 @@ def generate_html_from_custom_fields(custom_fields, template_name=None):
         api_endpoint=api_endpoint if api_endpoint else "No API endpoint provided"
     )
     
-    print(f"Prepared HTML prompt for GPT-4o ({len(html_prompt)} characters)")
+    print(f"Prepared HTML prompt ({len(html_prompt)} characters)")
     
-    # STEP 1: Generate HTML using GPT-4o
-    try:
-        print("Making first API call to OpenAI for HTML generation...")
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "user", "content": html_prompt}
-            ],
-            temperature=0.2,
-            max_tokens=10000,
-            presence_penalty=0.0,
-            frequency_penalty=0.0,
-            top_p=0.9
+    # Keyed on the finished prompt, so a change to the resolved options or to
+    # any default file is a new generation; the raw definition lines go into specs.json
+    key_hash = hashlib.sha256(f"{template_name}\n{chr(10).join(field_lines)}\n{html_prompt}".encode('utf-8'))
+    for path in GENERATION_SUPPORT_FILES:
+        try:
+            with open(path, 'rb') as f:
+                key_hash.update(f.read())
+        except OSError:
+            key_hash.update(b'\0')
+    cache_key = key_hash.hexdigest()
+    cached = generation_cache.get(cache_key)
+    if cached is not None:
+        print("Reusing a recent generation for the same fields")
+        return cached
+    
+    # Route simple forms to the fast model; its output must pass the local
+    # quality gate, otherwise the request escalates to the strong model
+    prompt_lines = template_update.parse_field_lines(default_field_definitions + "\n" + custom_fields)
+    field_types = [model_router.infer_field_type(line) for line in prompt_lines]
+    html_route = model_router.choose_route('html', field_types)
+    
+    # Very large forms do not fit one response: the page is first generated as
+    # a skeleton with the default fields and the first field of each type (so
+    # its CSS covers every type), and the other rows are added in parallel chunks
+    chunk_lines = []
+    # Lines the generated page itself must cover
+    html_lines, html_prompt_lines = field_lines, prompt_lines
+    if len(field_lines) > CHUNKED_GENERATION_THRESHOLD:
+        default_count = len(template_update.parse_field_lines(default_field_definitions))
+        skeleton = set(range(default_count))
+        seen_types = set(field_types[:default_count])
+        for index in range(default_count, len(field_lines)):
+            if field_types[index] not in seen_types and len(skeleton) < default_count + GENERATION_CHUNK_SIZE:
+                skeleton.add(index)
+                seen_types.add(field_types[index])
+        chunk_lines = [line for index, line in enumerate(field_lines) if index not in skeleton]
+        html_lines = [field_lines[index] for index in sorted(skeleton)]
+        html_prompt_lines = [prompt_lines[index] for index in sorted(skeleton)]
+        html_prompt = html_prompt_template.format(
+            default_field_definitions=default_field_definitions,
+            custom_fields="\n".join(prompt_lines[index] for index in sorted(skeleton) if index >= default_count),
+            submit_functionality=submit_functionality,
+            form_title=form_title,
+            api_endpoint=api_endpoint if api_endpoint else "No API endpoint provided"
         )
-        print(f"Received HTML response from OpenAI (length: {len(response.choices[0].message.content)} characters)")
-        
-        full_content = response.choices[0].message.content
+        html_route = model_router.choose_route('html', [field_types[index] for index in sorted(skeleton)])
+        print(f"Chunked generation: {len(skeleton)} skeleton fields, {len(chunk_lines)} fields in chunks of {GENERATION_CHUNK_SIZE}")
+    
+    # STEP 1: Generate HTML, assembling it from cached field rows when most
+    # fields were generated before
+    html_content = ""
+    specs_content = ""
+    used_model = None
+    problems = []
+    assembled = assemble_from_fragments(field_lines, prompt_lines)
+    
+    # Concurrent pipeline: the field contract is fixed locally, and the script
+    # is generated from it while the HTML is being generated. Assembled pages
+    # keep the names their rows were cached with, so they use the sequential
+    # pipeline, as do chunked forms.
+    contract = None
+    js_future = None
+    if CONCURRENT_PIPELINE and not chunk_lines and not assembled:
+        contract = field_contract.plan_contract(prompt_lines)
+        html_prompt = f"{html_prompt}\n\n{field_contract.format_for_prompt(contract)}"
+        pipeline_pool = ThreadPoolExecutor(max_workers=1)
+        js_future = pipeline_pool.submit(generate_contract_javascript, contract, api_endpoint, field_types)
+        pipeline_pool.shutdown(wait=False)
+        print(f"Concurrent pipeline: generating JavaScript for {len(contract['fields'])} contracted fields "
+              f"alongside the HTML")
+    
+    if assembled:
+        html_content, specs_content = assembled
+    else:
+        for attempt, (model, max_tokens) in enumerate(html_route['models'], start=1):
+            try:
+                print(f"Making first API call to OpenAI for HTML generation with {model}...")
+                response = llm_client.chat_completion(
+                    model=model,
+                    messages=[
+                        {"role": "user", "content": html_prompt}
+                    ],
+                    temperature=0.2,
+                    max_tokens=max_tokens,
+                    presence_penalty=0.0,
+                    frequency_penalty=0.0,
+                    top_p=0.9
+                )
+                print(f"Received HTML response from OpenAI (length: {len(response.choices[0].message.content)} characters)")
+            
+                full_content = response.choices[0].message.content
+            except llm_client.CircuitOpenError as e:
+                print(f"Error generating HTML content: {str(e)}")
+                settle_script_future(js_future)
+                return None
+            except Exception as e:
+                print(f"Error generating HTML content with {model}: {str(e)}")
+                problems = [str(e)]
+                continue
         
-        # Extract HTML content
-        html_content = ""
-        if "```html" in full_content:
-            html_section = full_content.split("```html")[1].split("```")[0].strip()
-            html_content = html_section
-            print("Extracted HTML content from markdown code block")
+            # Extract HTML content
+            html_content = ""
+            if "```html" in full_content:
+                html_section = full_content.split("```html")[1].split("```")[0].strip()
+                html_content = html_section
+                print("Extracted HTML content from markdown code block")
         
-        # Extract JSON content
-        specs_content = ""
-        if "```json" in full_content:
-            json_section = full_content.split("```json")[1].split("```")[0].strip()
-            specs_content = json_section
-            print("Extracted JSON content from markdown code block")
+            # Derive specs.json from the form itself so it always matches the inputs
+            specs = template_update.attribute_specs(form_analyzer.derive_specs(html_content), field_lines, prompt_lines)
+            specs_content = json.dumps(specs, ensure_ascii=False, indent=4) if specs else ""
+            print(f"Derived {len(specs)} specs.json entries from the HTML")
         
-        if not html_content:
-            print("Failed to extract HTML content from response")
-            return None
-            
-    except Exception as e:
-        print(f"Error generating HTML content: {str(e)}")
+            used_model = model
+            problems = model_router.check_generated_form(html_content, specs_content, html_lines, html_prompt_lines)
+            if not problems:
+                break
+            print(f"Quality gate failed for {model} output: {problems}")
+    
+    if used_model:
+        model_router.routing_stats.record(html_route, used_model, attempt, not problems)
+        if html_content and not problems:
+            cache_fragments(html_content, specs, field_lines, prompt_lines)
+    elif not assembled:
+        model_router.routing_stats.record_failure(html_route, problems)
+    if not html_content:
+        print("Failed to extract HTML content from response")
+        settle_script_future(js_future)
         return None
     
+    # The JavaScript step sees the skeleton and a field map rather than the full page
+    js_html = html_content
+    if chunk_lines and not assembled:
+        stitched = stitch_chunked_form(html_content, specs, field_lines, prompt_lines, chunk_lines)
+        if stitched is None:
+            settle_script_future(js_future)
+            return None
+        html_content, specs_content = stitched
+    field_map = "\n".join(f"- {entry['ten_field']}: {entry['kieu_du_lieu']}" for entry in json.loads(specs_content or "[]"))
+    
+    # In the concurrent pipeline the script was generated from the field
+    # contract; it is only used if the page honours the contract
+    js_content = None
+    if js_future is not None:
+        contract_problems = field_contract.verify_html(html_content, contract)
+        if contract_problems:
+            print(f"Page does not honour the field contract ({'; '.join(contract_problems[:3])}), "
+                  f"generating JavaScript from the page instead")
+        else:
+            js_content, passed = js_future.result()
+            if js_content is not None:
+                print("Page honours the field contract, using the concurrently generated JavaScript")
+                # Cached under the structure of the page it is used with
+                if passed:
+                    cache_javascript(html_content, js_content, api_endpoint, template_name)
+    
     # STEP 2: Generate JavaScript based on actual HTML structure
-    try:
-        print("Making second API call to OpenAI for JavaScript generation...")
+    if js_content is None:
+        js_content = generate_javascript(js_html, field_map, api_endpoint, field_types, html_content, template_name)
+        settle_script_future(js_future)
+    html_content = insert_javascript(html_content, js_content)
+    print("Successfully integrated JavaScript into HTML")
+    
+    if html_content and specs_content:
+        print(f"Successfully generated HTML content ({len(html_content)} characters)")
+        print(f"Successfully generated specs content ({len(specs_content)} characters)")
         
-        # Read JavaScript generation prompt template
-        try:
-            with open('javascript_generation_prompt.txt', 'r', encoding='utf-8') as f:
-                js_prompt_template = f.read().strip()
-            print(f"Successfully loaded JavaScript prompt template ({len(js_prompt_template)} characters)")
-        except Exception as e:
-            print(f"Error loading JavaScript prompt template: {str(e)}")
-            # Use fallback if prompt template fails
-            print("Using fallback JavaScript due to prompt template error...")
-            js_content = generate_fallback_javascript(api_endpoint)
-        else:
-            # Create JavaScript generation prompt
-            js_prompt = js_prompt_template.format(
-                api_endpoint=api_endpoint if api_endpoint else "No API endpoint provided",
-                html_content=html_content
+        # STEP 3: Optimise the finished page (minify, optionally extract CSS, check size budget)
+        optimization = None
+        if OPTIMIZE_PAGES:
+            optimized = page_optimizer.optimize_page(
+                html_content,
+                budget=PAGE_BYTE_BUDGET,
+                extract_css=EXTRACT_PAGE_CSS
             )
-            
-            js_response = client.chat.completions.create(
-                model="gpt-4o",
+            optimization = optimized['stats']
+            print(f"Optimised page: {optimization['original_bytes']} -> {optimization['optimized_bytes']} bytes "
+                  f"(saved {optimization['saved_bytes']} bytes)")
+            if not optimization['within_budget']:
+                print(f"⚠️ Page exceeds byte budget: {optimization['optimized_bytes']} > {PAGE_BYTE_BUDGET} bytes")
+                if PAGE_BUDGET_REJECT:
+                    return None
+            html_content = optimized['html']
+        
+        result = {
+            'html': html_content,
+            'specs': specs_content,
+            'optimization': optimization
+        }
+        generation_cache.set(cache_key, result)
+        return result
+    else:
+        print("Failed to generate complete content")
+        return None
+
+def generate_rows_from_custom_fields(field_lines, existing_html):
+    """
+    Generates table rows for a subset of fields, styled to match an existing
+    page, and derives their specs.json entries. Used for incremental template updates.
+    
+    Args:
+        field_lines (list): Field definition lines to generate rows for
+        existing_html (str): The page the rows will be inserted into
+    
+    Returns:
+        dict: Dictionary with 'rows' (maps each field line to its row markup) and
+              'specs' (list of specs.json entries), or None if error
+    """
+    try:
+        with open('row_prompt_template.txt', 'r', encoding='utf-8') as f:
+            row_prompt_template = f.read().strip()
+    except Exception as e:
+        print(f"Error loading row prompt template: {str(e)}")
+        return None
+    
+    # Resolve option placeholders for the prompt only; specs keep the raw lines
+    field_definitions = "\n".join(field_lines)
+    placeholders = find_option_placeholders(field_definitions)
+    if placeholders:
+        field_definitions = replace_options_placeholder(field_definitions, fetch_option_sets(placeholders))
+    prompt_lines = template_update.parse_field_lines(field_definitions)
+    
+    existing_names = sorted(template_update.find_field_rows(existing_html))
+    row_prompt = row_prompt_template.format(
+        field_definitions=field_definitions,
+        example_row=template_update.find_example_row(existing_html),
+        css_classes=", ".join(template_update.extract_css_classes(existing_html)) or "(none)",
+        existing_field_names=", ".join(existing_names) or "(none)"
+    )
+    print(f"Prepared row prompt for {len(field_lines)} field(s) ({len(row_prompt)} characters)")
+    
+    # Small chunks go to the fast model first and escalate when a row is
+    # missing or the markup does not parse
+    rows_route = model_router.choose_route('rows', [model_router.infer_field_type(line) for line in prompt_lines])
+    rows_html = ""
+    used_model = None
+    problems = []
+    for attempt, (model, max_tokens) in enumerate(rows_route['models'], start=1):
+        try:
+            response = llm_client.chat_completion(
+                model=model,
                 messages=[
-                    {"role": "system", "content": "You are a JavaScript expert. You MUST generate COMPLETE JavaScript code, not fragments. Always include all necessary functions and complete all code blocks."},
-                    {"role": "user", "content": js_prompt}
+                    {"role": "user", "content": row_prompt}
                 ],
-                temperature=0.1,
-                max_tokens=4000,  # Increased token limit
+                temperature=0.2,
+                max_tokens=max_tokens,
                 presence_penalty=0.0,
                 frequency_penalty=0.0,
                 top_p=0.9
             )
-            
-            print(f"Received JavaScript response from OpenAI (length: {len(js_response.choices[0].message.content)} characters)")
-            
-            js_content = js_response.choices[0].message.content.strip()
-            
-            # Debug: Print the raw response
-            print(f"Raw JavaScript response (first 200 chars): '{js_content[:200]}'")
-            
-            # Extract JavaScript from markdown if present
-            if "```javascript" in js_content:
-                js_content = js_content.split("```javascript")[1].split("```")[0].strip()
-                print("Extracted JavaScript from ```javascript``` block")
-            elif "```js" in js_content:
-                js_content = js_content.split("```js")[1].split("```")[0].strip()
-                print("Extracted JavaScript from ```js``` block")
-            else:
-                print("No markdown code blocks found, using raw content")
-            
-            # Debug: Print the extracted content
-            print(f"Extracted JavaScript content (first 200 chars): '{js_content[:200]}'")
-            
-            # Validate JavaScript content
-            if not js_content or len(js_content) < 50:
-                print("Warning: Generated JavaScript content is too short or empty")
-                print(f"JavaScript content: '{js_content}'")
-                
-                # Generate fallback JavaScript
-                print("Generating fallback JavaScript due to incomplete LLM response...")
-                js_content = generate_fallback_javascript(api_endpoint)
+            full_content = response.choices[0].message.content
+            print(f"Received row response from OpenAI (length: {len(full_content)} characters)")
+        except llm_client.CircuitOpenError as e:
+            print(f"Error generating rows: {str(e)}")
+            return None
+        except Exception as e:
+            print(f"Error generating rows with {model}: {str(e)}")
+            problems = [str(e)]
+            continue
         
-        # Insert JavaScript into HTML
-        if js_content:
-            # Find the closing </body> tag and insert JavaScript before it
-            if "</body>" in html_content:
-                html_content = html_content.replace("</body>", f"""
-    <script>
-{js_content}
-    </script>
-</body>""")
-            else:
-                # If no </body> tag, append at the end
-                html_content += f"""
-    <script>
-{js_content}
-    </script>
-"""
-            print("Successfully integrated JavaScript into HTML")
-        else:
-            print("Warning: No JavaScript content available, using fallback")
-            # Use fallback JavaScript
-            fallback_js = generate_fallback_javascript(api_endpoint)
-            if "</body>" in html_content:
-                html_content = html_content.replace("</body>", f"""
-    <script>
-{fallback_js}
-    </script>
-</body>""")
-            else:
-                html_content += f"""
-    <script>
-{fallback_js}
-    </script>
-"""
-            print("Successfully integrated fallback JavaScript into HTML")
-            
+        if "```html" not in full_content:
+            print(f"Failed to extract rows from {model} response")
+            problems = ["No ```html block in the response"]
+            continue
+        rows_html = full_content.split("```html")[1].split("```")[0].strip()
+        used_model, used_attempt = model, attempt
+        problems = model_router.check_generated_rows(rows_html, field_lines, prompt_lines)
+        if not problems:
+            break
+        print(f"Quality gate failed for {model} rows: {problems}")
+    
+    if not used_model:
+        model_router.routing_stats.record_failure(rows_route, problems)
+        return None
+    model_router.routing_stats.record(rows_route, used_model, used_attempt, not problems)
+    
+    # Derive the spec entries from the rows and attribute each to the line it
+    # came from; rows without a recognisable data-mo-ta go to the last line
+    specs = template_update.attribute_specs(form_analyzer.derive_specs(rows_html), field_lines, prompt_lines)
+    for entry in specs:
+        if entry.get('mo_ta') not in field_lines:
+            entry['mo_ta'] = field_lines[-1]
+    
+    # Cut the generated fragment into the rows belonging to each field line
+    row_spans = template_update.find_field_rows(rows_html)
+    rows = {}
+    for entry in specs:
+        span = row_spans.get(entry['ten_field'])
+        if span is None:
+            print(f"Warning: no generated row found for field '{entry['ten_field']}'")
+            continue
+        row_markup = template_update.extract_row(rows_html, span)
+        existing = rows.setdefault(entry['mo_ta'], [])
+        if row_markup not in existing:
+            existing.append(row_markup)
+    
+    missing = [line for line in field_lines if line not in rows]
+    if missing:
+        print(f"Failed to generate rows for: {missing}")
+        return None
+    
+    return {
+        'rows': {line: "\n".join(markup) for line, markup in rows.items()},
+        'specs': specs
+    }
+
+def generate_rows_in_chunks(field_lines, existing_html):
+    """
+    Generates rows for many fields with parallel calls of at most
+    GENERATION_CHUNK_SIZE fields each, so the time taken grows with the chunk
+    size rather than the number of fields. Chunks cannot see each other's
+    input names, so clashing names are renamed afterwards.
+    
+    Args:
+        field_lines (list): Field definition lines to generate rows for
+        existing_html (str): The page the rows will be inserted into
+    
+    Returns:
+        dict: Same as generate_rows_from_custom_fields(), or None if any chunk failed
+    """
+    field_lines = list(dict.fromkeys(field_lines))
+    chunks = [field_lines[i:i + GENERATION_CHUNK_SIZE] for i in range(0, len(field_lines), GENERATION_CHUNK_SIZE)]
+    if len(chunks) <= 1:
+        return generate_rows_from_custom_fields(field_lines, existing_html)
+    
+    print(f"Generating {len(field_lines)} rows in {len(chunks)} parallel chunks")
+    with ThreadPoolExecutor(max_workers=min(GENERATION_CHUNK_WORKERS, len(chunks))) as executor:
+        results = list(executor.map(lambda chunk: generate_rows_from_custom_fields(chunk, existing_html), chunks))
+    if any(result is None for result in results):
+        print("Failed to generate rows for at least one chunk")
+        return None
+    
+    used_names = set()
+    rows = {}
+    specs = []
+    for result in results:
+        chunk_rows = dict(result['rows'])
+        for entry in result['specs']:
+            name = entry['ten_field']
+            if name in used_names:
+                suffix = 2
+                while f"{name}_{suffix}" in used_names:
+                    suffix += 1
+                entry['ten_field'] = f"{name}_{suffix}"
+                chunk_rows[entry['mo_ta']] = template_update.rename_field(chunk_rows[entry['mo_ta']], name, entry['ten_field'])
+                print(f"Renamed clashing field '{name}' to '{entry['ten_field']}'")
+            used_names.add(entry['ten_field'])
+            specs.append(entry)
+        rows.update(chunk_rows)
+    return {'rows': rows, 'specs': specs}
+
+def stitch_chunked_form(skeleton_html, skeleton_specs, field_lines, prompt_lines, chunk_lines):
+    """
+    Completes a page skeleton with the rows of the remaining fields, generated
+    in parallel chunks, keeping the fields in definition order
+    
+    Args:
+        skeleton_html (str): Generated page holding the skeleton fields
+        skeleton_specs (list): specs.json entries derived from the skeleton
+        field_lines (list): All field definition lines of the form
+        prompt_lines (list): The same lines with option placeholders resolved
+        chunk_lines (list): The lines not in the skeleton
+    
+    Returns:
+        tuple: (html, specs content), or None if a chunk failed or the
+            stitched page fails the quality gate
+    """
+    generated = generate_rows_in_chunks(chunk_lines, skeleton_html)
+    if generated is None:
+        return None
+    
+    rows = {line: row['markup'] for line, row in template_update.rows_by_line(skeleton_html, skeleton_specs).items()}
+    rows.update(generated['rows'])
+    ordered_lines = list(dict.fromkeys(field_lines))
+    shell = template_update.make_shell(skeleton_html)
+    if shell and all(line in rows for line in ordered_lines):
+        html_content = template_update.fill_shell(shell, [rows[line] for line in ordered_lines])
+    else:
+        # Some skeleton rows cannot be told apart; keep them and append the rest
+        html_content = template_update.splice_rows(
+            skeleton_html, added=[generated['rows'][line] for line in dict.fromkeys(chunk_lines)])
+    
+    specs = template_update.attribute_specs(form_analyzer.derive_specs(html_content), field_lines, prompt_lines)
+    specs_content = json.dumps(specs, ensure_ascii=False, indent=4) if specs else ""
+    problems = model_router.check_generated_form(html_content, specs_content, field_lines, prompt_lines)
+    if problems:
+        print(f"Quality gate failed for stitched form: {problems}")
+        return None
+    print(f"Stitched form with {len(specs)} fields")
+    return html_content, specs_content
+
+def cache_fragments(html_content, specs, field_lines, prompt_lines):
+    """
+    Store the field rows of a generated page in the fragment cache, together
+    with the page shell they were generated in
+    
+    Args:
+        html_content (str): Generated HTML (before JavaScript is added)
+        specs (list): specs.json entries derived from the HTML
+        field_lines (list): Field definition lines of the form
+        prompt_lines (list): The same lines with option placeholders resolved
+    """
+    cache = fragment_cache.get_cache()
+    shell = template_update.make_shell(html_content) if cache else None
+    if not shell:
+        return
+    
+    # Rows shared by several lines are not reusable and are left out
+    keys = dict(zip(field_lines, (fragment_cache.fragment_key(line) for line in prompt_lines)))
+    fragments = {
+        keys[line]: fragment
+        for line, fragment in template_update.rows_by_line(html_content, specs).items()
+        if line in keys
+    }
+    try:
+        cache.store_page(shell, fragments)
+        print(f"Cached {len(fragments)} field row(s) for reuse")
     except Exception as e:
-        print(f"Error generating JavaScript content: {str(e)}")
-        print("Using fallback JavaScript due to LLM generation error...")
-        
-        # Use fallback JavaScript if generation fails
+        print(f"Error caching field rows: {str(e)}")
+
+def assemble_from_fragments(field_lines, prompt_lines):
+    """
+    Builds the form HTML from cached field rows, generating rows only for the
+    fields that are not cached yet. The assembled page must pass the same
+    quality gate as a generated one.
+    
+    Args:
+        field_lines (list): Field definition lines of the form
+        prompt_lines (list): The same lines with option placeholders resolved
+    
+    Returns:
+        tuple: (html, specs content), or None if too few fields are cached or
+               assembly failed, in which case the whole page is generated
+    """
+    cache = fragment_cache.get_cache()
+    if cache is None or not field_lines:
+        return None
+    
+    keys = [fragment_cache.fragment_key(line) for line in prompt_lines]
+    try:
+        found = cache.best_shell(keys)
+    except Exception as e:
+        print(f"Error reading fragment cache: {str(e)}")
+        return None
+    if not found:
+        return None
+    shell_id, shell, fragments = found
+    
+    # Take cached rows in form order, skipping rows whose input names clash
+    # with a row already taken
+    rows = {}
+    used_names = set()
+    for line, key in zip(field_lines, keys):
+        fragment = fragments.get(key)
+        if fragment is None or line in rows:
+            continue
+        names = {entry['ten_field'] for entry in fragment['specs']}
+        if names & used_names:
+            continue
+        rows[line] = fragment['markup']
+        used_names |= names
+    
+    coverage = len(rows) / len(field_lines)
+    if coverage < FRAGMENT_MIN_COVERAGE:
+        print(f"Only {len(rows)}/{len(field_lines)} field rows cached, generating the whole page")
+        return None
+    print(f"Assembling form from {len(rows)}/{len(field_lines)} cached field rows")
+    
+    missing = [line for line in dict.fromkeys(field_lines) if line not in rows]
+    if missing:
+        partial_html = template_update.fill_shell(shell, [rows[line] for line in field_lines if line in rows])
+        generated = generate_rows_in_chunks(missing, partial_html)
+        if generated is None:
+            return None
+        rows.update(generated['rows'])
+        new_fragments = {}
+        for line, key in zip(field_lines, keys):
+            if line in missing:
+                new_fragments[key] = {
+                    'markup': generated['rows'][line],
+                    'specs': [entry for entry in generated['specs'] if entry['mo_ta'] == line]
+                }
         try:
-            fallback_js = generate_fallback_javascript(api_endpoint)
-            if "</body>" in html_content:
-                html_content = html_content.replace("</body>", f"""
-    <script>
-{fallback_js}
-    </script>
-</body>""")
-            else:
-                html_content += f"""
-    <script>
-{fallback_js}
-    </script>
-"""
-            print("Successfully integrated fallback JavaScript into HTML")
-        except Exception as fallback_error:
-            print(f"Error generating fallback JavaScript: {str(fallback_error)}")
-            # Continue with HTML only if both fail
+            cache.store_fragments(shell_id, new_fragments)
+        except Exception as e:
+            print(f"Error caching field rows: {str(e)}")
     
-    if html_content and specs_content:
-        print(f"Successfully generated HTML content ({len(html_content)} characters)")
-        print(f"Successfully generated specs content ({len(specs_content)} characters)")
-        return {
-            'html': html_content,
-            'specs': specs_content
-        }
-    else:
-        print("Failed to generate complete content")
+    html_content = template_update.fill_shell(shell, [rows[line] for line in dict.fromkeys(field_lines)])
+    specs = template_update.attribute_specs(form_analyzer.derive_specs(html_content), field_lines, prompt_lines)
+    specs_content = json.dumps(specs, ensure_ascii=False, indent=4) if specs else ""
+    problems = model_router.check_generated_form(html_content, specs_content, field_lines, prompt_lines)
+    if problems:
+        print(f"Quality gate failed for assembled form: {problems}")
+        return None
+    return html_content, specs_content
+
+def update_html_from_custom_fields(custom_fields, existing_html, existing_specs):
+    """
+    Incrementally updates an existing template for a new custom field list.
+    Only rows for added or changed fields are generated; they are spliced into
+    the existing page and specs, leaving every other row, the CSS and the
+    JavaScript untouched. The generated JavaScript fills and collects fields by
+    input name, so new rows are picked up without regenerating the script.
+    
+    Args:
+        custom_fields (str): The new custom field definitions, one per line
+        existing_html (str): Current content of the template's index.html
+        existing_specs (str): Current content of the template's specs.json
+    
+    Returns:
+        dict: Dictionary containing 'html', 'specs' and 'diff', or None if error
+    """
+    try:
+        specs = json.loads(existing_specs)
+    except Exception as e:
+        print(f"Error parsing existing specs: {str(e)}")
+        return None
+    
+    try:
+        with open('default_field.txt', 'r') as f:
+            default_lines = template_update.parse_field_lines(f.read())
+    except Exception as e:
+        print(f"Error loading default field definitions: {str(e)}")
+        return None
+    
+    new_lines = template_update.parse_field_lines(custom_fields)
+    diff = template_update.diff_fields(new_lines, specs, default_lines)
+    print(f"Field diff: {len(diff['added'])} added, {len(diff['changed'])} changed, "
+          f"{len(diff['removed'])} removed, {len(diff['unchanged'])} unchanged")
+    
+    lines_to_generate = diff['added'] + [line for line, _ in diff['changed']]
+    generated = {'rows': {}, 'specs': []}
+    if lines_to_generate:
+        generated = generate_rows_in_chunks(lines_to_generate, existing_html)
+        if not generated:
+            return None
+    
+    # Splice rows into the page
+    html_content = template_update.splice_rows(
+        existing_html,
+        removed=diff['removed'],
+        replaced=[(names, generated['rows'][line]) for line, names in diff['changed']],
+        added=[generated['rows'][line] for line in diff['added']]
+    )
+    
+    # Patch specs: changed entries are replaced in place, added ones appended
+    new_entries = {}
+    for entry in generated['specs']:
+        new_entries.setdefault(entry['mo_ta'], []).append(entry)
+    dropped = set(diff['removed'])
+    replacements = {}
+    for line, names in diff['changed']:
+        dropped.update(names[1:])
+        replacements[names[0]] = new_entries.get(line, [])
+    
+    updated_specs = []
+    for entry in specs:
+        if entry['ten_field'] in dropped:
+            continue
+        if entry['ten_field'] in replacements:
+            updated_specs.extend(replacements[entry['ten_field']])
+        else:
+            updated_specs.append(entry)
+    for line in diff['added']:
+        updated_specs.extend(new_entries.get(line, []))
+    
+    return {
+        'html': html_content,
+        'specs': json.dumps(updated_specs, ensure_ascii=False, indent=4),
+        'diff': diff
+    }
+
+def adapt_html_from_template(custom_fields, source_html, source_specs, source_name, template_name):
+    """
+    Builds a new template from a similar existing one instead of generating it.
+    The page is pointed at the new template's API endpoint, custom field lines
+    that paraphrase one of the source's lines are mapped onto that line, and
+    only the remaining differences go through the incremental update.
+    
+    Args:
+        custom_fields (str): Custom field definitions submitted for the new template
+        source_html (str): Content of the similar template's index.html
+        source_specs (str): Content of the similar template's specs.json
+        source_name (str): The similar template's name
+        template_name (str): The new template's name
+    
+    Returns:
+        dict: Dictionary containing 'html', 'specs', 'diff' and 'custom_fields'
+              (the field list the new template was built from), or None if error
+    """
+    old_endpoint = build_api_endpoint(source_name)
+    new_endpoint = build_api_endpoint(template_name)
+    if old_endpoint and new_endpoint:
+        source_html = re.sub(re.escape(old_endpoint) + r'(?![\w-])', new_endpoint, source_html)
+    
+    try:
+        source_lines = [entry['mo_ta'] for entry in json.loads(source_specs) if entry.get('mo_ta')]
+    except Exception as e:
+        print(f"Error parsing source specs: {str(e)}")
         return None
+    
+    matches = similarity_index.match_lines(template_update.parse_field_lines(custom_fields), source_lines)
+    custom_fields = "\n".join(
+        matches.get(line, line) for line in template_update.parse_field_lines(custom_fields)
+    )
+    print(f"Adapting template '{source_name}': {len(matches)} field(s) reused as they are")
+    
+    adapted = update_html_from_custom_fields(custom_fields, source_html, source_specs)
+    if adapted:
+        adapted['custom_fields'] = custom_fields
+    return adapted
 
 def generate_html_table():
     """
@@ -479,5 +1270,197 @@ def generate_html_table():
     else:
         return None
 
+def load_batch_items(source):
+    """
+    Collects the field definition files for a batch run.
+    
+    Args:
+        source (str): A directory of .txt field definition files, a JSON manifest
+            (a list of paths or of {"name": ..., "path": ...} objects), or a text
+            manifest with one path per line
+    
+    Returns:
+        list: List of {'name', 'path'} dictionaries, one per form to generate
+    """
+    if os.path.isdir(source):
+        paths = sorted(
+            os.path.join(source, name) for name in os.listdir(source)
+            if name.endswith('.txt')
+        )
+        entries = [{'path': path} for path in paths]
+    elif source.endswith('.json'):
+        with open(source, 'r', encoding='utf-8') as f:
+            entries = [entry if isinstance(entry, dict) else {'path': entry} for entry in json.load(f)]
+    else:
+        with open(source, 'r', encoding='utf-8') as f:
+            entries = [{'path': line.strip()} for line in f if line.strip() and not line.startswith('#')]
+    
+    # Relative manifest paths are resolved against the manifest's directory
+    base_dir = source if os.path.isdir(source) else os.path.dirname(os.path.abspath(source))
+    items = []
+    for entry in entries:
+        path = entry['path'] if os.path.isabs(entry['path']) else os.path.join(base_dir, entry['path'])
+        name = entry.get('name') or os.path.splitext(os.path.basename(path))[0]
+        items.append({'name': name, 'path': path})
+    return items
+
+def _file_sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _load_checkpoint(checkpoint_path):
+    if not os.path.exists(checkpoint_path):
+        return {}
+    try:
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error reading checkpoint {checkpoint_path}: {str(e)}. Starting from scratch.")
+        return {}
+
+def _save_checkpoint(checkpoint_path, checkpoint):
+    # Write to a temporary file first so an interrupted run never leaves a
+    # truncated checkpoint behind
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, checkpoint_path)
+
+def _generate_batch_item(item, output_dir):
+    """
+    Generates one form of a batch run and writes it to <output_dir>/<name>/.
+    Runs inside a pool worker, so it only takes and returns picklable values.
+    When output_dir is the live templates/ folder the form is published through
+    template_store, under the same per-name lock as /create and /update.
+    """
+    started = time.perf_counter()
+    with open(item['path'], 'r', encoding='utf-8') as f:
+        custom_fields = f.read().strip()
+    
+    reservation = None
+    if os.path.realpath(output_dir) == os.path.realpath(template_store.TEMPLATES_DIR):
+        # Claimed before generating, so a concurrent /create or /update of the
+        # same template is not overwritten and no tokens are spent on a clash
+        try:
+            reservation = _reserve_batch_template(item['name'])
+        except (template_store.TemplateBusyError, template_store.TemplateExistsError) as e:
+            print(f"Cannot publish '{item['name']}': {str(e)}")
+            return {'name': item['name'], 'status': 'failed', 'seconds': time.perf_counter() - started}
+    
+    try:
+        generated_content = generate_html_from_custom_fields(custom_fields, item['name'])
+        if not generated_content or 'html' not in generated_content:
+            return {'name': item['name'], 'status': 'failed', 'seconds': time.perf_counter() - started}
+        
+        files = {'index.html': generated_content['html']}
+        if generated_content.get('specs'):
+            files['specs.json'] = generated_content['specs']
+        if reservation is not None:
+            # Kept for similarity search, as /create does
+            files['custom_fields.txt'] = custom_fields
+            reservation.publish(files)
+        else:
+            item_dir = os.path.join(output_dir, item['name'])
+            os.makedirs(item_dir, exist_ok=True)
+            for file_name, content in files.items():
+                template_store.write_file_atomic(os.path.join(item_dir, file_name), content)
+    finally:
+        if reservation is not None:
+            reservation.release()
+    
+    return {'name': item['name'], 'status': 'done', 'seconds': time.perf_counter() - started}
+
+def _reserve_batch_template(name):
+    # Regenerating a published template is an update, anything else a new template
+    try:
+        return template_store.lock_existing(name)
+    except template_store.TemplateNotFoundError:
+        return template_store.reserve(name)
+
+def generate_batch(source, output_dir, workers=4, mode='thread'):
+    """
+    Generates many forms in parallel, one output folder per field definition file.
+    Progress is checkpointed to <output_dir>/.batch_checkpoint.json after every
+    item, so re-running the same command resumes an interrupted batch and skips
+    items that already finished with unchanged input.
+    
+    Args:
+        source (str): Directory or manifest of field definition files (see load_batch_items)
+        output_dir (str): Directory that receives <name>/index.html and <name>/specs.json
+        workers (int): Number of parallel workers
+        mode (str): 'thread' or 'process' pool
+    
+    Returns:
+        dict: Maps item name to its result ({'status', 'seconds'})
+    """
+    items = load_batch_items(source)
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint_path = os.path.join(output_dir, '.batch_checkpoint.json')
+    checkpoint = _load_checkpoint(checkpoint_path)
+    
+    pending = []
+    for item in items:
+        item['source_hash'] = _file_sha256(item['path'])
+        previous = checkpoint.get(item['name'])
+        finished = (
+            previous and previous.get('status') == 'done'
+            and previous.get('source_hash') == item['source_hash']
+            and os.path.exists(os.path.join(output_dir, item['name'], 'index.html'))
+        )
+        if finished:
+            print(f"Skipping '{item['name']}' (already generated)")
+        else:
+            pending.append(item)
+    
+    print(f"Batch: {len(items)} item(s), {len(items) - len(pending)} already done, "
+          f"{len(pending)} to generate with {workers} {mode} worker(s)")
+    
+    pool_class = ProcessPoolExecutor if mode == 'process' else ThreadPoolExecutor
+    results = {}
+    started = time.perf_counter()
+    with pool_class(max_workers=workers) as pool:
+        futures = {pool.submit(_generate_batch_item, item, output_dir): item for item in pending}
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Error generating '{item['name']}': {str(e)}")
+                result = {'name': item['name'], 'status': 'failed', 'seconds': 0.0}
+            results[item['name']] = result
+            checkpoint[item['name']] = {
+                'status': result['status'],
+                'seconds': round(result['seconds'], 3),
+                'source_hash': item['source_hash']
+            }
+            _save_checkpoint(checkpoint_path, checkpoint)
+    elapsed = time.perf_counter() - started
+    
+    # Report per-item timing and overall throughput
+    print("\nBatch summary:")
+    for name, result in sorted(results.items(), key=lambda pair: -pair[1]['seconds']):
+        print(f"  {name:<30} {result['status']:<8} {result['seconds']:8.2f}s")
+    done = sum(1 for result in results.values() if result['status'] == 'done')
+    failed = len(results) - done
+    throughput = done / elapsed if elapsed > 0 else 0.0
+    print(f"Generated {done} form(s), {failed} failed, in {elapsed:.2f}s "
+          f"({throughput:.2f} forms/s, {throughput * 60:.1f} forms/min)")
+    
+    return results
+
 if __name__ == "__main__":
-    generate_html_table() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate HTML forms from field definitions")
+    parser.add_argument('--batch', metavar='SOURCE',
+                        help="Directory or manifest of field definition files to generate in parallel")
+    parser.add_argument('--output-dir', default='generated',
+                        help="Output directory for batch results (default: generated)")
+    parser.add_argument('--workers', type=int, default=4,
+                        help="Number of parallel workers in batch mode (default: 4)")
+    parser.add_argument('--mode', choices=['thread', 'process'], default='thread',
+                        help="Worker pool type in batch mode (default: thread)")
+    args = parser.parse_args()
+    
+    if args.batch:
+        generate_batch(args.batch, args.output_dir, workers=args.workers, mode=args.mode)
+    else:
+        generate_html_table() 
\ No newline at end of file
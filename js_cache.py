@@ -0,0 +1,207 @@
+"""
+Cache of generated form scripts, keyed by the structure of the form.
+
+The script from step 2 of generation only depends on the form's controls
+(names, types, options, required flags), the element ids it looks up, and the
+API endpoint it fetches from. Two forms that agree on those, and differ only
+in labels, styling or layout, can use the same script. The signature of a
+form is a hash of that structure, with the template name in the endpoint
+replaced by a placeholder; the cached script stores the endpoint as a
+placeholder too, and the new form's endpoint is put back on a hit.
+
+Only scripts that passed the quality gate are cached. The cache is a SQLite
+database shared by worker processes; least recently used scripts are evicted
+beyond JS_CACHE_MAX_ENTRIES. Hit/miss counters are kept per process.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import form_analyzer
+
+JS_CACHE_PATH = os.getenv("JS_CACHE", "js_cache.db")
+JS_CACHE_MAX_ENTRIES = int(os.getenv("JS_CACHE_MAX_ENTRIES", "1000"))
+
+ENDPOINT_PLACEHOLDER = "__FORM_API_ENDPOINT__"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scripts (
+    signature TEXT PRIMARY KEY,
+    script TEXT NOT NULL,
+    structure TEXT NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS scripts_last_used ON scripts (last_used);
+"""
+
+
+def form_structure(html, api_endpoint, template_name=None):
+    """
+    Canonical description of what a form's script depends on
+
+    Args:
+        html (str): The generated page, without its script
+        api_endpoint (str): Endpoint the script fetches from
+        template_name (str, optional): Template name, replaced by a placeholder in the endpoint
+
+    Returns:
+        dict: 'endpoint' (pattern), 'fields' (sorted by name) and 'ids' (sorted)
+    """
+    analysis = form_analyzer.analyze_form(html)
+    endpoint = api_endpoint or ""
+    if template_name:
+        # The endpoint ends with the template name; earlier path segments may contain it too
+        endpoint = "{template_name}".join(endpoint.rsplit(template_name, 1))
+    fields = sorted(
+        [field['name'] or "", field['type'], list(field['options']), bool(field['required'])]
+        for field in analysis['fields']
+    )
+    return {'endpoint': endpoint, 'fields': fields, 'ids': sorted(set(analysis['ids']))}
+
+
+def form_signature(html, api_endpoint, template_name=None):
+    """
+    Signature of a form's structure (see form_structure)
+
+    Returns:
+        tuple: (signature, structure)
+    """
+    structure = form_structure(html, api_endpoint, template_name)
+    encoded = json.dumps(structure, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest(), structure
+
+
+class ScriptCache:
+    """
+    SQLite-backed store of generated scripts by form signature.
+
+    Args:
+        path (str): Database file
+        max_entries (int): Maximum number of cached scripts
+    """
+
+    def __init__(self, path, max_entries=1000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'skipped': 0, 'evictions': 0}
+
+    def _connection(self):
+        # Connections must not cross a fork, so each process opens its own
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, signature, api_endpoint):
+        """
+        Look up the script for a form signature
+
+        Args:
+            signature (str): From form_signature()
+            api_endpoint (str): Endpoint of the new form, put into the script
+
+        Returns:
+            str: The script, or None on a miss
+        """
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT script FROM scripts WHERE signature = ?", (signature,)).fetchone()
+            if row is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['hits'] += 1
+            with conn:
+                conn.execute("UPDATE scripts SET last_used = ?, hits = hits + 1 WHERE signature = ?",
+                             (time.time(), signature))
+        return row[0].replace(ENDPOINT_PLACEHOLDER, api_endpoint or "")
+
+    def set(self, signature, structure, script, api_endpoint, template_name=None):
+        """
+        Cache a script that passed the quality gate
+
+        Args:
+            signature (str): From form_signature()
+            structure (dict): From form_signature(), kept for inspection
+            script (str): The generated script
+            api_endpoint (str): Endpoint written into the script
+            template_name (str, optional): Template the script was generated for
+
+        Returns:
+            bool: True if stored; False if the script mentions its template
+                  other than through the endpoint, so it cannot be reused
+        """
+        if api_endpoint:
+            script = script.replace(api_endpoint, ENDPOINT_PLACEHOLDER)
+        # e.g. a second URL or a string built from the template name
+        if template_name and re.search(rf'(?<=[\'"`/]){re.escape(template_name)}(?=[\'"`/?#])', script):
+            with self._lock:
+                self._stats['skipped'] += 1
+            return False
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO scripts (signature, script, structure, last_used) VALUES (?, ?, ?, ?)",
+                    (signature, script, json.dumps(structure, ensure_ascii=False), time.time())
+                )
+                self._stats['stores'] += 1
+                self._stats['evictions'] += conn.execute(
+                    "DELETE FROM scripts WHERE signature IN "
+                    "(SELECT signature FROM scripts ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                ).rowcount
+        return True
+
+    def stats(self):
+        """
+        Hit statistics for this process and the size of the cache
+
+        Returns:
+            dict: Counters, hit rate and cached scripts
+        """
+        with self._lock:
+            conn = self._connection()
+            entries = conn.execute("SELECT COUNT(*) FROM scripts").fetchone()[0]
+            reused = conn.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM scripts WHERE hits > 0").fetchone()
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats.update({
+            'hit_rate': round(stats['hits'] / lookups, 3) if lookups else 0.0,
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'reused_scripts': reused[0],
+            'total_hits': reused[1]
+        })
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Return the shared script cache, opening it on first use
+
+    Returns:
+        ScriptCache: The cache, or None when JS_CACHE is set to an empty string
+    """
+    global _cache
+    if not JS_CACHE_PATH:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ScriptCache(JS_CACHE_PATH, JS_CACHE_MAX_ENTRIES)
+    return _cache
@@ -0,0 +1,109 @@
+"""
+JSON encoding and decoding with an optional fast backend.
+
+orjson, when installed, serialises mock payloads several times faster than the
+standard library and parses specs and LLM output faster too. Without it the
+same functions use the json module, so orjson is never required. Both
+backends write compact, non-ASCII-escaped UTF-8 and raise json.JSONDecodeError
+on invalid input.
+
+JSON_BACKEND selects the backend: "auto" (default, orjson if installed),
+"orjson" (fail at import if it is missing) or "stdlib".
+
+FastJSONProvider plugs the backend into Flask's jsonify and request.get_json.
+"""
+
+import json
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto')
+
+orjson = None
+if JSON_BACKEND in ('auto', 'orjson'):
+    try:
+        import orjson
+    except ImportError:
+        if JSON_BACKEND == 'orjson':
+            raise
+
+BACKEND = 'orjson' if orjson is not None else 'stdlib'
+
+
+def dumps_bytes(obj, sort_keys=False, indent=False, default=None):
+    """
+    Serialise obj to UTF-8 JSON
+
+    Args:
+        obj: Value to serialise
+        sort_keys (bool): Sort dictionary keys
+        indent (bool): Indent by two spaces instead of writing compact JSON
+        default (callable, optional): Converts values the backend cannot serialise
+
+    Returns:
+        bytes: The JSON document
+    """
+    if orjson is not None:
+        # Dates go to default so they are formatted the same with either backend
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=default, option=option)
+    return dumps(obj, sort_keys, indent, default).encode('utf-8')
+
+
+def dumps(obj, sort_keys=False, indent=False, default=None):
+    """Serialise obj to a JSON string; arguments as for dumps_bytes"""
+    if orjson is not None:
+        return dumps_bytes(obj, sort_keys, indent, default).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, sort_keys=sort_keys, default=default,
+                      indent=2 if indent else None, separators=None if indent else (',', ':'))
+
+
+def loads(data):
+    """
+    Parse a JSON document
+
+    Args:
+        data (str or bytes): The document
+
+    Returns:
+        The parsed value
+
+    Raises:
+        json.JSONDecodeError: The document is not valid JSON
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load(f):
+    """Parse the JSON document in an open file"""
+    return loads(f.read())
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider using the backend above. Keys are sorted as with Flask's
+    default provider; non-ASCII text is written as UTF-8 rather than escaped,
+    which is what JSON_AS_ASCII=False did before Flask 2.3.
+    """
+
+    ensure_ascii = False
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj, sort_keys=kwargs.get('sort_keys', self.sort_keys),
+                     indent=bool(kwargs.get('indent')), default=kwargs.get('default', self.default))
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = dumps_bytes(obj, sort_keys=self.sort_keys, indent=indent, default=self.default) + b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
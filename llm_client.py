@@ -0,0 +1,222 @@
+"""
+Shared access to the LLM with a circuit breaker in front of it.
+
+Every chat completion goes through chat_completion(), which records whether
+the call failed or was slow. When too many recent calls fail or are slow the
+circuit opens and calls fail immediately with CircuitOpenError, so callers go
+straight to their fallback paths instead of waiting for each request to time
+out. After a cool-down the circuit lets a few probe calls through (half-open)
+and closes again once they succeed.
+
+The OpenAI client (and the openai package itself, which is slow to import) is
+only created on first use, so importing a module that makes LLM calls stays
+cheap. Call preload() in a master process to create it once before forking
+workers.
+"""
+
+import collections
+import os
+import threading
+import time
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Return the shared OpenAI client, creating it on first use
+
+    Returns:
+        OpenAI: Client configured from OPENAI_API_KEY
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _client
+
+
+def preload():
+    """Create the OpenAI client now instead of on the first request"""
+    get_client()
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the LLM while the circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker over a rolling window of calls.
+
+    Each call asks allow_request() for a permit and hands it back to record().
+    A permit carries the state generation it was issued in and whether it is a
+    half-open probe, so only probe results close or reopen a half-open circuit,
+    and calls admitted before the last state change are not counted.
+
+    Args:
+        name (str): Name used in logs and stats
+        window_size (int): Number of recent calls considered
+        min_calls (int): Calls needed in the window before the circuit can open
+        failure_rate (float): Fraction of failed calls that opens the circuit
+        slow_call_seconds (float): Calls slower than this count as slow
+        slow_call_rate (float): Fraction of slow calls that opens the circuit
+        open_seconds (float): Time the circuit stays open before probing
+        half_open_calls (int): Probe calls allowed while half-open
+        clock (callable): Returns the current time in seconds (default: time.monotonic)
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, window_size=20, min_calls=5, failure_rate=0.5,
+                 slow_call_seconds=90.0, slow_call_rate=0.5, open_seconds=30.0, half_open_calls=1,
+                 clock=time.monotonic):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._calls = collections.deque(maxlen=window_size)
+        self._state = self.CLOSED
+        self._generation = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._short_circuited = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == self.OPEN and self.clock() - self._opened_at >= self.open_seconds:
+            self._enter(self.HALF_OPEN)
+            self._probes_in_flight = 0
+            print(f"Circuit '{self.name}' half-open: probing the LLM")
+        return self._state
+
+    def _enter(self, state):
+        self._state = state
+        self._generation += 1
+        self._calls.clear()
+
+    def allow_request(self):
+        """
+        Check whether a call may go through. In the half-open state this
+        reserves one of the probe slots.
+
+        Returns:
+            tuple or None: Permit (generation, is_probe) to pass to record(),
+                or None if the call must be skipped
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return (self._generation, False)
+            if state == self.HALF_OPEN and self._probes_in_flight < self.half_open_calls:
+                self._probes_in_flight += 1
+                return (self._generation, True)
+            self._short_circuited += 1
+            return None
+
+    def record(self, permit, succeeded, duration):
+        """
+        Record the outcome of a call that allow_request() let through
+
+        Args:
+            permit (tuple): Permit returned by allow_request() for the call
+            succeeded (bool): Whether the call returned a response
+            duration (float): Call duration in seconds
+        """
+        generation, is_probe = permit
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            # The circuit changed state while the call ran: its result says
+            # nothing about the current state
+            if generation != self._generation:
+                return
+            if is_probe:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if succeeded and not slow:
+                    self._enter(self.CLOSED)
+                    print(f"Circuit '{self.name}' closed: LLM recovered")
+                else:
+                    self._open()
+                return
+
+            self._calls.append((succeeded, slow))
+            if len(self._calls) >= self.min_calls:
+                failures = sum(1 for ok, _ in self._calls if not ok) / len(self._calls)
+                slow_calls = sum(1 for _, is_slow in self._calls if is_slow) / len(self._calls)
+                if failures >= self.failure_rate or slow_calls >= self.slow_call_rate:
+                    self._open()
+
+    def _open(self):
+        self._enter(self.OPEN)
+        self._opened_at = self.clock()
+        print(f"Circuit '{self.name}' open: skipping LLM calls for {self.open_seconds:g}s")
+
+    def stats(self):
+        """Return the breaker state and recent call counters"""
+        with self._lock:
+            return {
+                'name': self.name,
+                'state': self._current_state(),
+                'window_calls': len(self._calls),
+                'window_failures': sum(1 for ok, _ in self._calls if not ok),
+                'window_slow_calls': sum(1 for _, slow in self._calls if slow),
+                'short_circuited_total': self._short_circuited
+            }
+
+
+# One breaker per process, shared by every LLM caller
+llm_breaker = CircuitBreaker(
+    'openai',
+    window_size=int(os.getenv('LLM_BREAKER_WINDOW', '20')),
+    min_calls=int(os.getenv('LLM_BREAKER_MIN_CALLS', '5')),
+    failure_rate=float(os.getenv('LLM_BREAKER_FAILURE_RATE', '0.5')),
+    slow_call_seconds=float(os.getenv('LLM_BREAKER_SLOW_SECONDS', '90')),
+    slow_call_rate=float(os.getenv('LLM_BREAKER_SLOW_RATE', '0.5')),
+    open_seconds=float(os.getenv('LLM_BREAKER_OPEN_SECONDS', '30')),
+    half_open_calls=int(os.getenv('LLM_BREAKER_HALF_OPEN_CALLS', '1'))
+)
+
+
+def chat_completion(client=None, **kwargs):
+    """
+    Call client.chat.completions.create through the shared circuit breaker
+
+    Args:
+        client: OpenAI client (default: the shared client from get_client())
+        **kwargs: Arguments for chat.completions.create
+
+    Returns:
+        The chat completion response
+
+    Raises:
+        CircuitOpenError: If the circuit is open and the call was not attempted
+    """
+    client = client or get_client()
+    breaker = llm_breaker
+    permit = breaker.allow_request()
+    if permit is None:
+        raise CircuitOpenError(f"Circuit '{breaker.name}' is open, LLM call skipped")
+
+    started = breaker.clock()
+    try:
+        response = client.chat.completions.create(**kwargs)
+    except Exception:
+        breaker.record(permit, False, breaker.clock() - started)
+        raise
+    breaker.record(permit, True, breaker.clock() - started)
+    return response
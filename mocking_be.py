@@ -1,12 +1,20 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 import json
 import random
 import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from faker import Faker
-from openai import OpenAI
 from dotenv import load_dotenv
+from admission import AdmissionController, AdmissionRejected
+import llm_client
+import model_router
+import profiling
+import json_backend
+import compression
+import submission_store
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,18 +22,82 @@ load_dotenv()
 
 app = Flask(__name__)
 app.config['JSON_AS_ASCII'] = False
+# Fast JSON (orjson when installed) for jsonify and request bodies, and
+# gzip/brotli compression of large responses
+app.json = json_backend.FastJSONProvider(app)
+compression.install(app)
+
+# Opt-in per-request and continuous profiling (see profiling.py)
+profiling.install(app, 'mocking_be')
 
 # Enable CORS for all routes
 CORS(app, origins=['http://127.0.0.1:5000', 'http://localhost:5000'])
 
-# Initialize Faker with Vietnamese locale
-fake = Faker('vi_VN')
-
-# Initialize OpenAI client
-client = OpenAI(
-    api_key=os.getenv('OPENAI_API_KEY')
+# Admission control for LLM-backed mock data generation
+mock_admission = AdmissionController(
+    'mock',
+    max_concurrent=int(os.getenv('MOCK_MAX_CONCURRENT', '8')),
+    max_per_client=int(os.getenv('MOCK_MAX_PER_CLIENT', '4')),
+    max_queue=int(os.getenv('MOCK_MAX_QUEUE', '32')),
+    max_queue_time=float(os.getenv('MOCK_MAX_QUEUE_SECONDS', '10')),
+    workers=int(os.getenv('ADMISSION_WORKERS', '1'))
 )
 
+def reject_mock_request(rejection):
+    return jsonify({
+        'error': 'Too many requests',
+        'message': f'Mock data generation is at capacity ({rejection.reason}), retry in {rejection.retry_after} seconds'
+    })
+
+# Faker with the Vietnamese locale is slow to load, so it is created on first
+# use; the OpenAI client is created by llm_client on the first LLM call
+fake = None
+fake_lock = threading.Lock()
+
+def get_fake():
+    """
+    Return the shared Vietnamese Faker instance, creating it on first use
+    
+    Returns:
+        Faker: Faker with the vi_VN locale
+    """
+    global fake
+    if fake is None:
+        with fake_lock:
+            if fake is None:
+                from faker import Faker
+                fake = Faker('vi_VN')
+    return fake
+
+def preload():
+    """Create Faker and the LLM client now, e.g. in a master process before forking workers"""
+    get_fake()
+    llm_client.preload()
+
+if os.getenv('PRELOAD_CLIENTS', '0') == '1':
+    preload()
+
+# Streamed records draw their values from pools built once with Faker, so each
+# record costs a few random draws instead of several Faker calls
+MOCK_STREAM_POOL_SIZE = int(os.getenv('MOCK_STREAM_POOL_SIZE', '2048'))
+MOCK_STREAM_MAX_RECORDS = int(os.getenv('MOCK_STREAM_MAX_RECORDS', '10000000'))
+MOCK_STREAM_BATCH = 500
+PHONE_PREFIXES = ('03', '05', '07', '08', '09')
+
+# Bulk mock requests generate their templates concurrently, each under its own
+# admission slot
+MOCK_BULK_MAX_TEMPLATES = int(os.getenv('MOCK_BULK_MAX_TEMPLATES', '100'))
+MOCK_BULK_MAX_RECORDS = int(os.getenv('MOCK_BULK_MAX_RECORDS', '500'))
+MOCK_BULK_WORKERS = int(os.getenv('MOCK_BULK_WORKERS', '16'))
+
+# Simulated processing time of a form submission, in seconds
+MOCK_SUBMIT_DELAY = float(os.getenv('MOCK_SUBMIT_DELAY', '0.5'))
+MOCK_SUBMISSIONS_MAX_PAGE = int(os.getenv('MOCK_SUBMISSIONS_MAX_PAGE', '1000'))
+STREAM_DATE_START = datetime(1970, 1, 1)
+STREAM_DATE_DAYS = (datetime(2005, 12, 31) - STREAM_DATE_START).days
+stream_pools = None
+stream_pools_lock = threading.Lock()
+
 def format_datetime_vietnamese(dt=None):
     """
     Format datetime in Vietnamese format (DD/MM/YYYY HH:MM:SS)
@@ -56,7 +128,7 @@ def format_date_vietnamese(dt=None):
 
 def generate_mock_data_with_llm(field_specs):
     """
-    Generate mock data using OpenAI GPT-4o model
+    Generate mock data using the OpenAI models chosen by model_router
     
     Args:
         field_specs (list): List of field specifications
@@ -95,26 +167,55 @@ Example format:
     "datetime_field": "25/12/1985 10:30:00"
 }}"""
 
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that generates realistic Vietnamese mock data for forms. Always respond with valid JSON only. IMPORTANT: For all date fields, use DD/MM/YYYY format (never YYYY-MM-DD or MM/DD/YYYY)."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=1000
-        )
-        
-        # Parse the response
-        response_text = response.choices[0].message.content.strip()
-        
-        # Remove any markdown formatting if present
-        if response_text.startswith('```json'):
-            response_text = response_text[7:]
-        if response_text.endswith('```'):
-            response_text = response_text[:-3]
+        # Simple specs go to the fast model first and escalate when the
+        # response is not valid JSON or misses fields
+        route = model_router.choose_route('mock', [field['kieu_du_lieu'] for field in field_specs])
+        mock_data = None
+        used_model = None
+        problems = []
+        for attempt, (model, max_tokens) in enumerate(route['models'], start=1):
+            try:
+                response = llm_client.chat_completion(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": "You are a helpful assistant that generates realistic Vietnamese mock data for forms. Always respond with valid JSON only. IMPORTANT: For all date fields, use DD/MM/YYYY format (never YYYY-MM-DD or MM/DD/YYYY)."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.7,
+                    max_tokens=max_tokens
+                )
+                
+                # Parse the response
+                response_text = response.choices[0].message.content.strip()
+                
+                # Remove any markdown formatting if present
+                if response_text.startswith('```json'):
+                    response_text = response_text[7:]
+                if response_text.endswith('```'):
+                    response_text = response_text[:-3]
+                
+                parsed = json_backend.loads(response_text)
+            except llm_client.CircuitOpenError:
+                raise
+            except Exception as e:
+                problems = [str(e)]
+                print(f"Mock data generation failed with {model}: {problems}")
+                continue
+            
+            # Only a model that returned data is recorded as the one used
+            mock_data, used_model, used_attempt = parsed, model, attempt
+            problems = model_router.check_mock_data(mock_data, field_specs)
+            passed = not problems
+            if passed:
+                break
+            print(f"Quality gate failed for {model} mock data: {problems}")
         
-        mock_data = json.loads(response_text)
+        if used_model:
+            model_router.routing_stats.record(route, used_model, used_attempt, passed)
+        else:
+            model_router.routing_stats.record_failure(route, problems)
+        if mock_data is None or not isinstance(mock_data, dict):
+            return generate_fallback_mock_data(field_specs)
         
         # Post-process to ensure date fields are in DD/MM/YYYY format
         for field_spec in field_specs:
@@ -163,6 +264,9 @@ Example format:
         
         return mock_data
         
+    except llm_client.CircuitOpenError:
+        # The LLM is failing or slow; go straight to the fallback generator
+        return generate_fallback_mock_data(field_specs)
     except Exception as e:
         print(f"Error generating data with LLM: {e}")
         # Fallback to original method if LLM fails
@@ -224,33 +328,140 @@ def generate_fallback_mock_data(field_specs):
     
     return mock_data
 
-@app.route('/api/mock/<template_name>', methods=['GET'])
-def get_mock_data(template_name):
+def get_stream_pools():
     """
-    Generate mock data based on specs.json for a specific template using LLM
+    Return the value pools for streamed records, building them on first use.
+    The pools come from a separately seeded Faker, so they are the same in
+    every process.
+    
+    Returns:
+        dict: Lists of names, addresses, emails, sentences and paragraphs
+    """
+    global stream_pools
+    if stream_pools is None:
+        with stream_pools_lock:
+            if stream_pools is None:
+                from faker import Faker
+                pool_fake = Faker('vi_VN')
+                pool_fake.seed_instance(0)
+                size = MOCK_STREAM_POOL_SIZE
+                stream_pools = {
+                    'name': [pool_fake.name() for _ in range(size)],
+                    'address': [pool_fake.address().replace('\n', ', ') for _ in range(size)],
+                    'email': [pool_fake.email() for _ in range(size)],
+                    'sentence': [pool_fake.sentence() for _ in range(size)],
+                    'paragraph': [pool_fake.paragraph(nb_sentences=3) for _ in range(size)]
+                }
+    return stream_pools
+
+def generate_seeded_mock_data(field_specs, template_name, seed, index):
+    """
+    Generate one mock record that depends only on (template, seed, index), so
+    any record of a stream can be regenerated without the ones before it
     
     Args:
+        field_specs (list): List of field specifications
         template_name (str): Name of the template folder
+        seed (int): Stream seed
+        index (int): Position of the record in the stream
     
     Returns:
-        JSON response with mock data
+        dict: Mock data for all fields
+    """
+    pools = get_stream_pools()
+    rng = random.Random(f"{template_name}:{seed}:{index}")
+    mock_data = {}
+    for field_spec in field_specs:
+        field_name = field_spec['ten_field']
+        field_type = field_spec['kieu_du_lieu']
+        lowered = field_name.lower()
+        
+        if field_type == 'text':
+            if 'address' in lowered or 'dia_chi' in lowered:
+                mock_data[field_name] = rng.choice(pools['address'])
+            elif 'name' in lowered or 'ten' in lowered:
+                mock_data[field_name] = rng.choice(pools['name'])
+            else:
+                mock_data[field_name] = rng.choice(pools['sentence'])
+        elif field_type == 'tel':
+            mock_data[field_name] = f"{rng.choice(PHONE_PREFIXES)}{rng.randrange(10 ** 8):08d}"
+        elif field_type == 'email':
+            mock_data[field_name] = rng.choice(pools['email'])
+        elif field_type == 'date':
+            mock_data[field_name] = format_date_vietnamese(
+                STREAM_DATE_START + timedelta(days=rng.randrange(STREAM_DATE_DAYS)))
+        elif field_type == 'datetime':
+            mock_data[field_name] = format_datetime_vietnamese(
+                STREAM_DATE_START + timedelta(days=rng.randrange(STREAM_DATE_DAYS), seconds=rng.randrange(86400)))
+        elif field_type == 'rating':
+            mock_data[field_name] = rng.randint(1, 5)
+        elif field_type == 'number':
+            mock_data[field_name] = rng.randint(1, 100)
+        elif field_type == 'select':
+            if 'gender' in lowered or 'gioi_tinh' in lowered:
+                mock_data[field_name] = rng.choice(("Nam", "Nữ"))
+            else:
+                mock_data[field_name] = f"Tùy chọn {rng.randint(1, 3)}"
+        elif field_type == 'textarea':
+            mock_data[field_name] = rng.choice(pools['paragraph'])
+        elif field_type == 'checkbox':
+            mock_data[field_name] = rng.random() < 0.5
+        elif field_type == 'radio':
+            mock_data[field_name] = rng.choice(("Có", "Không"))
+        else:
+            mock_data[field_name] = rng.choice(pools['sentence'])
+    
+    return mock_data
+
+def stream_mock_records(field_specs, template_name, seed, offset, limit):
+    """
+    Yield records offset .. offset + limit - 1 of a seeded stream as NDJSON,
+    in batches, holding only one batch in memory
+    
+    Args:
+        field_specs (list): List of field specifications
+        template_name (str): Name of the template folder
+        seed (int): Stream seed
+        offset (int): Index of the first record
+        limit (int): Number of records
+    
+    Yields:
+        str: Newline-terminated JSON records
+    """
+    batch = []
+    for index in range(offset, offset + limit):
+        batch.append(json_backend.dumps(generate_seeded_mock_data(field_specs, template_name, seed, index)))
+        if len(batch) == MOCK_STREAM_BATCH:
+            yield "\n".join(batch) + "\n"
+            batch = []
+    if batch:
+        yield "\n".join(batch) + "\n"
+
+def build_mock_response(template_name, count):
+    """
+    Generate mock data for one template, as returned by /api/mock/<template_name>
+    
+    Args:
+        template_name (str): Name of the template folder
+        count (int): Number of records (at most 100)
+    
+    Returns:
+        tuple: (response body as a dict, HTTP status code)
     """
     try:
         # Path to specs.json file
         specs_path = os.path.join('templates', template_name, 'specs.json')
         
         if not os.path.exists(specs_path):
-            return jsonify({
+            return {
                 'error': f'Specs file not found for template: {template_name}',
                 'message': f'File {specs_path} does not exist'
-            }), 404
+            }, 404
         
         # Read specs.json
         with open(specs_path, 'r', encoding='utf-8') as f:
-            specs = json.load(f)
+            specs = json_backend.load(f)
         
-        # Get count parameter for multiple records
-        count = request.args.get('count', 1, type=int)
         count = min(count, 100)  # Limit to 100 records max
         
         if count == 1:
@@ -258,12 +469,12 @@ def get_mock_data(template_name):
             mock_data = generate_mock_data_with_llm(specs)
             print(mock_data)
             
-            return jsonify({
+            return {
                 'success': True,
                 'template': template_name,
                 'data': mock_data,
                 'generated_by': 'llm'
-            })
+            }, 200
         else:
             # Generate multiple records
             records = []
@@ -271,25 +482,213 @@ def get_mock_data(template_name):
                 mock_data = generate_mock_data_with_llm(specs)
                 records.append(mock_data)
             
-            return jsonify({
+            return {
                 'success': True,
                 'template': template_name,
                 'count': count,
                 'data': records,
                 'generated_by': 'llm'
-            })
+            }, 200
     
     except json.JSONDecodeError:
-        return jsonify({
+        return {
             'error': 'Invalid JSON format in specs file',
             'message': f'Could not parse specs.json for template: {template_name}'
-        }), 400
+        }, 400
     
     except Exception as e:
-        return jsonify({
+        return {
             'error': 'Internal server error',
             'message': str(e)
-        }), 500
+        }, 500
+
+@app.route('/api/mock/<template_name>', methods=['GET'])
+@mock_admission.limit(reject_mock_request)
+def get_mock_data(template_name):
+    """
+    Generate mock data based on specs.json for a specific template using LLM
+    
+    Args:
+        template_name (str): Name of the template folder
+    
+    Returns:
+        JSON response with mock data
+    """
+    # Get count parameter for multiple records
+    body, status = build_mock_response(template_name, request.args.get('count', 1, type=int))
+    return jsonify(body), status
+
+def parse_bulk_items(payload):
+    """
+    Read the template list of a bulk mock request
+    
+    Args:
+        payload: Parsed JSON body: {"templates": [{"template": "name", "count": 3}, "other", ...]}
+    
+    Returns:
+        tuple: (list of (template_name, count), error message or None)
+    """
+    items = payload.get('templates') if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        return [], 'Body must be a JSON object with a non-empty "templates" list'
+    if len(items) > MOCK_BULK_MAX_TEMPLATES:
+        return [], f'At most {MOCK_BULK_MAX_TEMPLATES} templates per request'
+    
+    parsed = []
+    for item in items:
+        if isinstance(item, str):
+            item = {'template': item}
+        template_name = item.get('template') if isinstance(item, dict) else None
+        count = item.get('count', 1) if isinstance(item, dict) else None
+        if not isinstance(template_name, str) or not re.match(r'^[a-zA-Z0-9_-]+$', template_name):
+            return [], f'Invalid template name: {template_name!r}'
+        if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+            return [], f'Invalid count for template {template_name}: {count!r}'
+        parsed.append((template_name, count))
+    return parsed, None
+
+def build_admitted_mock_response(client_id, template_name, count):
+    """
+    Build one template's mock response under its own admission slot
+    
+    Args:
+        client_id (str): Client the slot is counted against
+        template_name (str): Name of the template folder
+        count (int): Number of records
+    
+    Returns:
+        tuple: (response body dict, HTTP status), 429 if no slot was free
+    """
+    try:
+        with mock_admission.slot(client_id):
+            return build_mock_response(template_name, count)
+    except AdmissionRejected as rejection:
+        print(f"Admission 'mock' rejected bulk template {template_name} from {client_id}: {rejection.reason}")
+        return {
+            'error': 'Too many requests',
+            'message': f'Mock data generation is at capacity ({rejection.reason}), retry in {rejection.retry_after} seconds',
+            'retry_after': rejection.retry_after
+        }, 429
+
+def generate_bulk_results(items, client_id):
+    """
+    Generate mock data for several templates concurrently
+    
+    Each template takes its own admission slot, and no more templates run at
+    once than one client may hold, so a bulk request is throttled like the
+    same number of single requests.
+    
+    Args:
+        items (list): (template_name, count) pairs
+        client_id (str): Client the admission slots are counted against
+    
+    Yields:
+        dict: One result per item as soon as it finishes, with the item's
+            position in the request as 'index' and its HTTP status as 'status'
+    """
+    workers = max(1, min(MOCK_BULK_WORKERS, mock_admission.max_per_client, len(items)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(build_admitted_mock_response, client_id, template_name, count): index
+                   for index, (template_name, count) in enumerate(items)}
+        for future in as_completed(futures):
+            body, status = future.result()
+            yield dict(body, index=futures[future], status=status, template=items[futures[future]][0])
+
+@app.route('/api/mock/bulk', methods=['POST'])
+def bulk_mock_data():
+    """
+    Generate mock data for many templates in one request
+    
+    Body:
+        {"templates": [{"template": "name", "count": 3}, "other_template", ...],
+         "stream": false}
+    
+    Each template is generated concurrently under its own admission slot, so
+    the request takes about as long as its slowest template when there is
+    capacity. A template that cannot get a slot gets a 429 result. With
+    "stream": true (or ?stream=1) the results are sent as NDJSON, one line per
+    template in the order they finish; otherwise they are returned together,
+    in request order.
+    
+    Returns:
+        JSON response with one result per template, shaped like the
+        /api/mock/<template_name> response plus 'index' and 'status';
+        413 if more than MOCK_BULK_MAX_RECORDS records are requested
+    """
+    payload = request.get_json(silent=True)
+    items, error = parse_bulk_items(payload)
+    if error:
+        return jsonify({'error': 'Invalid bulk request', 'message': error}), 400
+    total_records = sum(count for _, count in items)
+    if total_records > MOCK_BULK_MAX_RECORDS:
+        return jsonify({
+            'error': 'Bulk request too large',
+            'message': f'{total_records} records requested, at most {MOCK_BULK_MAX_RECORDS} per request'
+        }), 413
+    
+    client_id = request.remote_addr or 'unknown'
+    stream = payload.get('stream') is True or request.args.get('stream') == '1'
+    if stream:
+        lines = (json_backend.dumps(result) + "\n" for result in generate_bulk_results(items, client_id))
+        return Response(lines, mimetype='application/x-ndjson')
+    
+    results = sorted(generate_bulk_results(items, client_id), key=lambda result: result['index'])
+    return jsonify({
+        'success': all(result['status'] == 200 for result in results),
+        'count': len(results),
+        'results': results
+    })
+
+@app.route('/api/mock/<template_name>/stream', methods=['GET'])
+def stream_mock_data(template_name):
+    """
+    Stream reproducible mock records as NDJSON, without the LLM
+    
+    Query parameters:
+        seed (int): Stream seed; a random seed is used (and returned in the
+            X-Mock-Seed header) when omitted
+        offset (int): Index of the first record (default 0)
+        limit (int): Number of records (default 1000, at most MOCK_STREAM_MAX_RECORDS)
+    
+    Args:
+        template_name (str): Name of the template folder
+    
+    Returns:
+        NDJSON response, one record per line
+    """
+    specs_path = os.path.join('templates', template_name, 'specs.json')
+    if not os.path.exists(specs_path):
+        return jsonify({
+            'error': f'Specs file not found for template: {template_name}',
+            'message': f'File {specs_path} does not exist'
+        }), 404
+    
+    try:
+        with open(specs_path, 'r', encoding='utf-8') as f:
+            specs = json_backend.load(f)
+    except json.JSONDecodeError:
+        return jsonify({
+            'error': 'Invalid JSON format in specs file',
+            'message': f'Could not parse specs.json for template: {template_name}'
+        }), 400
+    
+    seed = request.args.get('seed', type=int)
+    if seed is None:
+        seed = random.randrange(2 ** 31)
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', 1000, type=int)
+    if offset < 0 or limit < 1 or limit > MOCK_STREAM_MAX_RECORDS:
+        return jsonify({
+            'error': 'Invalid range',
+            'message': f'offset must be >= 0 and limit between 1 and {MOCK_STREAM_MAX_RECORDS}'
+        }), 400
+    
+    response = Response(stream_mock_records(specs, template_name, seed, offset, limit),
+                        mimetype='application/x-ndjson')
+    response.headers['X-Mock-Seed'] = str(seed)
+    response.headers['X-Mock-Offset'] = str(offset)
+    response.headers['X-Mock-Limit'] = str(limit)
+    return response
 
 @app.route('/api/templates', methods=['GET'])
 def list_templates():
@@ -315,7 +714,7 @@ def list_templates():
                 if os.path.exists(specs_path):
                     try:
                         with open(specs_path, 'r', encoding='utf-8') as f:
-                            specs = json.load(f)
+                            specs = json_backend.load(f)
                         
                         templates.append({
                             'name': item,
@@ -367,7 +766,7 @@ def mock_submit(template_name):
         
         # Read specs.json
         with open(specs_path, 'r', encoding='utf-8') as f:
-            specs = json.load(f)
+            specs = json_backend.load(f)
         
         # Get submitted data
         submitted_data = request.get_json() or request.form.to_dict()
@@ -416,22 +815,32 @@ def mock_submit(template_name):
                     except ValueError:
                         validation_errors.append(f"Invalid datetime format, must be DD/MM/YYYY HH:MM:SS: {field_name}")
         
+        # Record the submission; the store writes it in the background
+        store = submission_store.get_store()
+        if store:
+            submission_id = store.append(template_name, submitted_data, not validation_errors,
+                                         validation_errors)['submission_id']
+        else:
+            submission_id = submission_store.new_submission_id()
+        
         # Simulate processing time
-        import time
-        time.sleep(0.5)
+        if MOCK_SUBMIT_DELAY > 0:
+            import time
+            time.sleep(MOCK_SUBMIT_DELAY)
         
         if validation_errors:
             return jsonify({
                 'success': False,
                 'message': 'Validation failed',
                 'errors': validation_errors,
+                'submission_id': submission_id,
                 'submitted_data': submitted_data
             }), 400
         else:
             return jsonify({
                 'success': True,
                 'message': 'Form submitted successfully',
-                'submission_id': f"SUB_{random.randint(100000, 999999)}",
+                'submission_id': submission_id,
                 'timestamp': format_datetime_vietnamese(),
                 'submitted_data': submitted_data
             })
@@ -442,14 +851,115 @@ def mock_submit(template_name):
             'message': str(e)
         }), 500
 
+def parse_submission_time(value):
+    """
+    Read a time bound of a submission query
+    
+    Args:
+        value (str): Epoch seconds, ISO 8601, or DD/MM/YYYY [HH:MM:SS] (local time)
+    
+    Returns:
+        float: Epoch seconds, or None if the value cannot be read
+    """
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    for parse in (datetime.fromisoformat,
+                  lambda text: datetime.strptime(text, '%d/%m/%Y %H:%M:%S'),
+                  lambda text: datetime.strptime(text, '%d/%m/%Y')):
+        try:
+            return parse(value).timestamp()
+        except ValueError:
+            continue
+    return None
+
+def format_submission(submission):
+    """Stored submission as returned by the submissions API"""
+    submission = dict(submission)
+    submission['timestamp'] = format_datetime_vietnamese(datetime.fromtimestamp(submission['created_at']))
+    return submission
+
+@app.route('/api/submissions', methods=['GET'])
+def list_submissions():
+    """
+    List recorded form submissions, oldest first, one page at a time
+    
+    Query parameters:
+        template: Only this template's submissions
+        since, until: Time range (epoch seconds, ISO 8601 or DD/MM/YYYY HH:MM:SS)
+        valid: 1 for valid submissions only, 0 for rejected ones only
+        limit: Page size (default 100)
+        cursor: 'next_cursor' of the previous page
+    
+    Returns:
+        JSON response with the page of submissions and the cursor of the next page
+    """
+    store = submission_store.get_store()
+    if not store:
+        return jsonify({'error': 'Submission store is disabled'}), 404
+    
+    bounds = {}
+    for key in ('since', 'until'):
+        if request.args.get(key):
+            bounds[key] = parse_submission_time(request.args[key])
+            if bounds[key] is None:
+                return jsonify({'error': f'Invalid {key}: {request.args[key]}'}), 400
+    try:
+        limit = int(request.args.get('limit', 100))
+        cursor = int(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        return jsonify({'error': 'limit and cursor must be integers'}), 400
+    if limit < 1:
+        return jsonify({'error': 'limit must be at least 1'}), 400
+    valid = request.args.get('valid')
+    
+    page = store.query(
+        template=request.args.get('template') or None,
+        since=bounds.get('since'),
+        until=bounds.get('until'),
+        valid=None if valid in (None, '') else valid.lower() in ('1', 'true', 'yes'),
+        after=cursor,
+        limit=min(limit, MOCK_SUBMISSIONS_MAX_PAGE)
+    )
+    return jsonify({
+        'count': len(page['submissions']),
+        'submissions': [format_submission(submission) for submission in page['submissions']],
+        'next_cursor': page['next_cursor']
+    })
+
+@app.route('/api/submissions/<submission_id>', methods=['GET'])
+def get_submission(submission_id):
+    """Look up one recorded form submission by the id returned on submit"""
+    store = submission_store.get_store()
+    submission = store.get(submission_id) if store else None
+    if submission is None:
+        return jsonify({'error': f'Submission not found: {submission_id}'}), 404
+    return jsonify(format_submission(submission))
+
+@app.route('/api/submissions/stats', methods=['GET'])
+def submission_stats():
+    """Submission writer counters of this worker, for monitoring"""
+    store = submission_store.get_store()
+    if not store:
+        return jsonify({'error': 'Submission store is disabled'}), 404
+    return jsonify(store.stats())
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
         'service': 'Mocking API',
-        'timestamp': format_datetime_vietnamese()
+        'timestamp': format_datetime_vietnamese(),
+        'llm_circuit': llm_client.llm_breaker.stats(),
+        'model_routing': model_router.routing_stats.snapshot()
     })
 
+@app.route('/api/admission', methods=['GET'])
+def admission_stats():
+    """In-flight and queued mock generation requests, for monitoring"""
+    return jsonify(mock_admission.stats())
+
 if __name__ == '__main__':
     app.run(debug=True, port=5001)
@@ -2,13 +2,20 @@
 """
 Mocking Option Value API Server
 
-A simple Flask REST API server that returns a list of option values.
-Returns: ["option1", "option2", "option3"]
+A simple Flask REST API server that serves named lists of option values.
+Option sets live in an in-memory store persisted to a local JSON file. Every change
+bumps a monotonically increasing version, which is exposed as an ETag so
+clients can revalidate cheaply and long-poll for changes.
 """
 
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 from flask_cors import CORS
+import json
 import logging
+import os
+import threading
+import time
+import profiling
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -16,41 +23,296 @@ logger = logging.getLogger(__name__)
 
 # Initialize Flask app
 app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+CORS(app, expose_headers=['ETag'])  # Enable CORS for all routes
 
-# Mock data - list of option values
+# Opt-in per-request and continuous profiling (see profiling.py)
+profiling.install(app, 'mocking_option_value')
+
+# Option sets used to seed a new store. The default set is the one served when
+# no keys are requested; it backs the {status_survey} placeholder.
+DEFAULT_OPTION_KEY = 'status_survey'
 OPTION_VALUES = ["option1", "option2", "option3"]
+DEFAULT_OPTION_SETS = {
+    DEFAULT_OPTION_KEY: OPTION_VALUES,
+    "province": ["Hà Nội", "TP. Hồ Chí Minh", "Đà Nẵng", "Hải Phòng", "Cần Thơ"],
+    "branch": ["Chi nhánh Hoàn Kiếm", "Chi nhánh Quận 1", "Chi nhánh Hải Châu"],
+    "product": ["Tài khoản thanh toán", "Thẻ tín dụng", "Vay tiêu dùng", "Tiết kiệm"],
+    "status": ["Mới", "Đang xử lý", "Hoàn thành", "Đã hủy"]
+}
+
+# Where the store is persisted, and the longest a change request may wait
+OPTIONS_FILE = os.getenv('OPTIONS_FILE', 'option_values.json')
+MAX_LONG_POLL_SECONDS = 60
+MAX_KEYS_PER_REQUEST = 100
+
+class OptionStore:
+    """
+    Thread-safe collection of named option sets persisted to a JSON file.
+    The store version increases on every change and each set records the store
+    version of its last change. A condition variable wakes long-poll waiters.
+    """
+
+    def __init__(self, path, default_sets):
+        self.path = path
+        self._condition = threading.Condition()
+        self.version = 1
+        self.sets = {key: list(values) for key, values in default_sets.items()}
+        self.set_versions = {key: 1 for key in self.sets}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            self._save()
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            self.version = int(stored['version'])
+            options = stored['options']
+            if isinstance(options, list):
+                # Stores written before option sets existed hold a single list
+                options = {DEFAULT_OPTION_KEY: options}
+            self.sets = {key: list(values) for key, values in options.items()}
+            versions = stored.get('set_versions', {})
+            self.set_versions = {key: int(versions.get(key, self.version)) for key in self.sets}
+        except Exception as e:
+            logger.error(f"Could not read option store {self.path}: {e}. Using defaults.")
+
+    def _save(self):
+        # Write to a temporary file and rename so the store is never half-written
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': self.version,
+                'set_versions': self.set_versions,
+                'options': self.sets
+            }, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def snapshot(self, keys=None):
+        """
+        Return a consistent view of the store.
+
+        Args:
+            keys (list, optional): Option set keys to include; all sets if omitted
+
+        Returns:
+            tuple: (store version, {key: options}, {key: set version})
+        """
+        with self._condition:
+            keys = list(self.sets) if keys is None else [key for key in keys if key in self.sets]
+            return (
+                self.version,
+                {key: list(self.sets[key]) for key in keys},
+                {key: self.set_versions[key] for key in keys}
+            )
+
+    def add(self, key, values):
+        """Add values that are not already in the set (creating it if needed); returns the store version"""
+        with self._condition:
+            options = self.sets.setdefault(key, [])
+            new_values = [value for value in values if value not in options]
+            if new_values or key not in self.set_versions:
+                options.extend(new_values)
+                self._commit(key)
+            return self.version
+
+    def remove(self, key, value):
+        """Remove a value from a set; returns (removed, store version)"""
+        with self._condition:
+            removed = value in self.sets.get(key, [])
+            if removed:
+                self.sets[key].remove(value)
+                self._commit(key)
+            return removed, self.version
+
+    def _commit(self, key):
+        self.version += 1
+        self.set_versions[key] = self.version
+        self._save()
+        self._condition.notify_all()
+
+    def wait_for_change(self, since, timeout):
+        """
+        Block until the version is newer than since, or timeout seconds pass.
+
+        Returns:
+            int: The store version after waiting
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self.version <= since:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return self.version
+
+store = OptionStore(OPTIONS_FILE, DEFAULT_OPTION_SETS)
+
+def etag_for(version):
+    return f'"{version}"'
+
+def parse_etag_version(header):
+    """
+    Read the store version from an If-None-Match value such as "12" or W/"12".
+    With several entity tags, the newest version is used.
+
+    Returns:
+        int: The version; 0 for an empty header or "*"
+
+    Raises:
+        ValueError: If an entity tag is not a version number
+    """
+    versions = [0]
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag in ('', '*'):
+            continue
+        if len(tag) >= 2 and tag[0] == tag[-1] == '"':
+            tag = tag[1:-1]
+        if not tag.isdigit():
+            raise ValueError(f"Not a version ETag: {tag!r}")
+        versions.append(int(tag))
+    return max(versions)
+
+def requested_keys():
+    """Parse ?keys=a,b,c; returns None when no keys were requested"""
+    raw = request.args.get('keys')
+    if raw is None:
+        return None
+    keys = []
+    for key in raw.split(','):
+        key = key.strip()
+        if key and key not in keys:
+            keys.append(key)
+    return keys[:MAX_KEYS_PER_REQUEST]
+
+def options_response(keys, status=200):
+    """
+    Build the options payload. Without keys, "data" is the default option list;
+    with keys, "data" maps each known key to its options and unknown keys are
+    listed under "missing".
+    """
+    if keys is None:
+        version, sets, _ = store.snapshot([DEFAULT_OPTION_KEY])
+        payload = {
+            "success": True,
+            "version": version,
+            "data": sets.get(DEFAULT_OPTION_KEY, [])
+        }
+    else:
+        version, sets, set_versions = store.snapshot(keys)
+        payload = {
+            "success": True,
+            "version": version,
+            "data": sets,
+            "versions": set_versions,
+            "missing": [key for key in keys if key not in sets]
+        }
+    response = jsonify(payload)
+    response.status_code = status
+    response.headers['ETag'] = etag_for(version)
+    # Clients may keep the options as long as they like but must revalidate with
+    # If-None-Match, which costs a 304 with no body while nothing has changed
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def not_modified(version):
+    response = app.response_class(status=304)
+    response.headers['ETag'] = etag_for(version)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/api/options', methods=['GET'])
 def get_options():
     """
-    GET endpoint that returns the list of option values.
+    GET endpoint that returns option values.
+    Without parameters the default option list is returned; ?keys=a,b,c returns
+    several option sets in one response. Supports If-None-Match: returns 304
+    when the client's version is current.
     
     Returns:
-        JSON response with the list of options
+        JSON response with the options and the store version
     """
-    logger.info("GET /api/options - Returning option values")
-    return jsonify({
-        "success": True,
-        "data": OPTION_VALUES
-    })
+    keys = requested_keys()
+    version = store.version
+    if etag_for(version) in request.headers.get('If-None-Match', ''):
+        logger.info(f"GET /api/options - Not modified (version {version})")
+        return not_modified(version)
+    logger.info(f"GET /api/options - Returning option values for {keys or DEFAULT_OPTION_KEY} (version {version})")
+    return options_response(keys)
 
 @app.route('/api/options', methods=['POST'])
 def add_option():
     """
-    POST endpoint to add a new option value.
+    POST endpoint to add new option values.
+    Accepts JSON {"value": "..."} or {"values": ["...", ...]}, with an optional
+    "key" naming the option set (defaults to the default set).
     
     Returns:
-        JSON response with updated list of options
+        JSON response with the updated options of that set
     """
-    logger.info("POST /api/options - Adding new option value")
-    # For this mock server, we'll just return the existing list
-    # In a real implementation, you would add the new option to the list
-    return jsonify({
-        "success": True,
-        "message": "Option added successfully (mock)",
-        "data": OPTION_VALUES
-    })
+    payload = request.get_json(silent=True) or {}
+    key = str(payload.get('key') or DEFAULT_OPTION_KEY).strip()
+    values = payload.get('values') or ([payload['value']] if payload.get('value') else [])
+    values = [str(value).strip() for value in values if str(value).strip()]
+    if not values:
+        return jsonify({
+            "success": False,
+            "message": "Provide a non-empty 'value' or 'values' in the JSON body"
+        }), 400
+    
+    logger.info(f"POST /api/options - Adding option values {values} to '{key}'")
+    store.add(key, values)
+    return options_response(None if key == DEFAULT_OPTION_KEY else [key])
+
+@app.route('/api/options/<path:value>', methods=['DELETE'])
+def delete_option(value):
+    """
+    DELETE endpoint to remove an option value from ?key= (defaults to the default set).
+    
+    Returns:
+        JSON response with the updated options of that set
+    """
+    key = request.args.get('key', DEFAULT_OPTION_KEY)
+    removed, _ = store.remove(key, value)
+    if not removed:
+        return jsonify({
+            "success": False,
+            "message": f"Option '{value}' not found in '{key}'"
+        }), 404
+    logger.info(f"DELETE /api/options - Removed option value '{value}' from '{key}'")
+    return options_response(None if key == DEFAULT_OPTION_KEY else [key])
+
+@app.route('/api/options/changes', methods=['GET'])
+def option_changes():
+    """
+    Long-poll change feed. Waits until the store version is newer than ?since=
+    (or the If-None-Match ETag, strong or weak), up to ?timeout= seconds.
+    Accepts ?keys= like GET /api/options.
+    
+    Returns:
+        JSON response with the current options, 304 if nothing changed before
+        the timeout, or 400 if If-None-Match is not an ETag from this API
+    """
+    since = request.args.get('since', type=int)
+    if since is None:
+        try:
+            since = parse_etag_version(request.headers.get('If-None-Match', ''))
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "message": f"If-None-Match must hold an ETag from this API, like \"12\": {str(e)}"
+            }), 400
+    timeout = min(request.args.get('timeout', 30, type=float), MAX_LONG_POLL_SECONDS)
+    
+    version = store.wait_for_change(since, timeout)
+    if version <= since:
+        return not_modified(version)
+    return options_response(requested_keys())
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -78,8 +340,11 @@ def root():
         "service": "Mocking Option Value API",
         "version": "1.0.0",
         "endpoints": {
-            "GET /api/options": "Get list of option values",
-            "POST /api/options": "Add new option value (mock)",
+            "GET /api/options": "Get list of option values (supports If-None-Match)",
+            "GET /api/options?keys=a,b,c": "Get several option sets in one request",
+            "POST /api/options": "Add new option values (optionally to a named set)",
+            "DELETE /api/options/<value>?key=<set>": "Remove an option value",
+            "GET /api/options/changes?since=<version>": "Long-poll for option changes",
             "GET /health": "Health check",
             "GET /": "API information"
         }
@@ -89,10 +354,12 @@ if __name__ == '__main__':
     # Run the Flask app
     print("Starting Mocking Option Value API Server...")
     print("Available endpoints:")
-    print("  GET  /api/options - Get option values")
-    print("  POST /api/options - Add option value (mock)")
-    print("  GET  /health      - Health check")
-    print("  GET  /            - API information")
+    print("  GET    /api/options         - Get option values")
+    print("  POST   /api/options         - Add option values")
+    print("  DELETE /api/options/<value> - Remove an option value")
+    print("  GET    /api/options/changes - Long-poll for option changes")
+    print("  GET    /health              - Health check")
+    print("  GET    /                    - API information")
     print("\nServer will be available at: http://localhost:5000")
     
     app.run(
@@ -0,0 +1,341 @@
+"""
+Model tiering for LLM generation steps.
+
+Simple requests (few fields, all of a recognised type) are sent to a faster,
+cheaper model first. The output is checked by a local quality gate, and only
+when the gate fails is the request escalated to the larger model. Routing
+decisions and escalations are counted so the escalation rate can be watched.
+"""
+
+import html as html_lib
+import json
+import os
+import re
+import threading
+import time
+
+import form_analyzer
+import template_update
+
+FAST_MODEL = os.getenv('LLM_FAST_MODEL', 'gpt-4o-mini')
+STRONG_MODEL = os.getenv('LLM_STRONG_MODEL', 'gpt-4o')
+MAX_SIMPLE_FIELDS = int(os.getenv('ROUTER_MAX_SIMPLE_FIELDS', '8'))
+ROUTING_LOG = os.getenv('ROUTING_LOG', '')
+
+# Output token budgets per step. The fast tier gets a budget sized to the form,
+# the strong tier keeps the full budget so an escalation is never truncated.
+MAX_TOKENS = {
+    'html': 10000,
+    'javascript': 4000,
+    'rows': 4000,
+    'mock': 1000
+}
+
+# Ids every generated page must contain for the JavaScript to work
+REQUIRED_IDS = ('loadingSpinner', 'messageDiv')
+
+KNOWN_TYPES = ('text', 'tel', 'email', 'date', 'datetime', 'select', 'textarea',
+               'rating', 'number', 'checkbox', 'radio')
+
+# Rows echo the definition line they were generated from in data-mo-ta
+MO_TA_PATTERN = re.compile(r'data-mo-ta\s*=\s*"([^"]*)"')
+
+# Keywords (Vietnamese and English) that identify a field's type from its
+# definition line. Checked in order, so more specific types come first.
+TYPE_KEYWORDS = [
+    ('rating', ('rating', 'đánh giá', 'hài lòng', 'thang điểm', 'sao', 'star')),
+    ('email', ('email', 'e-mail', 'thư điện tử')),
+    ('tel', ('phone', 'điện thoại', 'sđt', 'số đt', 'tel')),
+    ('datetime', ('datetime', 'thời gian', 'giờ')),
+    ('date', ('date', 'ngày', 'dob')),
+    ('select', ('select', 'dropdown', 'lựa chọn', 'chọn', 'giới tính', 'gender', 'options')),
+    ('checkbox', ('checkbox', 'đồng ý', 'xác nhận', 'check')),
+    ('radio', ('radio',)),
+    ('textarea', ('textarea', 'ý kiến', 'chi tiết', 'nhận xét', 'góp ý', 'mô tả', 'feedback', 'ghi chú')),
+    ('number', ('number', 'số lượng', 'tuổi', 'số tiền', 'amount', 'quantity')),
+    ('text', ('text', 'tên', 'name', 'họ', 'địa chỉ', 'address', 'input'))
+]
+
+
+def infer_field_type(line):
+    """
+    Guess the field type a definition line describes
+
+    Args:
+        line (str): A field definition line
+
+    Returns:
+        str: One of KNOWN_TYPES, or None if the line is not recognised
+    """
+    text = line.lower()
+    for field_type, keywords in TYPE_KEYWORDS:
+        for keyword in keywords:
+            if re.search(rf'(?<!\w){re.escape(keyword)}(?!\w)', text):
+                return field_type
+    return None
+
+
+def choose_route(task, field_types):
+    """
+    Decide which models to try for a generation step
+
+    Args:
+        task (str): 'html', 'javascript', 'rows' or 'mock'
+        field_types (list): Field type of each field (None for unrecognised fields)
+
+    Returns:
+        dict: 'task', 'tier', 'models' ((model, max_tokens) pairs to try in order) and 'reason'
+    """
+    unknown = sum(1 for field_type in field_types if field_type not in KNOWN_TYPES)
+    if len(field_types) > MAX_SIMPLE_FIELDS:
+        tier, reason = 'strong', f"{len(field_types)} fields > {MAX_SIMPLE_FIELDS}"
+    elif unknown:
+        tier, reason = 'strong', f"{unknown} field(s) of unrecognised type"
+    else:
+        tier, reason = 'fast', f"{len(field_types)} fields of known types"
+
+    full_budget = MAX_TOKENS[task]
+    if tier == 'fast':
+        # Roughly what a form of this size needs, with headroom
+        sized_budget = {
+            'html': 3000 + 500 * len(field_types),
+            'javascript': full_budget,
+            'rows': 500 + 500 * len(field_types),
+            'mock': 200 + 60 * len(field_types)
+        }[task]
+        models = [(FAST_MODEL, min(full_budget, sized_budget)), (STRONG_MODEL, full_budget)]
+    else:
+        models = [(STRONG_MODEL, full_budget)]
+
+    return {
+        'task': task,
+        'tier': tier,
+        'models': models,
+        'reason': reason
+    }
+
+
+def check_generated_form(html_content, specs_content, field_lines=None, prompt_lines=None):
+    """
+    Quality gate for step 1 output
+
+    Args:
+        html_content (str): Generated HTML (before JavaScript injection)
+        specs_content (str): Generated specs.json content
+        field_lines (list, optional): Field definition lines the page must
+            cover; each must be the mo_ta of a specs entry or the data-mo-ta of
+            a row on the page
+        prompt_lines (list, optional): The same lines as shown in the prompt
+
+    Returns:
+        list: Problems found; empty if the output passes
+    """
+    problems = []
+    if not html_content:
+        return ["No HTML content"]
+
+    analysis = form_analyzer.analyze_form(html_content)
+    problems.extend(analysis['errors'][:5])
+    if '</html>' not in html_content.lower():
+        problems.append("HTML document is incomplete (no </html>)")
+    for element_id in REQUIRED_IDS:
+        if element_id not in analysis['ids']:
+            problems.append(f"Missing required element id '{element_id}'")
+
+    try:
+        specs = json.loads(specs_content)
+        if not isinstance(specs, list) or not specs:
+            raise ValueError("specs must be a non-empty list")
+    except Exception as e:
+        problems.append(f"specs.json does not parse: {str(e)}")
+        return problems
+
+    input_names = {field['name'] for field in analysis['fields']}
+    for entry in specs:
+        name = entry.get('ten_field') if isinstance(entry, dict) else None
+        if not name:
+            problems.append(f"specs entry without ten_field: {entry}")
+        elif name not in input_names:
+            problems.append(f"ten_field '{name}' has no matching input name")
+        elif entry.get('kieu_du_lieu') not in KNOWN_TYPES:
+            problems.append(f"ten_field '{name}' has unknown kieu_du_lieu '{entry.get('kieu_du_lieu')}'")
+
+    if field_lines:
+        # specs.json is derived from the page, so the checks above always hold
+        # for the inputs that exist; a field the model left out only shows up
+        # as a definition line that nothing on the page describes
+        problems.extend(check_field_lines(html_content, specs, field_lines, prompt_lines))
+    return problems
+
+
+def check_field_lines(html_content, specs, field_lines, prompt_lines=None):
+    """
+    Check that every field definition line has a field in the generated markup
+
+    Args:
+        html_content (str): Generated page or rows
+        specs (list): specs.json entries derived from the markup
+        field_lines (list): Field definition lines the markup must cover
+        prompt_lines (list, optional): The same lines as shown in the prompt
+
+    Returns:
+        list: One problem per line (up to five) that is neither the mo_ta of a
+              specs entry nor the data-mo-ta of a row
+    """
+    described = {template_update.field_key(entry.get('mo_ta') or '') for entry in specs if isinstance(entry, dict)}
+    described |= {template_update.field_key(' '.join(html_lib.unescape(source).split()))
+                  for source in MO_TA_PATTERN.findall(html_content)}
+    missing = [
+        line for line, prompt_line in zip(field_lines, prompt_lines or field_lines)
+        if template_update.field_key(line) not in described
+        and template_update.field_key(prompt_line) not in described
+    ]
+    problems = [f"No field on the page for definition line: {line}" for line in missing[:5]]
+    if len(missing) > 5:
+        problems.append(f"...and {len(missing) - 5} more definition lines without a field")
+    return problems
+
+
+def check_generated_rows(rows_html, field_lines, prompt_lines=None):
+    """
+    Quality gate for rows generated for an existing page
+
+    Args:
+        rows_html (str): Generated table rows
+        field_lines (list): Field definition lines the rows were generated for
+        prompt_lines (list, optional): The same lines as shown in the prompt
+
+    Returns:
+        list: Problems found; empty if the output passes
+    """
+    if not rows_html:
+        return ["No rows generated"]
+    analysis = form_analyzer.analyze_form(rows_html)
+    problems = list(analysis['errors'][:5])
+    if not analysis['fields']:
+        problems.append("Rows contain no named inputs")
+    specs = template_update.attribute_specs(form_analyzer.derive_specs(rows_html), field_lines, prompt_lines)
+    problems.extend(check_field_lines(rows_html, specs, field_lines, prompt_lines))
+    return problems
+
+
+def check_javascript(js_content, api_endpoint):
+    """
+    Quality gate for step 2 output
+
+    Args:
+        js_content (str): Generated JavaScript
+        api_endpoint (str): The endpoint the script must fetch from
+
+    Returns:
+        list: Problems found; empty if the output passes
+    """
+    if not js_content or len(js_content) < 50:
+        return ["JavaScript is empty or too short"]
+    problems = []
+    if 'fetchDataFromAPI' not in js_content:
+        problems.append("fetchDataFromAPI is missing")
+    if api_endpoint and api_endpoint not in js_content:
+        problems.append("API endpoint is missing")
+    # Brackets must balance once string contents are ignored
+    code = re.sub(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|`(?:\\.|[^`\\])*`', '""', js_content)
+    for opening, closing in ('{}', '()', '[]'):
+        if code.count(opening) != code.count(closing):
+            problems.append(f"Unbalanced '{opening}{closing}' brackets (truncated output?)")
+    return problems
+
+
+def check_mock_data(mock_data, field_specs):
+    """
+    Quality gate for mock data output
+
+    Args:
+        mock_data (dict): Parsed mock data
+        field_specs (list): specs.json entries the data must cover
+
+    Returns:
+        list: Problems found; empty if the output passes
+    """
+    if not isinstance(mock_data, dict):
+        return ["Mock data is not a JSON object"]
+    return [
+        f"Missing value for '{field['ten_field']}'"
+        for field in field_specs if field['ten_field'] not in mock_data
+    ]
+
+
+class RoutingStats:
+    """Thread-safe counters of routing decisions and escalations per task"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tasks = {}
+
+    def record(self, route, model, attempts, passed):
+        """
+        Record the outcome of a routed request
+
+        Args:
+            route (dict): The route from choose_route
+            model (str): The model whose output was used
+            attempts (int): Number of models tried
+            passed (bool): Whether the final output passed the quality gate
+        """
+        escalated = route['tier'] == 'fast' and attempts > 1
+        with self._lock:
+            task = self._task(route)
+            task['requests'] += 1
+            task[route['tier']] += 1
+            task['escalations'] += int(escalated)
+            task['gate_failures'] += int(not passed)
+
+        print(f"Routing {route['task']}: tier={route['tier']} ({route['reason']}), "
+              f"used {model}, escalated={escalated}, gate_passed={passed}")
+        if ROUTING_LOG:
+            entry = {
+                'time': time.time(), 'task': route['task'], 'tier': route['tier'],
+                'reason': route['reason'], 'model': model, 'escalated': escalated, 'gate_passed': passed
+            }
+            with self._lock, open(ROUTING_LOG, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def record_failure(self, route, problems):
+        """
+        Record a routed request for which no model returned usable output
+
+        Args:
+            route (dict): The route from choose_route
+            problems (list): Errors of the last attempt
+        """
+        with self._lock:
+            task = self._task(route)
+            task['requests'] += 1
+            task[route['tier']] += 1
+            task['failures'] += 1
+
+        print(f"Routing {route['task']}: tier={route['tier']} ({route['reason']}), "
+              f"all {len(route['models'])} model(s) failed: {problems[:1]}")
+        if ROUTING_LOG:
+            entry = {
+                'time': time.time(), 'task': route['task'], 'tier': route['tier'],
+                'reason': route['reason'], 'model': None, 'failed': True
+            }
+            with self._lock, open(ROUTING_LOG, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _task(self, route):
+        return self._tasks.setdefault(route['task'], {
+            'requests': 0, 'fast': 0, 'strong': 0, 'escalations': 0, 'gate_failures': 0, 'failures': 0
+        })
+
+    def snapshot(self):
+        """Return counters with escalation rates"""
+        with self._lock:
+            result = {}
+            for name, task in self._tasks.items():
+                result[name] = dict(task)
+                result[name]['escalation_rate'] = round(task['escalations'] / task['fast'], 3) if task['fast'] else 0.0
+            return result
+
+
+routing_stats = RoutingStats()
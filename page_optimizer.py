@@ -0,0 +1,261 @@
+"""
+Post-generation page optimisation.
+
+Shrinks generated pages without changing what they render: HTML comments and
+redundant whitespace are removed, embedded CSS and JavaScript are minified,
+and the style block can optionally be moved into a shared, content-hashed
+stylesheet so identical styles across forms are downloaded and cached once.
+
+The minifiers are deliberately conservative. JavaScript keeps its line breaks
+so automatic semicolon insertion behaves exactly as before, and string,
+template and regex literals are never modified.
+"""
+
+import hashlib
+import os
+import re
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# Served by the Flask apps' static folder (ROOT/static) under /static/forms,
+# whatever directory the process was started from
+FORM_ASSETS_DIR = os.path.join(ROOT, 'static', 'forms')
+
+PRESERVED_TAGS = ('pre', 'textarea', 'script', 'style')
+JS_REGEX_KEYWORDS = ('return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw', 'case', 'do', 'else')
+
+
+def minify_css(css):
+    """
+    Minify a stylesheet
+
+    Args:
+        css (str): CSS source
+
+    Returns:
+        str: Minified CSS
+    """
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>~])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    css = re.sub(r'\s+!important', '!important', css)
+    css = css.replace(';}', '}')
+    # Pages are rendered through Jinja, so never produce "{#", "{%" or "{{"
+    css = re.sub(r'\{(?=[#%{])', '{ ', css)
+    return css.strip()
+
+
+def minify_js(js):
+    """
+    Minify JavaScript by removing comments, indentation and blank lines.
+    Line breaks are kept so semicolon insertion is unaffected.
+
+    Args:
+        js (str): JavaScript source
+
+    Returns:
+        str: Minified JavaScript
+    """
+    out = []
+    i = 0
+    length = len(js)
+    # A "/" starts a regex unless it follows an operand (name, number, literal,
+    # ")" or "]"), where it divides
+    after_operand = False
+
+    while i < length:
+        char = js[i]
+        following = js[i + 1] if i + 1 < length else ''
+
+        # Comments
+        if char == '/' and following == '/':
+            end = js.find('\n', i)
+            i = length if end == -1 else end
+            continue
+        if char == '/' and following == '*':
+            end = js.find('*/', i + 2)
+            i = length if end == -1 else end + 2
+            out.append(' ')
+            continue
+
+        # String, template and regex literals are copied verbatim
+        if char in ('"', "'", '`') or (char == '/' and not after_operand):
+            end = _literal_end(js, i, char)
+            out.append(js[i:end])
+            after_operand = True
+            i = end
+            continue
+
+        if char.isspace():
+            out.append('\n' if char == '\n' else ' ')
+            i += 1
+        elif char.isalnum() or char in '_$':
+            end = i + 1
+            while end < length and (js[end].isalnum() or js[end] in '_$'):
+                end += 1
+            word = js[i:end]
+            out.append(word)
+            after_operand = word not in JS_REGEX_KEYWORDS
+            i = end
+        elif char in '+-' and following == char:
+            # "i++ / 2" still follows an operand, "++/re/.lastIndex" does not
+            out.append(char * 2)
+            i += 2
+        else:
+            out.append(char)
+            after_operand = char in ')]'
+            i += 1
+
+    lines = (re.sub(r'[ \t]+', ' ', line).strip() for line in ''.join(out).split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+def _literal_end(js, start, quote):
+    i = start + 1
+    in_class = False
+    while i < len(js):
+        char = js[i]
+        if char == '\\':
+            i += 2
+            continue
+        if quote == '/':
+            if char == '[':
+                in_class = True
+            elif char == ']':
+                in_class = False
+            elif char == '/' and not in_class:
+                i += 1
+                # Regex flags
+                while i < len(js) and js[i].isalpha():
+                    i += 1
+                return i
+            elif char == '\n':
+                return i
+        elif char == quote:
+            return i + 1
+        elif char == '\n' and quote != '`':
+            return i
+        i += 1
+    return i
+
+
+def minify_html(html):
+    """
+    Minify an HTML document, including its embedded CSS and JavaScript
+
+    Args:
+        html (str): HTML document
+
+    Returns:
+        str: Minified HTML document
+    """
+    parts = []
+    pattern = re.compile(
+        r'<(%s)\b([^>]*)>(.*?)</\1\s*>' % '|'.join(PRESERVED_TAGS),
+        flags=re.S | re.I
+    )
+    position = 0
+    for match in pattern.finditer(html):
+        parts.append(_minify_markup(html[position:match.start()]))
+        tag, attributes, body = match.group(1).lower(), match.group(2), match.group(3)
+        if tag == 'style':
+            body = minify_css(body)
+        elif tag == 'script' and _is_javascript(attributes) and 'src=' not in attributes.lower():
+            body = minify_js(body)
+        opening = f"<{match.group(1)}{_collapse_whitespace(attributes)}>"
+        parts.append(f"{opening}{body}</{match.group(1)}>")
+        position = match.end()
+    parts.append(_minify_markup(html[position:]))
+    return ''.join(parts).strip()
+
+
+def _is_javascript(attributes):
+    type_match = re.search(r'type\s*=\s*["\']([^"\']*)["\']', attributes, flags=re.I)
+    return not type_match or 'javascript' in type_match.group(1).lower() or type_match.group(1).lower() == 'module'
+
+
+def _minify_markup(markup):
+    # Drop comments, but keep conditional comments
+    markup = re.sub(r'<!--(?!\[if).*?-->', '', markup, flags=re.S)
+    # Whitespace between tags is insignificant apart from a single separator
+    markup = re.sub(r'>\s+<', lambda m: '>\n<' if '\n' in m.group(0) else '> <', markup)
+    return _collapse_whitespace(markup)
+
+
+def _collapse_whitespace(text):
+    return re.sub(r'[ \t\r\n\f]+', lambda m: '\n' if '\n' in m.group(0) else ' ', text)
+
+
+def extract_stylesheet(html, assets_dir, url_prefix):
+    """
+    Move a page's <style> blocks into a shared stylesheet named after its content
+    hash. Pages with identical styles share one file.
+
+    Args:
+        html (str): HTML document
+        assets_dir (str): Directory the stylesheet is written to
+        url_prefix (str): URL path the assets directory is served under
+
+    Returns:
+        tuple: (html with a <link> instead of the style blocks, stylesheet path or None)
+    """
+    style_pattern = re.compile(r'<style\b[^>]*>(.*?)</style\s*>', flags=re.S | re.I)
+    blocks = style_pattern.findall(html)
+    if not blocks:
+        return html, None
+
+    css = '\n'.join(minify_css(block) for block in blocks)
+    digest = hashlib.sha256(css.encode('utf-8')).hexdigest()[:16]
+    filename = f"form-{digest}.css"
+    path = os.path.join(assets_dir, filename)
+    if not os.path.exists(path):
+        os.makedirs(assets_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(css)
+        os.replace(tmp_path, path)
+
+    link = f'<link rel="stylesheet" href="{url_prefix.rstrip("/")}/{filename}">'
+    replaced = []
+
+    def replace_block(match):
+        if replaced:
+            return ''
+        replaced.append(True)
+        return link
+
+    return style_pattern.sub(replace_block, html), path
+
+
+def optimize_page(html, budget=0, extract_css=False, assets_dir=FORM_ASSETS_DIR, url_prefix='/static/forms'):
+    """
+    Minify a generated page and check it against a byte budget
+
+    Args:
+        html (str): Generated HTML document
+        budget (int): Maximum page size in bytes (0 disables the check)
+        extract_css (bool): Move styles into a shared hashed stylesheet
+        assets_dir (str): Directory for extracted stylesheets
+        url_prefix (str): URL path the assets directory is served under
+
+    Returns:
+        dict: 'html' (optimised page) and 'stats' with before/after sizes and budget result
+    """
+    original_bytes = len(html.encode('utf-8'))
+    optimized = minify_html(html)
+
+    stylesheet = None
+    if extract_css:
+        optimized, stylesheet = extract_stylesheet(optimized, assets_dir, url_prefix)
+
+    optimized_bytes = len(optimized.encode('utf-8'))
+    stats = {
+        'original_bytes': original_bytes,
+        'optimized_bytes': optimized_bytes,
+        'saved_bytes': original_bytes - optimized_bytes,
+        'ratio': round(optimized_bytes / original_bytes, 3) if original_bytes else 1.0,
+        'stylesheet': stylesheet,
+        'budget': budget,
+        'within_budget': not budget or optimized_bytes <= budget
+    }
+    return {'html': optimized, 'stats': stats}
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Production entry point for the three apps.
+
+Runs server.py, mocking_be.py or mocking_option_value.py under gunicorn, a
+pre-forking WSGI server, instead of the Flask development server. The app is
+imported once in the master process (with PRELOAD_CLIENTS=1, so the OpenAI
+client, Faker, requests and jinja2 are loaded before forking) and the workers
+share its memory copy-on-write.
+
+Caches that must be consistent across workers live in SQLite files:
+SHARED_CACHE (option lists, hydration responses and recent generations, see
+shared_cache.py) and FRAGMENT_CACHE (generated field rows). serve.py sets
+SHARED_CACHE to shared_cache.db unless it is already set.
+
+Admission limits (admission.py) are kept per process, so serve.py sets
+ADMISSION_WORKERS to the worker count and each worker enforces its share.
+
+The option value API keeps its option store and long-poll waiters in process
+memory, so it always runs as a single worker; use threads to scale it.
+
+Usage:
+    python serve.py server                       # http://0.0.0.0:5000
+    python serve.py mock --workers 4 --threads 8 # http://0.0.0.0:5001
+    python serve.py options                      # http://0.0.0.0:6000
+
+Settings can also come from the environment: WEB_WORKERS, WEB_THREADS,
+WEB_TIMEOUT and WEB_BIND.
+"""
+
+import argparse
+import multiprocessing
+import os
+
+# App name -> (module, default port)
+APPS = {
+    'server': ('server', 5000),
+    'mock': ('mocking_be', 5001),
+    'options': ('mocking_option_value', 6000)
+}
+
+# Apps whose state lives in process memory and cannot be split across workers
+SINGLE_WORKER_APPS = {'options'}
+
+
+def default_workers():
+    return int(os.getenv('WEB_WORKERS', str(multiprocessing.cpu_count() * 2 + 1)))
+
+
+def build_options(name, workers, threads, bind, timeout):
+    """
+    gunicorn settings for an app
+
+    Args:
+        name (str): Key of APPS
+        workers (int): Worker processes
+        threads (int): Threads per worker
+        bind (str): Address to listen on, or None for 0.0.0.0 and the app's default port
+        timeout (int): Seconds before a silent worker is restarted
+
+    Returns:
+        dict: gunicorn settings
+    """
+    if name in SINGLE_WORKER_APPS and workers != 1:
+        print(f"{name} keeps its state in process memory; running 1 worker with {threads} threads")
+        workers = 1
+    return {
+        'bind': bind or f"0.0.0.0:{APPS[name][1]}",
+        'workers': workers,
+        'threads': threads,
+        # gthread workers serve a request per thread, so slow LLM calls and
+        # long polls do not block a whole worker
+        'worker_class': 'gthread',
+        'timeout': timeout,
+        'preload_app': True,
+        'accesslog': '-'
+    }
+
+
+def load_app(name):
+    """Import an app's module in this (master) process and return its Flask app"""
+    module = __import__(APPS[name][0])
+    return module.app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an app under gunicorn with preloading and multiple workers")
+    parser.add_argument('app', choices=sorted(APPS), help="App to serve")
+    parser.add_argument('--workers', type=int, default=default_workers(), help="Worker processes")
+    parser.add_argument('--threads', type=int, default=int(os.getenv('WEB_THREADS', '4')), help="Threads per worker")
+    parser.add_argument('--bind', default=os.getenv('WEB_BIND'), help="host:port to listen on")
+    parser.add_argument('--timeout', type=int, default=int(os.getenv('WEB_TIMEOUT', '300')),
+                        help="Seconds before a silent worker is restarted (generation can take minutes)")
+    args = parser.parse_args()
+    options = build_options(args.app, args.workers, args.threads, args.bind, args.timeout)
+
+    # Must be set before the app is imported: modules read them at import time
+    os.environ.setdefault('PRELOAD_CLIENTS', '1')
+    os.environ.setdefault('SHARED_CACHE', 'shared_cache.db')
+    # Admission limits live in each worker's memory; split them between workers
+    os.environ['ADMISSION_WORKERS'] = str(options['workers'])
+
+    from gunicorn.app.base import BaseApplication
+
+    class FlaskApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return load_app(args.app)
+
+    print(f"Serving {APPS[args.app][0]} on {options['bind']} with {options['workers']} worker(s) "
+          f"x {options['threads']} thread(s)")
+    FlaskApplication(options).run()
+
+
+if __name__ == "__main__":
+    main()
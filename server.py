@@ -1,9 +1,197 @@
-from flask import Flask, render_template, redirect, url_for, send_from_directory, request
+from flask import Flask, render_template, redirect, url_for, send_from_directory, request, make_response, jsonify
 import os
 import re
-from generate_table import generate_html_from_custom_fields
+import json
+import threading
+import time
+import generate_table
+from generate_table import generate_html_from_custom_fields, update_html_from_custom_fields, adapt_html_from_template, build_api_endpoint
+import similarity_index
+import template_update
+import shared_cache
+import profiling
+from admission import AdmissionController
+import model_router
+import fragment_cache
+import js_cache
+import template_store
 
 app = Flask(__name__)
+# Templates are rewritten while the app runs (/update, template_store), so
+# Jinja must check their mtime instead of serving the first compiled version
+app.config['TEMPLATES_AUTO_RELOAD'] = True
+
+# Opt-in per-request and continuous profiling (see profiling.py)
+profiling.install(app, 'server')
+
+# Hydration settings: when enabled, /view fetches the form's record server-side
+# and embeds it in the page so the browser does not need a second round trip
+HYDRATE_VIEWS = os.getenv('HYDRATE_VIEWS', '0') == '1'
+HYDRATE_TIMEOUT = float(os.getenv('HYDRATE_TIMEOUT', '3'))
+hydration_cache = shared_cache.make_cache('hydration', ttl=float(os.getenv('HYDRATE_CACHE_TTL', '5')))
+
+# Admission control for LLM-backed generation (/create and /update)
+generation_admission = AdmissionController(
+    'generation',
+    max_concurrent=int(os.getenv('GENERATION_MAX_CONCURRENT', '4')),
+    max_per_client=int(os.getenv('GENERATION_MAX_PER_CLIENT', '2')),
+    max_queue=int(os.getenv('GENERATION_MAX_QUEUE', '16')),
+    max_queue_time=float(os.getenv('GENERATION_MAX_QUEUE_SECONDS', '30')),
+    workers=int(os.getenv('ADMISSION_WORKERS', '1'))
+)
+
+def reject_generation(rejection):
+    return make_response(render_template('home.html',
+                                         message=f"Server is busy, please retry in {rejection.retry_after} seconds",
+                                         message_class="error-message",
+                                         subfolders=get_subfolders()))
+
+# Similar-template reuse: a new form whose custom fields are close enough to an
+# existing template's is offered that template instead of being regenerated
+SIMILAR_TEMPLATE_THRESHOLD = float(os.getenv('SIMILAR_TEMPLATE_THRESHOLD', '0.7'))
+GENERATE_NEW = '__new__'
+template_index = None
+template_index_lock = threading.Lock()
+
+# Each worker process has its own index; templates created or updated by other
+# workers are picked up by comparing file modification times, at most once per
+# TEMPLATE_INDEX_SYNC_SECONDS
+TEMPLATE_INDEX_SYNC_SECONDS = float(os.getenv('TEMPLATE_INDEX_SYNC_SECONDS', '2'))
+template_stamps = {}
+template_index_synced_at = 0.0
+
+def get_template_index():
+    # Build the similarity index from the templates on disk on first use
+    global template_index
+    if template_index is None:
+        with template_index_lock:
+            if template_index is None:
+                default_lines = read_default_field_lines()
+                folders = get_subfolders()
+                template_stamps.update((folder, template_stamp(folder)) for folder in folders)
+                index = similarity_index.SimilarityIndex()
+                index.add_many(
+                    (folder, *template_document(folder, default_lines)) for folder in folders
+                )
+                print(f"Indexed {len(index)} templates for similarity search")
+                template_index = index
+    return template_index
+
+def template_stamp(folder):
+    # Modification times of the files a template's index entry is read from
+    template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', folder)
+    stamp = []
+    for name in ('custom_fields.txt', 'specs.json'):
+        path = os.path.join(template_dir, name)
+        stamp.append(os.stat(path).st_mtime_ns if os.path.exists(path) else 0)
+    return tuple(stamp)
+
+def sync_template_index():
+    # Re-index templates that were created, changed or deleted by other workers
+    global template_index_synced_at
+    index = get_template_index()
+    if time.monotonic() - template_index_synced_at < TEMPLATE_INDEX_SYNC_SECONDS:
+        return index
+    with template_index_lock:
+        template_index_synced_at = time.monotonic()
+        folders = set(get_subfolders())
+        default_lines = None
+        for folder in folders:
+            stamp = template_stamp(folder)
+            if template_stamps.get(folder) != stamp:
+                default_lines = default_lines if default_lines is not None else read_default_field_lines()
+                index.add(folder, *template_document(folder, default_lines))
+                template_stamps[folder] = stamp
+        for folder in set(template_stamps) - folders:
+            index.remove(folder)
+            del template_stamps[folder]
+    return index
+
+def read_default_field_lines():
+    try:
+        with open('default_field.txt', 'r') as f:
+            return template_update.parse_field_lines(f.read())
+    except Exception as e:
+        print(f"Error loading default field definitions: {str(e)}")
+        return []
+
+def template_document(folder, default_lines):
+    # (text, metadata) indexed for a template
+    template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', folder)
+    text, adaptable = similarity_index.template_text(template_dir, default_lines)
+    return text, {'adaptable': adaptable}
+
+def index_template(folder):
+    # Add or refresh one template in the index, if the index has been built
+    if template_index is not None:
+        template_index.add(folder, *template_document(folder, read_default_field_lines()))
+        template_stamps[folder] = template_stamp(folder)
+
+def find_similar_templates(custom_fields, limit=3):
+    """
+    Find existing templates whose custom fields are similar to the given ones
+    
+    Args:
+        custom_fields (str): Custom field definitions
+        limit (int): Maximum number of templates
+    
+    Returns:
+        list: Dicts with 'name', 'score' and 'adaptable', best match first
+    """
+    matches = sync_template_index().query(custom_fields, limit=limit, min_score=SIMILAR_TEMPLATE_THRESHOLD)
+    return [
+        {'name': name, 'score': score, 'adaptable': metadata.get('adaptable', False)}
+        for name, score, metadata in matches
+    ]
+
+# Pooled HTTP client for server-side calls to the mock data API, created on
+# first use so every worker process gets its own connection pool
+http_session = None
+http_session_lock = threading.Lock()
+
+def get_http_session():
+    global http_session
+    if http_session is None:
+        with http_session_lock:
+            if http_session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=32))
+                session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=32))
+                http_session = session
+    return http_session
+
+def preload():
+    # Import heavy libraries and create the LLM client before workers fork.
+    # No connections are opened here, so no socket is shared across the fork.
+    generate_table.preload()
+
+if os.getenv('PRELOAD_CLIENTS', '0') == '1':
+    preload()
+
+HYDRATION_SCRIPT = """<script>
+window.__INITIAL_DATA__ = {data};
+(function() {{
+    // Serve the form's first data request from the embedded record; any later
+    // request, or a page rendered without hydration, goes to the network
+    var endpoint = {endpoint};
+    var originalFetch = window.fetch;
+    window.fetch = function(input, init) {{
+        var url = typeof input === 'string' ? input : (input && input.url);
+        if (window.__INITIAL_DATA__ && url === endpoint) {{
+            var body = JSON.stringify(window.__INITIAL_DATA__);
+            window.__INITIAL_DATA__ = null;
+            return Promise.resolve(new Response(body, {{
+                status: 200,
+                headers: {{'Content-Type': 'application/json'}}
+            }}));
+        }}
+        return originalFetch.apply(this, arguments);
+    }};
+}})();
+</script>
+"""
 
 @app.route('/')
 def home():
@@ -14,9 +202,11 @@ def home():
     return render_template('home.html', subfolders=subfolders)
 
 @app.route('/create', methods=['POST'])
+@generation_admission.limit(reject_generation)
 def create_template():
     template_name = request.form.get('template_name', '').strip()
     custom_fields = request.form.get('custom_fields', '').strip()
+    reuse = request.form.get('reuse', '').strip()
     print("from main", custom_fields)
     
     # Validate template name
@@ -41,29 +231,114 @@ def create_template():
                                message_class="error-message",
                                subfolders=get_subfolders())
     
+    # Reuse a similar template the user picked
+    if reuse and reuse != GENERATE_NEW:
+        return create_from_similar_template(template_name, custom_fields, reuse)
+    
+    # Offer similar existing templates before generating a new one
+    if not reuse and custom_fields:
+        similar = find_similar_templates(custom_fields)
+        if similar:
+            return render_template('home.html',
+                                   message=f"Found {len(similar)} existing template(s) similar to these custom fields",
+                                   message_class="info-message",
+                                   similar=similar,
+                                   template_name=template_name,
+                                   custom_fields=custom_fields,
+                                   generate_new=GENERATE_NEW,
+                                   subfolders=get_subfolders())
+    
+    # Claim the name before spending tokens on it, so concurrent requests for
+    # the same template fail fast instead of generating it twice
+    try:
+        reservation = template_store.reserve(template_name)
+    except (template_store.TemplateExistsError, template_store.TemplateBusyError) as e:
+        return reservation_error(e)
+    
     # Generate HTML using LLM based on custom fields
     try:
-        generated_content = generate_html_from_custom_fields(custom_fields, template_name)
-        if not generated_content or 'html' not in generated_content:
-            return render_template('home.html',
-                                  message="Failed to generate HTML content",
-                                  message_class="error-message",
-                                  subfolders=get_subfolders())
+        with reservation:
+            generated_content = generate_html_from_custom_fields(custom_fields, template_name)
+            if not generated_content or 'html' not in generated_content:
+                return render_template('home.html',
+                                      message="Failed to generate HTML content",
+                                      message_class="error-message",
+                                      subfolders=get_subfolders())
+            
+            files = {'index.html': generated_content['html']}
+            # Create specs.json file if specs content exists
+            if 'specs' in generated_content and generated_content['specs']:
+                files['specs.json'] = generated_content['specs']
+            # Keep the custom fields for similarity search
+            files['custom_fields.txt'] = custom_fields
+            # Written to a staging directory and renamed into templates/ in one step
+            reservation.publish(files)
+        index_template(template_name)
         
-        # Create template directory
-        os.makedirs(template_dir)
-        
-        # Create index.html file
-        with open(os.path.join(template_dir, 'index.html'), 'w', encoding='utf-8') as f:
-            f.write(generated_content['html'])
-        
-        # Create specs.json file if specs content exists
-        if 'specs' in generated_content and generated_content['specs']:
-            with open(os.path.join(template_dir, 'specs.json'), 'w', encoding='utf-8') as f:
-                f.write(generated_content['specs'])
+        message = f"Template '{template_name}' created successfully"
+        optimization = generated_content.get('optimization')
+        if optimization and not optimization['within_budget']:
+            message += (f", but the page is {optimization['optimized_bytes']} bytes, "
+                        f"over the {optimization['budget']}-byte budget")
+        return render_template('home.html', 
+                               message=message, 
+                               message_class="success-message",
+                               subfolders=get_subfolders())
+    except Exception as e:
+        return render_template('home.html', 
+                               message=f"Error creating template: {str(e)}", 
+                               message_class="error-message",
+                               subfolders=get_subfolders())
+
+def reservation_error(error):
+    # Page shown when a template name is taken or another request holds it
+    return render_template('home.html', 
+                           message=str(error), 
+                           message_class="error-message",
+                           subfolders=get_subfolders())
+
+def create_from_similar_template(template_name, custom_fields, source_name):
+    # Create template_name by adapting the existing template source_name
+    source_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', source_name)
+    html_path = os.path.join(source_dir, 'index.html')
+    specs_path = os.path.join(source_dir, 'specs.json')
+    if not re.match(r'^[a-zA-Z0-9_-]+$', source_name) or not os.path.exists(html_path) or not os.path.exists(specs_path):
+        return render_template('home.html', 
+                               message=f"Template '{source_name}' does not exist", 
+                               message_class="error-message",
+                               subfolders=get_subfolders())
+    
+    try:
+        reservation = template_store.reserve(template_name)
+    except (template_store.TemplateExistsError, template_store.TemplateBusyError) as e:
+        return reservation_error(e)
+    
+    try:
+        with reservation:
+            with open(html_path, 'r', encoding='utf-8') as f:
+                source_html = f.read()
+            with open(specs_path, 'r', encoding='utf-8') as f:
+                source_specs = f.read()
+            
+            adapted = adapt_html_from_template(custom_fields, source_html, source_specs, source_name, template_name)
+            if not adapted:
+                return render_template('home.html',
+                                      message=f"Failed to adapt template '{source_name}'",
+                                      message_class="error-message",
+                                      subfolders=get_subfolders())
+            
+            reservation.publish({
+                'index.html': adapted['html'],
+                'specs.json': adapted['specs'],
+                'custom_fields.txt': adapted['custom_fields']
+            })
+        index_template(template_name)
         
+        diff = adapted['diff']
         return render_template('home.html', 
-                               message=f"Template '{template_name}' created successfully", 
+                               message=(f"Template '{template_name}' created from '{source_name}': "
+                                        f"{len(diff['unchanged'])} fields reused, {len(diff['added'])} added, "
+                                        f"{len(diff['changed'])} changed, {len(diff['removed'])} removed"), 
                                message_class="success-message",
                                subfolders=get_subfolders())
     except Exception as e:
@@ -72,6 +347,77 @@ def create_template():
                                message_class="error-message",
                                subfolders=get_subfolders())
 
+@app.route('/similar')
+def similar_templates():
+    # Existing templates similar to ?custom_fields=..., as JSON
+    custom_fields = request.args.get('custom_fields', '')
+    limit = request.args.get('limit', 3, type=int)
+    return jsonify(find_similar_templates(custom_fields, limit=max(1, min(limit, 20))))
+
+@app.route('/update', methods=['POST'])
+@generation_admission.limit(reject_generation)
+def update_template():
+    template_name = request.form.get('template_name', '').strip()
+    custom_fields = request.form.get('custom_fields', '').strip()
+    
+    # Validate template name
+    if not re.match(r'^[a-zA-Z0-9_-]+$', template_name):
+        return render_template('home.html', 
+                               message="Template name can only contain letters, numbers, underscores and hyphens", 
+                               message_class="error-message",
+                               subfolders=get_subfolders())
+    
+    # Only existing templates can be updated
+    template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', template_name)
+    html_path = os.path.join(template_dir, 'index.html')
+    specs_path = os.path.join(template_dir, 'specs.json')
+    if not os.path.exists(html_path) or not os.path.exists(specs_path):
+        return render_template('home.html', 
+                               message=f"Template '{template_name}' does not exist", 
+                               message_class="error-message",
+                               subfolders=get_subfolders())
+    
+    # One update per template at a time; a second one would overwrite the first
+    try:
+        reservation = template_store.lock_existing(template_name)
+    except (template_store.TemplateNotFoundError, template_store.TemplateBusyError) as e:
+        return reservation_error(e)
+    
+    try:
+        with reservation:
+            with open(html_path, 'r', encoding='utf-8') as f:
+                existing_html = f.read()
+            with open(specs_path, 'r', encoding='utf-8') as f:
+                existing_specs = f.read()
+            
+            # Regenerate only the rows whose field definitions changed
+            updated_content = update_html_from_custom_fields(custom_fields, existing_html, existing_specs)
+            if not updated_content:
+                return render_template('home.html',
+                                      message="Failed to update template content",
+                                      message_class="error-message",
+                                      subfolders=get_subfolders())
+            
+            # Each file is replaced atomically; readers see the old or the new version
+            reservation.publish({
+                'specs.json': updated_content['specs'],
+                'index.html': updated_content['html'],
+                'custom_fields.txt': custom_fields
+            })
+        index_template(template_name)
+        
+        diff = updated_content['diff']
+        return render_template('home.html', 
+                               message=(f"Template '{template_name}' updated: {len(diff['added'])} added, "
+                                        f"{len(diff['changed'])} changed, {len(diff['removed'])} removed"), 
+                               message_class="success-message",
+                               subfolders=get_subfolders())
+    except Exception as e:
+        return render_template('home.html', 
+                               message=f"Error updating template: {str(e)}", 
+                               message_class="error-message",
+                               subfolders=get_subfolders())
+
 @app.route('/view/<folder>')
 def view_template(folder):
     # Check if folder exists
@@ -80,7 +426,78 @@ def view_template(folder):
         return redirect(url_for('home'))
     
     # Serve the index.html file from that folder
-    return render_template(f'{folder}/index.html')
+    page = render_template(f'{folder}/index.html')
+    
+    hydrate = request.args.get('hydrate', '1' if HYDRATE_VIEWS else '0') in ('1', 'true')
+    if hydrate:
+        page = hydrate_page(page, folder)
+    return page
+
+def fetch_initial_data(api_endpoint):
+    """
+    Fetch a form's record server-side, reusing a recent response if one is cached
+    
+    Args:
+        api_endpoint (str): The mock data API endpoint the page would call
+    
+    Returns:
+        dict: The API response, or None if the request failed
+    """
+    cached = hydration_cache.get(api_endpoint)
+    if cached is not None:
+        return cached
+    
+    try:
+        response = get_http_session().get(api_endpoint, timeout=HYDRATE_TIMEOUT)
+        if response.status_code != 200:
+            print(f"Hydration fetch failed: {response.status_code} - {response.text[:200]}")
+            return None
+        data = response.json()
+        if not isinstance(data, dict):
+            print(f"Hydration fetch returned {type(data).__name__}, expected an object")
+            return None
+    except Exception as e:
+        print(f"Error fetching data for hydration: {str(e)}")
+        return None
+    
+    if data.get('success'):
+        hydration_cache.set(api_endpoint, data)
+    return data
+
+def hydrate_page(page, folder):
+    """
+    Embed the form's record in the page as inline JSON. The page's own fetch
+    logic is left in place and is only used when hydration is unavailable.
+    
+    Args:
+        page (str): Rendered index.html
+        folder (str): Template name
+    
+    Returns:
+        str: The hydrated page, or the original page if the data could not be fetched
+    """
+    api_endpoint = build_api_endpoint(folder)
+    if not api_endpoint:
+        return page
+    data = fetch_initial_data(api_endpoint)
+    if not data:
+        return page
+    
+    # Escape characters that could end the script block or break JS parsing
+    def to_script_json(value):
+        return (json.dumps(value, ensure_ascii=False)
+                .replace('<', '\\u003c')
+                .replace('\u2028', '\\u2028')
+                .replace('\u2029', '\\u2029'))
+    
+    script = HYDRATION_SCRIPT.format(data=to_script_json(data), endpoint=to_script_json(api_endpoint))
+    
+    # The shim must run before the page's own scripts
+    for marker in ('<script', '</head>', '</body>'):
+        index = page.find(marker)
+        if index != -1:
+            return page[:index] + script + page[index:]
+    return page + script
 
 @app.route('/view/<folder>/<path:filename>')
 def template_static(folder, filename):
@@ -88,6 +505,28 @@ def template_static(folder, filename):
     template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', folder)
     return send_from_directory(template_dir, filename)
 
+@app.route('/admission')
+def admission_stats():
+    # In-flight and queued generation requests, for monitoring
+    return jsonify(generation_admission.stats())
+
+@app.route('/routing')
+def routing_stats():
+    # Model tier decisions and escalation rates, for monitoring
+    return jsonify(model_router.routing_stats.snapshot())
+
+@app.route('/fragments')
+def fragment_stats():
+    # Field row cache hit rate and size, for monitoring
+    cache = fragment_cache.get_cache()
+    return jsonify(cache.stats() if cache else {'enabled': False})
+
+@app.route('/scripts')
+def script_stats():
+    # Form script cache hit rate and size, for monitoring
+    cache = js_cache.get_cache()
+    return jsonify(cache.stats() if cache else {'enabled': False})
+
 def get_subfolders():
     # Helper function to get all template subfolders
     template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
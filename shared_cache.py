@@ -0,0 +1,128 @@
+"""
+Cache shared by all worker processes of a pre-forking server.
+
+SharedCache has the same interface as TTLCache but keeps its entries in a
+SQLite database, so a value cached by one worker (an option list, a hydration
+response) is a hit in every other worker and survives worker restarts.
+Values must be JSON-serialisable.
+
+make_cache() returns a SharedCache when SHARED_CACHE names a database file
+and a per-process TTLCache otherwise, so single-process development needs no
+setup.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from ttl_cache import TTLCache
+
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE", "")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_expiry ON entries (namespace, expires_at);
+"""
+
+
+class SharedCache:
+    """
+    SQLite-backed key/value cache with per-entry expiry and a size bound.
+
+    Args:
+        path (str): Database file, shared by the processes using the cache
+        namespace (str): Keeps this cache's keys apart from other caches in the same file
+        ttl (float): Seconds an entry stays valid after it is set
+        max_entries (int): Maximum number of entries; the entries closest to expiry are evicted first
+    """
+
+    def __init__(self, path, namespace, ttl, max_entries=1024):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._sets = 0
+
+    def _connection(self):
+        # Connections must not cross a fork, so each process opens its own
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired"""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value FROM entries WHERE namespace = ? AND key = ? AND expires_at >= ?",
+                (self.namespace, str(key), time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key, value, ttl=None):
+        """Store value under key for ttl seconds (defaults to the cache's ttl)"""
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (self.namespace, str(key), json.dumps(value, ensure_ascii=False), expires_at)
+                )
+                # Trimming scans the namespace, so it runs on every 64th write
+                self._sets += 1
+                if self._sets % 64 == 0:
+                    self._trim(conn)
+
+    def _trim(self, conn):
+        conn.execute("DELETE FROM entries WHERE namespace = ? AND expires_at < ?", (self.namespace, time.time()))
+        conn.execute(
+            "DELETE FROM entries WHERE namespace = ? AND key IN "
+            "(SELECT key FROM entries WHERE namespace = ? ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.max_entries)
+        )
+
+    def delete(self, key):
+        """Remove key from the cache if present"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (self.namespace, str(key)))
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM entries WHERE namespace = ?", (self.namespace,))
+
+
+def make_cache(namespace, ttl, max_entries=1024):
+    """
+    Create a cache that is shared across workers when SHARED_CACHE is set
+
+    Args:
+        namespace (str): Name of the cache within the shared database
+        ttl (float): Seconds an entry stays valid
+        max_entries (int): Maximum number of entries
+
+    Returns:
+        SharedCache or TTLCache: The cache
+    """
+    if SHARED_CACHE_PATH:
+        return SharedCache(SHARED_CACHE_PATH, namespace, ttl, max_entries)
+    return TTLCache(ttl, max_entries)
@@ -0,0 +1,320 @@
+"""
+Local similarity index over templates' custom field definitions.
+
+Texts are normalised (lower case, Vietnamese diacritics removed, punctuation
+dropped) and turned into character trigrams plus word bigrams, weighted with
+TF-IDF and compared by cosine similarity. Paraphrases such as "độ hài lòng của
+khách hàng, thang điểm từ 1 tới 5" and "Do hai long khach hang (thang diem 1-5)"
+share most of their features, so they score close to 1.
+
+The index is an inverted index (feature -> postings), so a query only touches
+templates that share its rarer features. Documents can be added, replaced and
+removed one at a time.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+import template_update
+
+
+def normalize_text(text):
+    """
+    Normalise Vietnamese text for fuzzy comparison
+
+    Args:
+        text (str): Free text
+
+    Returns:
+        str: Lower-case text without diacritics or punctuation, single-spaced
+    """
+    text = unicodedata.normalize('NFD', text.lower().replace('đ', 'd').replace('Đ', 'd'))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    text = re.sub(r'[^\w]+|_', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def text_features(text, ngram=3):
+    """
+    Extract the features of a text
+
+    Args:
+        text (str): Free text
+        ngram (int): Character n-gram length
+
+    Returns:
+        Counter: Feature counts (character n-grams within words, and word bigrams)
+    """
+    features = Counter()
+    words = normalize_text(text).split()
+    for word in words:
+        padded = f" {word} "
+        for i in range(max(1, len(padded) - ngram + 1)):
+            features[padded[i:i + ngram]] += 1
+    for first, second in zip(words, words[1:]):
+        features[f"{first}+{second}"] += 1
+    return features
+
+
+def _cosine(first, second):
+    dot = sum(weight * second.get(feature, 0.0) for feature, weight in first.items())
+    norms = math.sqrt(sum(w * w for w in first.values())) * math.sqrt(sum(w * w for w in second.values()))
+    return dot / norms if norms else 0.0
+
+
+def match_lines(new_lines, old_lines, min_score=0.7, ngram=3):
+    """
+    Pair new field definition lines with the most similar old lines, one to one.
+    Lines that mention different numbers (e.g. rating scales 1-5 and 1-10) never pair.
+
+    Args:
+        new_lines (list): New definition lines
+        old_lines (list): Existing definition lines
+        min_score (float): Minimum cosine similarity for a pair
+        ngram (int): Character n-gram length
+
+    Returns:
+        dict: Maps each matched new line to its old line
+    """
+    old_weights = [
+        {feature: 1 + math.log(count) for feature, count in text_features(line, ngram).items()}
+        for line in old_lines
+    ]
+    pairs = []
+    for new_line in new_lines:
+        weights = {feature: 1 + math.log(count) for feature, count in text_features(new_line, ngram).items()}
+        numbers = re.findall(r'\d+', new_line)
+        for old_line, candidate in zip(old_lines, old_weights):
+            if re.findall(r'\d+', old_line) != numbers:
+                continue
+            score = _cosine(weights, candidate)
+            if score >= min_score:
+                pairs.append((score, new_line, old_line))
+
+    matches = {}
+    used = set()
+    for score, new_line, old_line in sorted(pairs, key=lambda pair: pair[0], reverse=True):
+        if new_line not in matches and old_line not in used:
+            matches[new_line] = old_line
+            used.add(old_line)
+    return matches
+
+
+class SimilarityIndex:
+    """
+    Incremental TF-IDF cosine similarity index.
+
+    Queries first collect candidates from the postings of the query's rarest
+    features, up to a budget of postings, then score the best candidates
+    exactly against all query features. A near-duplicate always shares rare
+    features with the query, so common features (found in most templates) never
+    have to be scanned.
+
+    IDF is smoothed by adding idf_smoothing to both document counts, so a small
+    index (a few templates) weighs features almost uniformly instead of
+    over-weighting every feature that happens to occur once.
+
+    Document norms depend on the IDF of their features, which shifts as
+    documents are added. Norms are therefore recomputed in one pass whenever
+    the document count has drifted by refresh_ratio since the last pass, which
+    keeps additions cheap while scores stay accurate.
+
+    Args:
+        ngram (int): Character n-gram length
+        candidate_postings (int): Postings scanned to collect candidates per query
+        candidates (int): Candidates scored exactly per query
+        refresh_ratio (float): Relative change in document count that triggers a norm refresh
+        idf_smoothing (int): Pseudo-count added to document frequencies
+    """
+
+    def __init__(self, ngram=3, candidate_postings=5000, candidates=50, refresh_ratio=0.2, idf_smoothing=50):
+        self.ngram = ngram
+        self.idf_smoothing = idf_smoothing
+        self.candidate_postings = candidate_postings
+        self.candidates = candidates
+        self.refresh_ratio = refresh_ratio
+        self._lock = threading.RLock()
+        self._postings = {}
+        self._documents = {}
+        self._norms = {}
+        self._norms_size = 0
+
+    def __len__(self):
+        return len(self._documents)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._documents
+
+    def _idf(self, feature):
+        smoothing = self.idf_smoothing
+        return math.log((len(self._documents) + smoothing) / (len(self._postings.get(feature, ())) + smoothing)) + 1
+
+    def _refresh_norms(self, force=False):
+        size = len(self._documents)
+        if not force and abs(size - self._norms_size) <= self.refresh_ratio * max(self._norms_size, 50):
+            return
+        total = math.log(size + self.idf_smoothing)
+        idf = {feature: total - math.log(len(postings) + self.idf_smoothing) + 1
+               for feature, postings in self._postings.items()}
+        self._norms = {
+            doc_id: math.sqrt(sum((weight * idf[feature]) ** 2 for feature, weight in document['weights'].items())) or 1.0
+            for doc_id, document in self._documents.items()
+        }
+        self._norms_size = size
+
+    def _weights(self, text):
+        return {feature: 1 + math.log(count) for feature, count in text_features(text, self.ngram).items()}
+
+    def _insert(self, doc_id, weights, metadata):
+        self._remove(doc_id)
+        self._documents[doc_id] = {'weights': weights, 'metadata': metadata or {}}
+        for feature, weight in weights.items():
+            self._postings.setdefault(feature, {})[doc_id] = weight
+
+    def add(self, doc_id, text, metadata=None):
+        """
+        Add a document, replacing any existing document with the same id
+
+        Args:
+            doc_id (str): Document id (template name)
+            text (str): Text to index
+            metadata (dict, optional): Returned with query results
+        """
+        weights = self._weights(text)
+        with self._lock:
+            self._insert(doc_id, weights, metadata)
+            self._norms[doc_id] = math.sqrt(
+                sum((weight * self._idf(feature)) ** 2 for feature, weight in weights.items())) or 1.0
+            self._refresh_norms()
+
+    def add_many(self, documents):
+        """
+        Add many documents at once, with a single norm refresh at the end
+
+        Args:
+            documents (iterable): (doc_id, text, metadata) tuples
+        """
+        prepared = [(doc_id, self._weights(text), metadata) for doc_id, text, metadata in documents]
+        with self._lock:
+            for doc_id, weights, metadata in prepared:
+                self._insert(doc_id, weights, metadata)
+            self._refresh_norms(force=True)
+
+    def remove(self, doc_id):
+        """Remove a document if it is indexed"""
+        with self._lock:
+            self._remove(doc_id)
+            self._refresh_norms()
+
+    def _remove(self, doc_id):
+        document = self._documents.pop(doc_id, None)
+        if document is None:
+            return
+        self._norms.pop(doc_id, None)
+        for feature in document['weights']:
+            postings = self._postings.get(feature)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[feature]
+
+    def query(self, text, limit=3, min_score=0.0):
+        """
+        Find the documents most similar to a text
+
+        Args:
+            text (str): Query text
+            limit (int): Maximum number of results
+            min_score (float): Minimum cosine similarity (0-1)
+
+        Returns:
+            list: (doc_id, score, metadata) tuples, best first
+        """
+        features = text_features(text, self.ngram)
+        with self._lock:
+            if not self._documents or not features:
+                return []
+
+            # Query weights, rarest features first
+            terms = []
+            query_norm = 0.0
+            for feature, count in features.items():
+                idf = self._idf(feature)
+                weight = (1 + math.log(count)) * idf
+                query_norm += weight ** 2
+                postings = self._postings.get(feature)
+                if postings:
+                    terms.append((len(postings), feature, weight * idf, postings))
+            query_norm = math.sqrt(query_norm) or 1.0
+            terms.sort(key=lambda term: term[0])
+
+            # Candidates from the rare features' postings
+            partial = Counter()
+            scanned = 0
+            for df, _, weight, postings in terms:
+                if scanned and scanned + df > self.candidate_postings:
+                    break
+                scanned += df
+                for doc_id, doc_weight in postings.items():
+                    partial[doc_id] += weight * doc_weight
+
+            # Exact cosine for the best candidates
+            results = []
+            for doc_id, _ in partial.most_common(max(self.candidates, limit)):
+                doc_weights = self._documents[doc_id]['weights']
+                dot = sum(weight * doc_weights.get(feature, 0.0) for _, feature, weight, _ in terms)
+                score = min(1.0, dot / (query_norm * self._norms[doc_id]))
+                if score >= min_score:
+                    results.append((doc_id, score))
+            results.sort(key=lambda result: result[1], reverse=True)
+            return [(doc_id, round(score, 4), self._documents[doc_id]['metadata'])
+                    for doc_id, score in results[:limit]]
+
+
+def template_text(template_dir, default_lines=None):
+    """
+    Text describing a template's custom fields, for indexing
+
+    Uses the saved custom_fields.txt if present, otherwise the definition lines
+    recorded in specs.json ("mo_ta"), otherwise the display names. Default
+    fields are left out since every template has them.
+
+    Args:
+        template_dir (str): Template directory
+        default_lines (list, optional): Default field definition lines
+
+    Returns:
+        tuple: (text, adaptable) where adaptable is True when the template's
+               specs record definition lines, so it can be updated incrementally
+    """
+    default_keys = {template_update.field_key(line) for line in (default_lines or [])}
+
+    specs = []
+    specs_path = os.path.join(template_dir, 'specs.json')
+    if os.path.exists(specs_path):
+        try:
+            with open(specs_path, 'r', encoding='utf-8') as f:
+                specs = json.load(f)
+        except Exception as e:
+            print(f"Error reading {specs_path}: {str(e)}")
+    adaptable = any(entry.get('mo_ta') for entry in specs)
+
+    fields_path = os.path.join(template_dir, 'custom_fields.txt')
+    if os.path.exists(fields_path):
+        with open(fields_path, 'r', encoding='utf-8') as f:
+            return f.read().strip(), adaptable
+
+    lines = []
+    for entry in specs:
+        source = entry.get('mo_ta')
+        if source:
+            if template_update.field_key(source) not in default_keys and source not in lines:
+                lines.append(source)
+        elif entry.get('ten_hien_thi'):
+            lines.append(entry['ten_hien_thi'])
+    return "\n".join(lines), adaptable
@@ -0,0 +1,291 @@
+"""
+Append-only log of mock form submissions.
+
+Submissions are written to a SQLite database in WAL mode by one background
+writer thread per process. A request thread only puts the submission on a
+queue and gets its id back at once; the writer takes everything queued
+since its last commit and inserts it in a single transaction (group commit),
+so the cost of a commit is shared by all submissions in the batch and request
+threads never wait for the disk.
+
+Reads see every submission queued by the same process before the read
+(read-your-writes), because a read first waits for the writer to commit
+them. Submissions from other worker processes are visible once their writer
+has committed, normally within milliseconds.
+
+Ids are "SUB_" followed by the creation time in nanoseconds (hex) and random
+bits, so they are unique across processes and sort by creation time.
+"""
+
+import atexit
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+
+import json_backend
+
+SUBMISSION_STORE_PATH = os.getenv("SUBMISSION_STORE", "submissions.db")
+SUBMISSION_BATCH_SIZE = int(os.getenv("SUBMISSION_BATCH_SIZE", "1000"))
+SUBMISSION_QUEUE_SIZE = int(os.getenv("SUBMISSION_QUEUE_SIZE", "100000"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    seq INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    template TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    valid INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    errors TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS submissions_template ON submissions (template, seq);
+CREATE INDEX IF NOT EXISTS submissions_created_at ON submissions (created_at);
+"""
+
+_STOP = object()
+
+
+def new_submission_id():
+    """Unique, time-ordered submission id"""
+    return f"SUB_{time.time_ns():016x}{secrets.token_hex(4)}"
+
+
+def _row_to_submission(row):
+    seq, submission_id, template, created_at, valid, data, errors = row
+    return {
+        'seq': seq,
+        'submission_id': submission_id,
+        'template': template,
+        'created_at': created_at,
+        'valid': bool(valid),
+        'data': json_backend.loads(data),
+        'errors': json_backend.loads(errors)
+    }
+
+
+class SubmissionStore:
+    """
+    SQLite-backed append-only submission log with a group-committing writer.
+
+    Args:
+        path (str): Database file
+        batch_size (int): Maximum submissions per transaction
+        queue_size (int): Maximum submissions waiting for the writer; appends block beyond it
+    """
+
+    def __init__(self, path, batch_size=1000, queue_size=100000):
+        self.path = path
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._committed = threading.Condition()
+        self._conn = None
+        self._pid = None
+        self._queue = None
+        self._writer = None
+        self._enqueued = 0
+        self._written = 0
+        self._stats = {'appended': 0, 'committed': 0, 'batches': 0, 'largest_batch': 0, 'errors': 0}
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL only syncs at checkpoints, so commits do not wait for fsync
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _connection(self):
+        # Connections and the writer thread must not cross a fork, so each
+        # process opens its own
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = self._connect()
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._enqueued = self._written = 0
+            self._writer = threading.Thread(target=self._write_loop, args=(self._queue,),
+                                            name='submission-writer', daemon=True)
+            self._writer.start()
+            self._pid = os.getpid()
+        return self._conn
+
+    def append(self, template, data, valid=True, errors=None):
+        """
+        Queue a submission for writing
+
+        Args:
+            template (str): Template the form belongs to
+            data (dict): Submitted field values
+            valid (bool): Whether the submission passed validation
+            errors (list, optional): Validation errors
+
+        Returns:
+            dict: 'submission_id' and 'created_at' (epoch seconds)
+        """
+        submission_id = new_submission_id()
+        created_at = time.time()
+        row = (submission_id, template, created_at, int(valid),
+               json_backend.dumps(data), json_backend.dumps(errors or []))
+        with self._lock:
+            self._connection()
+            pending = self._queue
+            self._enqueued += 1
+            self._stats['appended'] += 1
+        pending.put(row)
+        return {'submission_id': submission_id, 'created_at': created_at}
+
+    def _write_loop(self, pending):
+        conn = self._connect()
+        while True:
+            batch = [pending.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+            stop = _STOP in batch
+            rows = [row for row in batch if row is not _STOP]
+            if rows:
+                try:
+                    with conn:
+                        conn.executemany(
+                            "INSERT INTO submissions (id, template, created_at, valid, data, errors) "
+                            "VALUES (?, ?, ?, ?, ?, ?)", rows
+                        )
+                    outcome = 'committed'
+                except sqlite3.Error as e:
+                    print(f"Error writing {len(rows)} submission(s): {str(e)}")
+                    outcome = 'errors'
+                with self._lock:
+                    self._stats[outcome] += len(rows)
+                    self._stats['batches'] += 1
+                    self._stats['largest_batch'] = max(self._stats['largest_batch'], len(rows))
+            with self._committed:
+                self._written += len(rows)
+                self._committed.notify_all()
+            if stop:
+                conn.close()
+                return
+
+    def flush(self, timeout=5.0):
+        """
+        Wait until every submission this process queued so far is committed
+
+        Args:
+            timeout (float): Maximum seconds to wait
+
+        Returns:
+            bool: True if everything was committed in time
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                return True
+            target = self._enqueued
+        with self._committed:
+            return self._committed.wait_for(lambda: self._written >= target, timeout)
+
+    def close(self):
+        """Commit queued submissions and stop the writer"""
+        with self._lock:
+            if self._pid != os.getpid() or self._writer is None:
+                return
+            pending, writer = self._queue, self._writer
+            self._pid = None
+        pending.put(_STOP)
+        writer.join(timeout=10)
+
+    def get(self, submission_id):
+        """
+        Look up a submission by id
+
+        Args:
+            submission_id (str): Id returned by append()
+
+        Returns:
+            dict: The submission, or None if there is none with that id
+        """
+        self.flush()
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT seq, id, template, created_at, valid, data, errors FROM submissions WHERE id = ?",
+                (submission_id,)
+            ).fetchone()
+        return _row_to_submission(row) if row else None
+
+    def query(self, template=None, since=None, until=None, valid=None, after=None, limit=100):
+        """
+        List submissions in the order they were written
+
+        Args:
+            template (str, optional): Only this template's submissions
+            since (float, optional): Only submissions created at or after this time (epoch seconds)
+            until (float, optional): Only submissions created before this time (epoch seconds)
+            valid (bool, optional): Only valid (True) or invalid (False) submissions
+            after (int, optional): Cursor: only submissions after this seq (from 'next_cursor')
+            limit (int): Page size
+
+        Returns:
+            dict: 'submissions' (list) and 'next_cursor' (None on the last page)
+        """
+        self.flush()
+        conditions, params = [], []
+        for condition, value in (("template = ?", template), ("created_at >= ?", since),
+                                 ("created_at < ?", until), ("seq > ?", after)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        if valid is not None:
+            conditions.append("valid = ?")
+            params.append(int(valid))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT seq, id, template, created_at, valid, data, errors FROM submissions {where} "
+                f"ORDER BY seq LIMIT ?", params + [limit + 1]
+            ).fetchall()
+        submissions = [_row_to_submission(row) for row in rows[:limit]]
+        return {
+            'submissions': submissions,
+            'next_cursor': submissions[-1]['seq'] if len(rows) > limit else None
+        }
+
+    def stats(self):
+        """
+        Writer statistics for this process and the size of the log
+
+        Returns:
+            dict: Counters, queue depth and stored submissions
+        """
+        with self._lock:
+            conn = self._connection()
+            total = conn.execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
+            stats = dict(self._stats)
+            stats['queued'] = self._queue.qsize()
+        stats['average_batch'] = round(stats['committed'] / stats['batches'], 1) if stats['batches'] else 0.0
+        stats['stored'] = total
+        return stats
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """
+    Return the shared submission store, opening it on first use
+
+    Returns:
+        SubmissionStore: The store, or None when SUBMISSION_STORE is set to an empty string
+    """
+    global _store
+    if not SUBMISSION_STORE_PATH:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SubmissionStore(SUBMISSION_STORE_PATH, SUBMISSION_BATCH_SIZE, SUBMISSION_QUEUE_SIZE)
+                # Queued submissions are committed when the process exits normally
+                atexit.register(_store.close)
+    return _store
@@ -0,0 +1,306 @@
+"""
+Concurrency-safe publishing of templates.
+
+A template is created in three steps:
+
+1. reserve(name) claims the name before anything is generated, by creating a
+   lock file with O_EXCL. A second request for the same name (in any worker
+   process) fails immediately with TemplateBusyError, or TemplateExistsError
+   if the template is already published, before any tokens are spent.
+2. The files are written to a private staging directory outside templates/.
+3. publish() renames the staging directory to templates/<name> in one step,
+   so readers see either no template or the complete one.
+
+Existing templates are updated under the same per-name lock. The complete
+new folder (the unchanged files copied, the changed ones written) is staged,
+and exchanged with templates/<name> in one renameat2(RENAME_EXCHANGE) call,
+so templates/<name> always exists and holds either the old or the new
+version. Readers never see the new specs.json with the old index.html or a
+half-written file, and never wait for a lock. The replaced folder is kept in
+the staging directory for TEMPLATE_RETIRED_SECONDS, so a reader that opened
+it just before the exchange can finish reading it, and removed by a later
+publish. Where renameat2 is not available (not Linux, or a filesystem without
+RENAME_EXCHANGE) the changed files are replaced one by one instead: each file
+is still old or new, but not all of them change at the same instant.
+
+Reservations left behind by a crashed process expire after
+TEMPLATE_RESERVATION_SECONDS.
+"""
+
+import ctypes
+import errno
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+TEMPLATES_DIR = os.path.join(ROOT, 'templates')
+# Must be on the same filesystem as TEMPLATES_DIR for the rename to be atomic
+STAGING_DIR = os.getenv('TEMPLATE_STAGING_DIR', os.path.join(ROOT, '.template_staging'))
+# Longer than any generation, so only abandoned reservations expire
+TEMPLATE_RESERVATION_SECONDS = float(os.getenv('TEMPLATE_RESERVATION_SECONDS', '1800'))
+# How long a replaced template folder is kept for readers that still have it open
+TEMPLATE_RETIRED_SECONDS = float(os.getenv('TEMPLATE_RETIRED_SECONDS', '60'))
+
+_AT_FDCWD = -100
+_RENAME_EXCHANGE = 2
+
+
+class TemplateExistsError(Exception):
+    """Raised when reserving the name of a template that is already published"""
+
+
+class TemplateBusyError(Exception):
+    """Raised when another request is creating or updating the template"""
+
+
+class TemplateNotFoundError(Exception):
+    """Raised when locking a template for update that does not exist"""
+
+
+def template_dir(name):
+    """Directory of a published template"""
+    return os.path.join(TEMPLATES_DIR, name)
+
+
+def _lock_path(name):
+    return os.path.join(STAGING_DIR, f"{name}.lock")
+
+
+def _acquire_lock(name):
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    path = _lock_path(name)
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                age = time.time() - os.path.getmtime(path)
+            except FileNotFoundError:
+                continue
+            if age < TEMPLATE_RESERVATION_SECONDS:
+                raise TemplateBusyError(f"Template '{name}' is being created or updated by another request")
+            # Abandoned: move it aside (only one process can win the rename) and retry
+            stale_path = f"{path}.{uuid.uuid4().hex}.stale"
+            try:
+                os.rename(path, stale_path)
+            except FileNotFoundError:
+                continue
+            # Another process may have taken the stale lock over and created a
+            # fresh one between the age check and the rename; if so, put it back
+            try:
+                fresh = time.time() - os.path.getmtime(stale_path) < TEMPLATE_RESERVATION_SECONDS
+            except FileNotFoundError:
+                continue
+            if fresh:
+                try:
+                    os.link(stale_path, path)
+                except FileExistsError:
+                    pass
+                os.remove(stale_path)
+                raise TemplateBusyError(f"Template '{name}' is being created or updated by another request")
+            os.remove(stale_path)
+            continue
+        with os.fdopen(fd, 'w') as f:
+            f.write(f"{os.getpid()} {time.time()}\n")
+        return path
+    raise TemplateBusyError(f"Template '{name}' is being created or updated by another request")
+
+
+def write_file_atomic(path, content):
+    """
+    Replace a file's content in one step; readers see the old or the new file
+
+    Args:
+        path (str): File to write
+        content (str or bytes): New content; text is written as UTF-8
+    """
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if isinstance(content, str):
+                content = content.encode('utf-8')
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class Reservation:
+    """
+    Exclusive claim on a template name, released when the `with` block ends.
+
+    Args:
+        name (str): Template name
+        existing (bool): True to update a published template, False to create a new one
+    """
+
+    def __init__(self, name, existing):
+        self.name = name
+        self.existing = existing
+        self.published = False
+        self._lock = None
+
+    def acquire(self):
+        if not self.existing and os.path.exists(template_dir(self.name)):
+            raise TemplateExistsError(f"Template '{self.name}' already exists")
+        self._lock = _acquire_lock(self.name)
+        # Re-check under the lock: the template may have been published meanwhile
+        published = os.path.exists(template_dir(self.name))
+        if published != self.existing:
+            self.release()
+            if published:
+                raise TemplateExistsError(f"Template '{self.name}' already exists")
+            raise TemplateNotFoundError(f"Template '{self.name}' does not exist")
+        return self
+
+    def release(self):
+        if self._lock is not None:
+            try:
+                os.remove(self._lock)
+            except FileNotFoundError:
+                pass
+            self._lock = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+        return False
+
+    def publish(self, files):
+        """
+        Publish the template's files
+
+        Args:
+            files (dict): Maps file name (e.g. 'index.html') to its content;
+                when updating, files not listed are kept as they are
+        """
+        if self._lock is None:
+            raise RuntimeError(f"Reservation for '{self.name}' is not held")
+        staging = os.path.join(STAGING_DIR, f"{self.name}.{uuid.uuid4().hex}")
+        try:
+            if self.existing:
+                shutil.copytree(template_dir(self.name), staging)
+            else:
+                os.makedirs(staging)
+            for file_name, content in files.items():
+                with open(os.path.join(staging, file_name), 'wb') as f:
+                    f.write(content.encode('utf-8') if isinstance(content, str) else content)
+                    f.flush()
+                    os.fsync(f.fileno())
+            if self.existing:
+                _exchange_in(staging, template_dir(self.name), files)
+            else:
+                os.rename(staging, template_dir(self.name))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        self.published = True
+        _remove_retired()
+
+
+def _renameat2():
+    """The C library's renameat2, or None where it is not available"""
+    try:
+        function = ctypes.CDLL(None, use_errno=True).renameat2
+    except (AttributeError, OSError):
+        return None
+    function.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    function.restype = ctypes.c_int
+    return function
+
+
+_renameat2_function = _renameat2()
+
+
+def _exchange(first, second):
+    """
+    Swap two paths in one step
+
+    Returns:
+        bool: False if the platform or filesystem cannot exchange paths
+    """
+    if _renameat2_function is None:
+        return False
+    result = _renameat2_function(_AT_FDCWD, os.fsencode(first), _AT_FDCWD, os.fsencode(second), _RENAME_EXCHANGE)
+    if result == 0:
+        return True
+    error = ctypes.get_errno()
+    if error in (errno.EINVAL, errno.ENOSYS, errno.ENOTSUP):
+        return False
+    raise OSError(error, os.strerror(error), first)
+
+
+def _exchange_in(staging, target, files):
+    """Replace the directory target with staging without target ever going missing"""
+    if not _exchange(staging, target):
+        print(f"⚠️ Folder exchange not supported, replacing the files of {target} one by one")
+        for file_name in files:
+            os.replace(os.path.join(staging, file_name), os.path.join(target, file_name))
+        shutil.rmtree(staging, ignore_errors=True)
+        return
+    # staging now holds the previous version; readers may still have it open
+    retired = f"{staging}.retired"
+    os.rename(staging, retired)
+    os.utime(retired)
+
+
+def _remove_retired():
+    """Delete replaced template folders once no reader can still be using them"""
+    try:
+        names = os.listdir(STAGING_DIR)
+    except FileNotFoundError:
+        return
+    now = time.time()
+    for name in names:
+        if not name.endswith('.retired'):
+            continue
+        path = os.path.join(STAGING_DIR, name)
+        try:
+            if now - os.path.getmtime(path) >= TEMPLATE_RETIRED_SECONDS:
+                shutil.rmtree(path, ignore_errors=True)
+        except FileNotFoundError:
+            pass
+
+
+def reserve(name):
+    """
+    Claim the name of a new template before generating it
+
+    Args:
+        name (str): Template name
+
+    Returns:
+        Reservation: Use as a context manager and call publish() with the files
+
+    Raises:
+        TemplateExistsError: The template is already published
+        TemplateBusyError: Another request holds the name
+    """
+    return Reservation(name, existing=False).acquire()
+
+
+def lock_existing(name):
+    """
+    Claim a published template for an update
+
+    Args:
+        name (str): Template name
+
+    Returns:
+        Reservation: Use as a context manager and call publish() with the changed files
+
+    Raises:
+        TemplateNotFoundError: The template does not exist
+        TemplateBusyError: Another request is updating the template
+    """
+    return Reservation(name, existing=True).acquire()
@@ -0,0 +1,414 @@
+"""
+Helpers for incremental template updates.
+
+An existing template is updated by diffing the new custom field list against
+the template's specs.json, then splicing freshly generated table rows into
+the existing index.html. Only rows whose field definition was added, changed
+or removed are touched; everything else in the page is left byte-for-byte
+identical.
+
+Each specs.json entry may carry a "mo_ta" key holding the field definition
+line it was generated from. That line is what the diff is keyed on. Entries
+without "mo_ta" (older templates) are never modified.
+"""
+
+import re
+import textwrap
+import unicodedata
+from html.parser import HTMLParser
+
+FIELD_NAME_PATTERN = re.compile(r'^\s*([A-Za-z_][A-Za-z0-9_]*)\s*:')
+# Stands in for the field rows of a page shell (see make_shell)
+FIELD_ROWS_MARKER = '<!-- field rows -->'
+
+
+def parse_field_lines(field_definitions):
+    """
+    Split a block of field definitions into one definition per line
+
+    Args:
+        field_definitions (str): Field definitions, one field per line
+
+    Returns:
+        list: Non-empty, stripped definition lines
+    """
+    return [line.strip() for line in field_definitions.splitlines() if line.strip()]
+
+
+def normalize_field_line(line):
+    """
+    Normalise a field definition line for comparison
+
+    Args:
+        line (str): A field definition line
+
+    Returns:
+        str: Lower-cased, NFC-normalised line with collapsed whitespace
+    """
+    line = unicodedata.normalize('NFC', line).lower()
+    return re.sub(r'\s+', ' ', line).strip()
+
+
+def field_key(line):
+    """
+    Identify which field a definition line describes.
+
+    Lines written as "field_name: description" are keyed by the field name, so
+    editing the description is detected as a change of that field. Free-text
+    lines are keyed by their normalised text.
+
+    Args:
+        line (str): A field definition line
+
+    Returns:
+        str: Key used to match the line across versions
+    """
+    match = FIELD_NAME_PATTERN.match(line)
+    if match:
+        return f"name:{match.group(1).lower()}"
+    return f"text:{normalize_field_line(line)}"
+
+
+def diff_fields(new_lines, specs, default_lines=None):
+    """
+    Diff a new list of custom field lines against an existing specs.json
+
+    Args:
+        new_lines (list): New custom field definition lines
+        specs (list): Existing specs.json entries
+        default_lines (list, optional): Default field lines; their entries are never removed
+
+    Returns:
+        dict: 'added' (list of lines), 'changed' (list of (line, [ten_field])),
+              'removed' (list of ten_field) and 'unchanged' (list of ten_field)
+    """
+    protected_keys = {field_key(line) for line in (default_lines or [])}
+
+    # Group existing spec entries by the definition line they came from
+    existing = {}
+    for entry in specs:
+        source = entry.get('mo_ta')
+        if not source:
+            continue
+        group = existing.setdefault(field_key(source), {'line': source, 'fields': []})
+        group['fields'].append(entry['ten_field'])
+
+    added = []
+    changed = []
+    unchanged = []
+    seen_keys = set()
+    for line in new_lines:
+        key = field_key(line)
+        seen_keys.add(key)
+        group = existing.get(key)
+        if group is None:
+            added.append(line)
+        elif normalize_field_line(group['line']) != normalize_field_line(line):
+            changed.append((line, group['fields']))
+        else:
+            unchanged.extend(group['fields'])
+
+    removed = []
+    for key, group in existing.items():
+        if key in seen_keys or key in protected_keys:
+            continue
+        removed.extend(group['fields'])
+
+    return {
+        'added': added,
+        'changed': changed,
+        'removed': removed,
+        'unchanged': unchanged
+    }
+
+
+def attribute_specs(specs, field_lines, prompt_lines=None):
+    """
+    Point each spec entry's "mo_ta" at the field definition line it came from.
+
+    The model echoes the definition it was given (in data-mo-ta), which may be
+    the option-resolved prompt version of a line or slightly reformatted, so
+    entries are matched by field_key() and rewritten to the original line.
+    When nothing matches and there is one entry per line, entries are matched
+    by position. Entries that still cannot be matched are left as they are.
+
+    Args:
+        specs (list): specs.json entries, modified in place
+        field_lines (list): Original field definition lines
+        prompt_lines (list, optional): The same lines as shown in the prompt
+
+    Returns:
+        list: The updated entries
+    """
+    lines_by_key = {}
+    for line, prompt_line in zip(field_lines, prompt_lines or field_lines):
+        lines_by_key[field_key(prompt_line)] = line
+        lines_by_key[field_key(line)] = line
+
+    for index, entry in enumerate(specs):
+        source = lines_by_key.get(field_key(entry.get('mo_ta') or ''))
+        if source is None and len(specs) == len(field_lines):
+            source = field_lines[index]
+        if source is not None:
+            entry['mo_ta'] = source
+    return specs
+
+
+class _RowLocator(HTMLParser):
+    """Record the source span of every <tr> and the input names inside it"""
+
+    def __init__(self, html):
+        super().__init__(convert_charrefs=True)
+        self.html = html
+        self.line_offsets = [0]
+        for line in html.splitlines(keepends=True):
+            self.line_offsets.append(self.line_offsets[-1] + len(line))
+        self.open_rows = []
+        self.rows = []
+
+    def _offset(self):
+        line, col = self.getpos()
+        return self.line_offsets[line - 1] + col
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'tr':
+            self.open_rows.append({'start': self._offset(), 'names': []})
+        elif tag in ('input', 'select', 'textarea') and self.open_rows:
+            name = dict(attrs).get('name')
+            if name and name not in self.open_rows[-1]['names']:
+                self.open_rows[-1]['names'].append(name)
+
+    def handle_endtag(self, tag):
+        if tag == 'tr' and self.open_rows:
+            row = self.open_rows.pop()
+            start = self._offset()
+            row['end'] = self.html.index('>', start) + 1
+            self.rows.append(row)
+
+
+def find_field_rows(html):
+    """
+    Locate the table row that holds each named form control
+
+    Args:
+        html (str): HTML document or fragment
+
+    Returns:
+        dict: Maps input name to the (start, end) span of its enclosing <tr>
+    """
+    locator = _RowLocator(html)
+    locator.feed(html)
+    locator.close()
+
+    spans = {}
+    for row in locator.rows:
+        for name in row['names']:
+            spans.setdefault(name, (row['start'], row['end']))
+    return spans
+
+
+def find_example_row(html):
+    """
+    Return the first table row that contains a form control, used as a style
+    reference when generating new rows
+
+    Args:
+        html (str): HTML document
+
+    Returns:
+        str: The row's markup, or an empty string if none was found
+    """
+    spans = find_field_rows(html)
+    if not spans:
+        return ""
+    start, end = min(spans.values())
+    return html[start:end]
+
+
+def extract_css_classes(html):
+    """
+    Collect the CSS class names used in a document
+
+    Args:
+        html (str): HTML document
+
+    Returns:
+        list: Sorted, de-duplicated class names
+    """
+    classes = set()
+    for value in re.findall(r'class\s*=\s*["\']([^"\']*)["\']', html):
+        classes.update(value.split())
+    return sorted(classes)
+
+
+def extract_row(html, span):
+    """
+    Cut a row out of a document with its indentation normalised
+
+    Args:
+        html (str): HTML document or fragment
+        span (tuple): (start, end) span as returned by find_field_rows
+
+    Returns:
+        str: The dedented row markup
+    """
+    start, end = span
+    return textwrap.dedent(_line_indent(html, start) + html[start:end])
+
+
+def rows_by_line(html, specs):
+    """
+    Cut a page into the rows generated for each field definition line
+
+    Args:
+        html (str): HTML document or fragment
+        specs (list): specs.json entries for the page, with "mo_ta"
+
+    Returns:
+        dict: Maps each line to {'markup': its dedented rows, 'specs': its entries}.
+              Lines whose rows also hold another line's inputs are left out.
+    """
+    spans = find_field_rows(html)
+    groups = {}
+    span_lines = {}
+    for entry in specs:
+        line = entry.get('mo_ta')
+        span = spans.get(entry['ten_field'])
+        if not line or span is None:
+            continue
+        group = groups.setdefault(line, {'spans': set(), 'specs': []})
+        group['spans'].add(span)
+        group['specs'].append(entry)
+        span_lines.setdefault(span, set()).add(line)
+
+    rows = {}
+    for line, group in groups.items():
+        if any(len(span_lines[span]) > 1 for span in group['spans']):
+            continue
+        rows[line] = {
+            'markup': "\n".join(extract_row(html, span) for span in sorted(group['spans'])),
+            'specs': group['specs']
+        }
+    return rows
+
+
+def rename_field(markup, old_name, new_name):
+    """
+    Rename a form control in row markup: its name, and any id or label "for"
+    equal to the old name
+
+    Args:
+        markup (str): Row markup
+        old_name (str): Current input name
+        new_name (str): New input name
+
+    Returns:
+        str: The updated markup
+    """
+    pattern = re.compile(r'(\b(?:name|id|for)\s*=\s*["\'])' + re.escape(old_name) + r'(["\'])')
+    return pattern.sub(lambda match: match.group(1) + new_name + match.group(2), markup)
+
+
+def splice_rows(html, removed=None, replaced=None, added=None):
+    """
+    Apply row-level edits to an HTML document without touching anything else
+
+    Args:
+        html (str): Existing HTML document
+        removed (list, optional): Input names whose rows should be deleted
+        replaced (list, optional): (input names, new rows markup) pairs; the first
+            existing row of the group is replaced and the others are deleted
+        added (list, optional): Row markup to append after the last field row
+
+    Returns:
+        str: The edited HTML document
+    """
+    spans = find_field_rows(html)
+    edits = {}
+
+    for name in removed or []:
+        if name in spans:
+            edits[spans[name]] = ""
+
+    for names, markup in replaced or []:
+        group_spans = sorted({spans[name] for name in names if name in spans})
+        if not group_spans:
+            added = list(added or []) + [markup]
+            continue
+        indent = _line_indent(html, group_spans[0][0])
+        edits[group_spans[0]] = _reindent(markup, indent)
+        for span in group_spans[1:]:
+            edits[span] = ""
+
+    if added:
+        # Insert new rows right after the last existing field row, or before
+        # the closing </table> if the form has no rows yet
+        if spans:
+            insert_at = max(end for _, end in spans.values())
+        else:
+            insert_at = html.find('</table>')
+            if insert_at == -1:
+                insert_at = len(html)
+        indent = _line_indent(html, min(spans.values())[0]) if spans else ""
+        new_rows = "".join(f"\n{indent}{_reindent(markup, indent)}" for markup in added)
+        edits[(insert_at, insert_at)] = new_rows
+
+    # Apply edits back to front so earlier offsets stay valid
+    for (start, end) in sorted(edits, reverse=True):
+        markup = edits[(start, end)]
+        if not markup and start != end:
+            # Drop the whole line the removed row sat on, including indentation
+            line_start = html.rfind('\n', 0, start)
+            if html[line_start + 1:start].strip() == "":
+                start = line_start if line_start != -1 else 0
+        html = html[:start] + markup + html[end:]
+
+    return html
+
+
+def make_shell(html):
+    """
+    Turn a page into a shell for assembling forms: every field row is removed
+    and the first one is replaced by FIELD_ROWS_MARKER
+
+    Args:
+        html (str): HTML document with field rows
+
+    Returns:
+        str: The shell, or None if the page has no field rows
+    """
+    spans = find_field_rows(html)
+    if not spans:
+        return None
+    first = min(spans.values())
+    first_names = [name for name, span in spans.items() if span == first]
+    other_names = [name for name, span in spans.items() if span != first]
+    return splice_rows(html, removed=other_names, replaced=[(first_names, FIELD_ROWS_MARKER)])
+
+
+def fill_shell(shell, rows):
+    """
+    Put field rows into a shell made by make_shell()
+
+    Args:
+        shell (str): Page shell
+        rows (list): Row markup, in form order
+
+    Returns:
+        str: The assembled HTML document
+    """
+    marker_at = shell.index(FIELD_ROWS_MARKER)
+    indent = _line_indent(shell, marker_at)
+    markup = f"\n{indent}".join(_reindent(row, indent) for row in rows)
+    return shell[:marker_at] + markup + shell[marker_at + len(FIELD_ROWS_MARKER):]
+
+
+def _line_indent(html, offset):
+    line_start = html.rfind('\n', 0, offset) + 1
+    prefix = html[line_start:offset]
+    return prefix if prefix.strip() == "" else ""
+
+
+def _reindent(markup, indent):
+    lines = textwrap.dedent(markup).strip().splitlines()
+    return lines[0] + "".join(f"\n{indent}{line}" if line.strip() else "\n" for line in lines[1:])
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Test script for admission control of the LLM-backed endpoints.
+Checks that waiting requests are admitted in FIFO order, that per-client
+limits, full queues and queue timeouts are rejected, that limits are split
+across workers, and that /create and /api/mock answer 429 with Retry-After.
+"""
+
+import threading
+import time
+
+import mocking_be
+import server
+from admission import AdmissionController, AdmissionRejected
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting"
+        time.sleep(0.005)
+
+def rejection_reason(controller, client_id):
+    try:
+        controller.acquire(client_id)
+    except AdmissionRejected as rejection:
+        assert rejection.retry_after >= 1
+        return rejection.reason
+    controller.release(client_id)
+    return None
+
+def test_fifo_queue():
+    """Test that queued requests are admitted in arrival order"""
+    print("Testing FIFO admission...")
+    controller = AdmissionController('test', max_concurrent=1, max_per_client=10, max_queue=10, max_queue_time=5)
+    controller.acquire('holder')
+    order = []
+
+    def request(name):
+        with controller.slot(name):
+            order.append(name)
+
+    threads = []
+    for index, name in enumerate(['first', 'second', 'third', 'fourth']):
+        thread = threading.Thread(target=request, args=(name,))
+        thread.start()
+        threads.append(thread)
+        # Queue them one at a time so the arrival order is known
+        wait_until(lambda: controller.stats()['queued'] == index + 1)
+    assert order == []
+
+    controller.release('holder')
+    for thread in threads:
+        thread.join()
+    assert order == ['first', 'second', 'third', 'fourth'], order
+    stats = controller.stats()
+    assert stats['in_flight'] == 0 and stats['queued'] == 0 and stats['clients'] == 0
+    assert stats['admitted_total'] == 5
+    print("✅ Waiting requests admitted first come, first served")
+
+def test_client_limit_and_queue_full():
+    """Test that one client cannot take every slot and the queue is bounded"""
+    print("Testing per-client limit and queue size...")
+    controller = AdmissionController('test', max_concurrent=3, max_per_client=2, max_queue=1, max_queue_time=5)
+    controller.acquire('greedy')
+    controller.acquire('greedy')
+    assert rejection_reason(controller, 'greedy') == 'client_limit'
+    # Other clients are still admitted
+    controller.acquire('other')
+
+    # All slots taken: one request may wait, the next is turned away
+    waiter = threading.Thread(target=lambda: (controller.acquire('patient'), controller.release('patient')))
+    waiter.start()
+    wait_until(lambda: controller.stats()['queued'] == 1)
+    assert rejection_reason(controller, 'late') == 'queue_full'
+
+    controller.release('other')
+    waiter.join()
+    controller.release('greedy')
+    controller.release('greedy')
+    stats = controller.stats()
+    assert stats['rejected_total'] == {'client_limit': 1, 'queue_full': 1}, stats
+    assert stats['in_flight'] == 0 and stats['clients'] == 0
+    print("✅ Client limit and queue size enforced")
+
+def test_queue_timeout():
+    """Test that a request waiting longer than max_queue_time is rejected"""
+    print("Testing queue timeout...")
+    controller = AdmissionController('test', max_concurrent=1, max_per_client=4, max_queue=4, max_queue_time=0.1)
+    controller.acquire('holder')
+    started = time.monotonic()
+    assert rejection_reason(controller, 'waiting') == 'queue_timeout'
+    assert 0.1 <= time.monotonic() - started < 1.0
+    # The timed-out request left the queue and freed its client count
+    stats = controller.stats()
+    assert stats['queued'] == 0 and stats['clients'] == 1
+    controller.release('holder')
+    assert rejection_reason(controller, 'waiting') is None
+    print("✅ Requests that wait too long are rejected")
+
+def test_limits_split_across_workers():
+    """Test that each worker process enforces its share of the limits"""
+    print("Testing per-worker limits...")
+    controller = AdmissionController('test', max_concurrent=8, max_per_client=4, max_queue=32,
+                                     max_queue_time=1, workers=4)
+    stats = controller.stats()
+    assert (stats['workers'], stats['max_concurrent'], stats['max_per_client'], stats['max_queue']) == (4, 2, 1, 8)
+    controller.acquire('client')
+    assert rejection_reason(controller, 'client') == 'client_limit'
+    controller.release('client')
+
+    # Never below one of each, however many workers
+    stats = AdmissionController('test', 2, 1, 4, 1, workers=16).stats()
+    assert (stats['max_concurrent'], stats['max_per_client'], stats['max_queue']) == (1, 1, 1)
+    print("✅ Limits divided between workers")
+
+def fill_client_limit(controller, client_id='127.0.0.1'):
+    for _ in range(controller.max_per_client):
+        controller.acquire(client_id)
+
+def empty_client_limit(controller, client_id='127.0.0.1'):
+    for _ in range(controller.max_per_client):
+        controller.release(client_id)
+
+def test_create_rejected_with_retry_after():
+    """Test that /create answers 429 with Retry-After when generation is at capacity"""
+    print("Testing /create admission...")
+    fill_client_limit(server.generation_admission)
+    try:
+        response = server.app.test_client().post('/create', data={'template_name': 'busy_form', 'custom_fields': 'a: text'})
+    finally:
+        empty_client_limit(server.generation_admission)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert 'Server is busy' in response.get_data(as_text=True)
+    assert server.generation_admission.stats()['in_flight'] == 0
+    print("✅ /create rejected with 429 and Retry-After")
+
+def test_mock_rejected_with_retry_after():
+    """Test that /api/mock answers 429 with Retry-After and admits again once free"""
+    print("Testing /api/mock admission...")
+    client = mocking_be.app.test_client()
+    fill_client_limit(mocking_be.mock_admission)
+    try:
+        response = client.get('/api/mock/test1')
+    finally:
+        empty_client_limit(mocking_be.mock_admission)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.get_json()['error'] == 'Too many requests'
+
+    original = mocking_be.generate_mock_data_with_llm
+    mocking_be.generate_mock_data_with_llm = lambda field_specs: {field['ten_field']: 'x' for field in field_specs}
+    try:
+        assert client.get('/api/mock/test1').status_code == 200
+    finally:
+        mocking_be.generate_mock_data_with_llm = original
+    assert mocking_be.mock_admission.stats()['in_flight'] == 0
+    print("✅ /api/mock rejected with 429 and Retry-After, then admitted")
+
+if __name__ == "__main__":
+    test_fifo_queue()
+    test_client_limit_and_queue_full()
+    test_queue_timeout()
+    test_limits_split_across_workers()
+    test_create_rejected_with_retry_after()
+    test_mock_rejected_with_retry_after()
+    print("\n🎉 All admission tests passed!")
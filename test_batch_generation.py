@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Test script for batch generation.
+Checks the three ways of listing forms, that a re-run skips forms whose
+definition file is unchanged and regenerates changed or failed ones, and that
+batches into templates/ are published through template_store, with a stand-in
+for the generator.
+"""
+
+import json
+import os
+import tempfile
+
+import generate_table
+import template_store
+from test_template_store import use_dirs
+
+class StandInGenerator:
+    """Replaces generate_html_from_custom_fields; fails for definitions containing FAIL"""
+    def __init__(self):
+        self.generated = []
+
+    def __call__(self, custom_fields, template_name=None):
+        self.generated.append(template_name)
+        if 'FAIL' in custom_fields:
+            return None
+        return {'html': f"<form>{custom_fields}</form>", 'specs': '[]'}
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+def read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def run_batch(source, output_dir):
+    generator = StandInGenerator()
+    original = generate_table.generate_html_from_custom_fields
+    generate_table.generate_html_from_custom_fields = generator
+    try:
+        results = generate_table.generate_batch(source, output_dir, workers=2)
+    finally:
+        generate_table.generate_html_from_custom_fields = original
+    return results, sorted(generator.generated)
+
+def test_load_batch_items():
+    """Test a directory, a JSON manifest and a text manifest"""
+    print("Testing batch sources...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        forms = os.path.join(tmp_dir, 'forms')
+        write(os.path.join(forms, 'b_form.txt'), 'b: text')
+        write(os.path.join(forms, 'a_form.txt'), 'a: text')
+        write(os.path.join(forms, 'notes.md'), 'not a form')
+        assert generate_table.load_batch_items(forms) == [
+            {'name': 'a_form', 'path': os.path.join(forms, 'a_form.txt')},
+            {'name': 'b_form', 'path': os.path.join(forms, 'b_form.txt')}
+        ]
+
+        # Relative manifest paths are resolved against the manifest's directory
+        manifest = os.path.join(tmp_dir, 'batch.json')
+        write(manifest, json.dumps(['forms/a_form.txt', {'name': 'renamed', 'path': os.path.join(forms, 'b_form.txt')}]))
+        assert generate_table.load_batch_items(manifest) == [
+            {'name': 'a_form', 'path': os.path.join(tmp_dir, 'forms/a_form.txt')},
+            {'name': 'renamed', 'path': os.path.join(forms, 'b_form.txt')}
+        ]
+
+        listing = os.path.join(tmp_dir, 'batch.txt')
+        write(listing, "# forms to build\nforms/b_form.txt\n\n  forms/a_form.txt  \n")
+        assert [item['name'] for item in generate_table.load_batch_items(listing)] == ['b_form', 'a_form']
+    print("✅ Directories, JSON and text manifests listed")
+
+def test_resume_and_retry():
+    """Test skipping unchanged forms and regenerating changed and failed ones"""
+    print("Testing batch resume...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        forms = os.path.join(tmp_dir, 'forms')
+        output_dir = os.path.join(tmp_dir, 'generated')
+        write(os.path.join(forms, 'contact.txt'), 'email: text')
+        write(os.path.join(forms, 'survey.txt'), 'rating: 1-5')
+        write(os.path.join(forms, 'broken.txt'), 'FAIL: text')
+
+        results, generated = run_batch(forms, output_dir)
+        assert generated == ['broken', 'contact', 'survey']
+        assert {name: result['status'] for name, result in results.items()} == \
+            {'broken': 'failed', 'contact': 'done', 'survey': 'done'}
+        assert read(os.path.join(output_dir, 'contact', 'index.html')) == '<form>email: text</form>'
+        assert not os.path.exists(os.path.join(output_dir, 'broken'))
+        checkpoint = json.loads(read(os.path.join(output_dir, '.batch_checkpoint.json')))
+        assert checkpoint['broken']['status'] == 'failed'
+
+        # Unchanged and finished forms are skipped; the failed one is retried
+        _, generated = run_batch(forms, output_dir)
+        assert generated == ['broken']
+
+        # A changed definition file is generated again, and a fixed one succeeds
+        write(os.path.join(forms, 'survey.txt'), 'rating: 1-10')
+        write(os.path.join(forms, 'broken.txt'), 'fixed: text')
+        results, generated = run_batch(forms, output_dir)
+        assert generated == ['broken', 'survey']
+        assert all(result['status'] == 'done' for result in results.values())
+        assert read(os.path.join(output_dir, 'survey', 'index.html')) == '<form>rating: 1-10</form>'
+
+        _, generated = run_batch(forms, output_dir)
+        assert generated == []
+    print("✅ Re-runs skip finished forms, redo changed and failed ones")
+
+def test_publish_to_templates():
+    """Test that a batch into templates/ publishes through template_store"""
+    print("Testing batch publishing...")
+    templates_dir = template_store.TEMPLATES_DIR
+    staging_dir = template_store.STAGING_DIR
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        use_dirs(tmp_dir)
+        try:
+            forms = os.path.join(tmp_dir, 'forms')
+            write(os.path.join(forms, 'contact.txt'), 'email: text')
+            write(os.path.join(forms, 'survey.txt'), 'rating: 1-5')
+
+            # A template another request holds is not generated or touched
+            with template_store.reserve('survey'):
+                results, generated = run_batch(forms, template_store.TEMPLATES_DIR)
+            assert generated == ['contact'] and results['survey']['status'] == 'failed'
+            contact = template_store.template_dir('contact')
+            assert sorted(os.listdir(contact)) == ['custom_fields.txt', 'index.html', 'specs.json']
+            assert not os.path.exists(template_store.template_dir('survey'))
+
+            # The next run creates the held one and updates a changed published one
+            write(os.path.join(contact, 'notes.txt'), 'kept')
+            write(os.path.join(forms, 'contact.txt'), 'email: text\nphone: text')
+            results, generated = run_batch(forms, template_store.TEMPLATES_DIR)
+            assert generated == ['contact', 'survey']
+            assert all(result['status'] == 'done' for result in results.values())
+            assert read(os.path.join(contact, 'index.html')) == '<form>email: text\nphone: text</form>'
+            assert read(os.path.join(contact, 'notes.txt')) == 'kept'
+            assert [name for name in os.listdir(template_store.STAGING_DIR)
+                    if not name.endswith('.retired')] == []
+        finally:
+            template_store.TEMPLATES_DIR = templates_dir
+            template_store.STAGING_DIR = staging_dir
+    print("✅ Batches into templates/ published under the template lock")
+
+if __name__ == "__main__":
+    test_load_batch_items()
+    test_resume_and_retry()
+    test_publish_to_templates()
+    print("\n🎉 All batch generation tests passed!")
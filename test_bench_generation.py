@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test script for the generation benchmark.
+Checks that the local LLM stand-in drives the pipeline to a form that passes
+the structural checks, and that the baseline comparison reports regressions.
+"""
+
+import copy
+import json
+
+import bench_generation
+
+def load_corpus():
+    with open(bench_generation.CORPUS_PATH, 'r', encoding='utf-8') as f:
+        corpus = json.load(f)
+    with open('default_field.txt', 'r') as f:
+        return corpus, f.read().strip()
+
+def test_run_input():
+    """Test a small and a chunked input against the stand-in"""
+    print("Testing benchmark runs...")
+    corpus, default_fields = load_corpus()
+    inputs = {item['name']: item for item in corpus['inputs']}
+    for name, llm_calls in (('contact_6', 2), ('audit_60', 6)):
+        result = bench_generation.run_input(inputs[name], default_fields, corpus['option_sets'], runs=1)
+        assert all(result['checks'].values()), result['problems']
+        assert sum(step['calls'] for step in result['llm'].values()) == llm_calls
+        assert result['tokens']['prompt'] > 0 and result['bytes']['script'] > 0
+        assert result['fallbacks'] == {'script': 0, 'contract': 0}
+    print("✅ Stand-in generations pass the structural checks")
+
+def test_compare():
+    """Test that growth beyond the tolerances and failing checks are regressions"""
+    print("Testing baseline comparison...")
+    baseline = {'form': {
+        'seconds': {'total': 0.1, 'specs': 0.01},
+        'llm': {'html': {'calls': 1}, 'javascript': {'calls': 1}},
+        'tokens': {'prompt': 1000, 'completion': 500},
+        'bytes': {'html': 4000, 'specs': 800, 'script': 1500},
+        'fallbacks': {'script': 0, 'contract': 0},
+        'checks': {'form_gate': True}
+    }}
+    assert bench_generation.compare(copy.deepcopy(baseline), baseline) == []
+
+    current = copy.deepcopy(baseline)
+    current['form']['tokens']['prompt'] = 1001
+    current['form']['seconds']['specs'] = 0.02  # within noise
+    current['form']['seconds']['total'] = 0.2
+    current['form']['fallbacks']['script'] = 1
+    current['form']['checks']['form_gate'] = False
+    assert bench_generation.compare(current, baseline) == [
+        "form: check form_gate fails",
+        "form: prompt tokens 1000 -> 1001",
+        "form: script fallbacks 0 -> 1",
+        "form: total seconds 0.1 -> 0.2"
+    ]
+    assert len(bench_generation.compare(current, baseline, time_tolerance=None, token_tolerance=0.01)) == 2
+    print("✅ Regressions reported against the baseline")
+
+if __name__ == "__main__":
+    test_run_input()
+    test_compare()
+    print("\n🎉 All generation benchmark tests passed!")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Test script for JSON encoding and response compression.
+Checks that both JSON backends give the same documents and that mock API
+responses are compressed only when the client accepts it and it pays off.
+"""
+
+import gzip
+import json
+
+import json_backend
+import mocking_be
+
+PAYLOAD = {'template': 'test1', 'data': [{'full_name': 'Nguyễn Văn An', 'customer_rating': 3, 'agree': True}]}
+
+def test_json_backends_agree():
+    """Test that the fast backend and the stdlib fallback produce the same JSON"""
+    print("Testing JSON backends...")
+    fast = json_backend.dumps(PAYLOAD, sort_keys=True)
+    original = json_backend.orjson
+    json_backend.orjson = None
+    try:
+        fallback = json_backend.dumps(PAYLOAD, sort_keys=True)
+        assert json_backend.loads(fallback.encode('utf-8')) == PAYLOAD
+        try:
+            json_backend.loads('{"broken": ')
+            assert False, "invalid JSON should raise"
+        except json.JSONDecodeError:
+            pass
+    finally:
+        json_backend.orjson = original
+    assert fast == fallback and 'Nguyễn' in fast
+    assert json_backend.loads(fast) == PAYLOAD
+    print(f"✅ {json_backend.BACKEND} and stdlib agree, text is not escaped")
+
+def test_negotiated_compression():
+    """Test that large and streamed responses are compressed when accepted"""
+    print("Testing response compression...")
+    client = mocking_be.app.test_client()
+    url = '/api/mock/test1/stream?seed=3&limit=2000'
+
+    plain = client.get(url)
+    assert 'Content-Encoding' not in plain.headers and 'Accept-Encoding' in plain.headers['Vary']
+    compressed = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
+    assert len(compressed.get_data()) < len(plain.get_data()) / 3
+
+    # Small bodies are not worth compressing
+    small = client.get('/api/health', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers and small.get_json()['status'] == 'healthy'
+    print("✅ Compressed when accepted and large enough")
+
+if __name__ == "__main__":
+    test_json_backends_agree()
+    test_negotiated_compression()
+    print("\n🎉 All compression tests passed!")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Test script for the static export.
+Checks the exported pages, shared assets, precompressed variants and
+manifest, and that later exports only rebuild changed templates.
+"""
+
+import gzip
+import json
+import os
+import re
+import shutil
+import tempfile
+
+import export_static
+
+PAGE = """<!DOCTYPE html>
+<html lang="vi">
+<head>
+    <title>{title}</title>
+    <link rel="icon" href="/static/icon.svg">
+    <style>
+        body {{ font-family: Arial, sans-serif; color: {color}; }}
+    </style>
+</head>
+<body>
+    <!-- generated -->
+    <h1>{title}</h1>
+    <form><input type="text" name="full_name"></form>
+</body>
+</html>"""
+
+def write_template(templates_dir, name, title, color='#333'):
+    os.makedirs(os.path.join(templates_dir, name), exist_ok=True)
+    with open(os.path.join(templates_dir, name, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(PAGE.format(title=title, color=color))
+    with open(os.path.join(templates_dir, name, 'specs.json'), 'w', encoding='utf-8') as f:
+        json.dump([{'ten_field': 'full_name', 'kieu_du_lieu': 'text'}], f)
+
+def test_export():
+    """Test pages, shared hashed assets, precompression, manifest and index"""
+    print("Testing static export...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        templates_dir, out_dir, static_dir = (os.path.join(tmp_dir, d) for d in ('templates', 'out', 'static'))
+        write_template(templates_dir, 'form_a', 'Khảo sát A')
+        write_template(templates_dir, 'form_b', 'Khảo sát B')
+        os.makedirs(static_dir)
+        with open(os.path.join(static_dir, 'icon.svg'), 'w') as f:
+            f.write('<svg xmlns="http://www.w3.org/2000/svg"></svg>')
+
+        summary = export_static.export_site(templates_dir, out_dir, static_dir)
+        assert summary['built'] == ['form_a', 'form_b'] and not summary['failed']
+
+        with open(os.path.join(out_dir, 'forms', 'form_a', 'index.html'), encoding='utf-8') as f:
+            page = f.read()
+        assert '<!--' not in page and '<style' not in page
+        assert 'href="../../assets/icon-' in page and 'href="../../assets/form-' in page
+
+        # Both forms share one stylesheet
+        manifest = export_static.load_manifest(out_dir)
+        assert len(manifest['assets']) == 2
+        assert manifest['templates']['form_a']['assets'] == manifest['templates']['form_b']['assets']
+
+        with gzip.open(os.path.join(out_dir, 'forms', 'form_a', 'index.html.gz'), 'rt', encoding='utf-8') as f:
+            assert f.read() == page
+        entry = manifest['templates']['form_a']['files']['forms/form_a/index.html']
+        assert entry['bytes'] == len(page.encode('utf-8')) and 'gzip' in entry['encodings']
+
+        with open(os.path.join(out_dir, 'index.html'), encoding='utf-8') as f:
+            index = f.read()
+        assert '<a href="forms/form_b/">Khảo sát B</a>' in index
+    print("✅ Pages exported with shared hashed assets, .gz variants and a manifest")
+
+def test_incremental():
+    """Test that only changed templates are rebuilt and deleted ones removed"""
+    print("Testing incremental export...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        templates_dir, out_dir = os.path.join(tmp_dir, 'templates'), os.path.join(tmp_dir, 'out')
+        write_template(templates_dir, 'form_a', 'Khảo sát A')
+        write_template(templates_dir, 'form_b', 'Khảo sát B')
+        export_static.export_site(templates_dir, out_dir)
+
+        summary = export_static.export_site(templates_dir, out_dir)
+        assert summary['built'] == [] and summary['unchanged'] == ['form_a', 'form_b']
+        assert summary['files_written'] == 0
+
+        # A new style gets a new asset; the old one is still used by form_b
+        write_template(templates_dir, 'form_a', 'Khảo sát A', color='#c00')
+        summary = export_static.export_site(templates_dir, out_dir)
+        assert summary['built'] == ['form_a'] and summary['unchanged'] == ['form_b']
+        assert len(export_static.load_manifest(out_dir)['assets']) == 2
+
+        shutil.rmtree(os.path.join(templates_dir, 'form_b'))
+        summary = export_static.export_site(templates_dir, out_dir)
+        assert summary['removed'] == ['form_b']
+        assert not os.path.exists(os.path.join(out_dir, 'forms', 'form_b'))
+        manifest = export_static.load_manifest(out_dir)
+        assert list(manifest['templates']) == ['form_a'] and len(manifest['assets']) == 1
+        assert {name.replace('.gz', '') for name in os.listdir(os.path.join(out_dir, 'assets'))} == \
+            {os.path.basename(asset) for asset in manifest['assets']}
+
+        summary = export_static.export_site(templates_dir, out_dir, force=True)
+        assert summary['built'] == ['form_a'] and summary['files_written'] == 0
+    print("✅ Unchanged templates skipped, deleted templates and unused assets removed")
+
+def test_static_change_rebuilds():
+    """Test that a change to a referenced /static/ file rebuilds the forms using it"""
+    print("Testing static file changes...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        templates_dir, out_dir, static_dir = (os.path.join(tmp_dir, d) for d in ('templates', 'out', 'static'))
+        write_template(templates_dir, 'form_a', 'Khảo sát A')
+        os.makedirs(static_dir)
+        export_static.export_site(templates_dir, out_dir, static_dir)
+        assert export_static.export_site(templates_dir, out_dir, static_dir)['unchanged'] == ['form_a']
+
+        # The icon appears once it exists, and is replaced when its content changes
+        icons = []
+        for content in ('<svg id="a"></svg>', '<svg id="b"></svg>'):
+            with open(os.path.join(static_dir, 'icon.svg'), 'w') as f:
+                f.write(content)
+            assert export_static.export_site(templates_dir, out_dir, static_dir)['built'] == ['form_a']
+            with open(os.path.join(out_dir, 'forms', 'form_a', 'index.html'), encoding='utf-8') as f:
+                icons.append(re.search(r'assets/(icon-[0-9a-f]+\.svg)', f.read()).group(1))
+        assert icons[0] != icons[1]
+        assert os.path.exists(os.path.join(out_dir, 'assets', icons[1]))
+        assert not os.path.exists(os.path.join(out_dir, 'assets', icons[0]))
+    print("✅ Forms rebuilt when a static file they reference changes")
+
+if __name__ == "__main__":
+    test_export()
+    test_incremental()
+    test_static_change_rebuilds()
+    print("\n🎉 All static export tests passed!")
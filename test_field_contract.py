@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test script for the field contract of the concurrent pipeline.
+Checks that names, types and options are planned from definition lines and
+that pages are verified against the contract, without calling the LLM.
+"""
+
+import field_contract
+import template_update
+
+LINES = template_update.parse_field_lines("""full_name: text input for collecting customer's full name
+phone_number: phone input with validation for proper phone number format
+gender: select box with two options are F and M
+Số điện thoại: text
+Giới tính: select box với lựa chọn Nam, Nữ
+Mức độ hài lòng: rating 1-5""")
+
+def test_plan_contract():
+    """Test names, types and options planned from definition lines"""
+    print("Testing contract planning...")
+    contract = field_contract.plan_contract(LINES)
+    fields = [(field['name'], field['type'], field['options']) for field in contract['fields']]
+    assert fields == [
+        ('full_name', 'text', []),
+        ('phone_number', 'tel', []),
+        ('gender', 'select', ['F', 'M']),
+        ('so_dien_thoai', 'tel', []),
+        ('gioi_tinh', 'select', ['Nam', 'Nữ']),
+        ('muc_do_hai_long', 'rating', [])
+    ], fields
+    assert contract['required_ids'] == ['loadingSpinner', 'messageDiv']
+
+    # Repeated labels get distinct names
+    names = [field['name'] for field in field_contract.plan_contract(["Ghi chú: text", "Ghi chú: textarea"])['fields']]
+    assert names == ['ghi_chu', 'ghi_chu_2']
+
+    prompt = field_contract.format_for_prompt(contract)
+    assert '- name="gioi_tinh": <select> with option values exactly: Nam, Nữ' in prompt
+    print("✅ Contract planned from definition lines")
+
+def test_verify_html():
+    """Test that the contract page passes and deviations are reported"""
+    print("Testing contract verification...")
+    contract = field_contract.plan_contract(LINES)
+    page = field_contract.contract_html(contract)
+    assert field_contract.verify_html(page, contract) == []
+
+    renamed = page.replace('name="so_dien_thoai"', 'name="sdt"')
+    assert field_contract.verify_html(renamed, contract) == ["Missing field 'so_dien_thoai'"]
+
+    retyped = page.replace('<select id="gender" name="gender">', '<select id="gender" name="gender_old">')
+    retyped = retyped.replace('<input type="text" id="full_name"', '<input type="checkbox" id="full_name"')
+    assert field_contract.verify_html(retyped, contract) == [
+        "Field 'full_name' is a checkbox control, expected text",
+        "Missing field 'gender'"
+    ]
+
+    problems = field_contract.verify_html(page.replace('<option value="Nữ">Nữ</option>', '')
+                                          .replace('id="messageDiv"', 'id="messages"'), contract)
+    assert problems == ["Missing required element id 'messageDiv'", "Field 'gioi_tinh' lacks option(s) Nữ"]
+    print("✅ Pages checked against names, control types, options and element ids")
+
+if __name__ == "__main__":
+    test_plan_contract()
+    test_verify_html()
+    print("\n🎉 All field contract tests passed!")
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test script for the field row cache.
+Checks that pages are cut into a shell and rows and put back together, and that
+cached rows are found, counted and evicted, without calling the LLM.
+"""
+
+import os
+import tempfile
+
+import fragment_cache
+import template_update
+from test_template_update import PAGE, SPECS
+
+def test_shell_round_trip():
+    """Test that a shell filled with the page's own rows gives back the page"""
+    print("Testing page shells...")
+    shell = template_update.make_shell(PAGE)
+    assert template_update.find_field_rows(shell) == {}
+    assert '        <table>\n            <!-- field rows -->\n        </table>' in shell
+
+    spans = template_update.find_field_rows(PAGE)
+    rows = [template_update.extract_row(PAGE, spans[entry['ten_field']]) for entry in SPECS]
+    assert template_update.fill_shell(shell, rows) == PAGE
+
+    # Rows come out in the order given
+    reordered = template_update.fill_shell(shell, rows[::-1])
+    assert reordered.index('name="mother_name"') < reordered.index('name="full_name"')
+    print("✅ Shells round-trip and take rows in any order")
+
+def test_lookup_and_eviction():
+    """Test that the shell with most cached rows is found and old rows are evicted"""
+    print("Testing fragment cache...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = fragment_cache.FragmentCache(os.path.join(tmp_dir, 'fragments.db'), max_entries=3, max_shells=1)
+        keys = [fragment_cache.fragment_key(entry['mo_ta']) for entry in SPECS]
+        assert keys[0] == "text|full_name: text input for collecting customer's full name"
+
+        shell_id = cache.store_page("<table><!-- field rows --></table>", {
+            key: {'markup': f'<tr data-key="{key}"></tr>', 'specs': [entry]} for key, entry in zip(keys, SPECS)
+        })
+        found_id, shell, fragments = cache.best_shell(keys[:2] + ["text|số tài khoản"])
+        assert found_id == shell_id and set(fragments) == set(keys[:2])
+        assert fragments[keys[1]]['specs'] == [SPECS[1]]
+
+        # A fourth row evicts the least recently used one, which was not looked up
+        cache.store_fragments(shell_id, {"text|số tài khoản": {'markup': '<tr></tr>', 'specs': []}})
+        assert set(cache.best_shell(keys)[2]) == set(keys[:2])
+
+        # A new shell beyond max_shells evicts the old shell and its rows
+        cache.store_page("<div><!-- field rows --></div>", {})
+        assert cache.best_shell(keys) is None
+
+        stats = cache.stats()
+        assert stats['hits'] == 4 and stats['misses'] == 5
+        assert stats['evictions'] == 4 and stats['entries'] == 0 and stats['shells'] == 1
+    print("✅ Cached rows found by key, least recently used evicted first")
+
+if __name__ == "__main__":
+    test_shell_round_trip()
+    test_lookup_and_eviction()
+    print("\n🎉 All fragment cache tests passed!")
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test script for the generation cache.
+Checks, against the benchmark's LLM stand-in, that a repeated form is served
+from the cache, and that a change to the resolved options or to a default
+file generates the form again instead of returning a stale page.
+"""
+
+import contextlib
+import io
+
+import bench_generation
+import generate_table
+import ttl_cache
+
+CUSTOM_FIELDS = "Email: text input for email\nMức độ hài lòng: rating 1-5"
+
+class RecordingCache(ttl_cache.TTLCache):
+    """Generation cache that remembers which keys were stored, i.e. generated"""
+    def __init__(self):
+        super().__init__(ttl=600)
+        self.stored = []
+
+    def set(self, key, value, ttl=None):
+        self.stored.append(key)
+        super().set(key, value, ttl)
+
+def generate(cache, option_sets):
+    """Generate the form; returns the result and whether it was generated rather than served from the cache"""
+    stored = len(cache.stored)
+    with bench_generation.instrumented(bench_generation.StageTimer(), bench_generation.StandInLLM(), option_sets, False), \
+            contextlib.redirect_stdout(io.StringIO()):
+        result = generate_table.generate_html_from_custom_fields(CUSTOM_FIELDS, 'cache_form')
+    return result, len(cache.stored) > stored
+
+def test_cache_follows_inputs():
+    """Test cache hits for the same inputs and misses after options or defaults change"""
+    print("Testing generation cache key...")
+    cache = RecordingCache()
+    generation_cache = generate_table.generation_cache
+    support_files = generate_table.GENERATION_SUPPORT_FILES
+    generate_table.generation_cache = cache
+    try:
+        first, generated = generate(cache, {'status_survey': ['Active', 'Inactive']})
+        assert first and generated
+        again, generated = generate(cache, {'status_survey': ['Active', 'Inactive']})
+        assert not generated and again['html'] == first['html']
+
+        # An option set changed on the options API: the page must list the new option
+        changed, generated = generate(cache, {'status_survey': ['Active', 'Inactive', 'Paused']})
+        assert generated and 'Paused' in changed['html'] and 'Paused' not in first['html']
+
+        # A default file the pipeline reads after the HTML prompt changed
+        generate_table.GENERATION_SUPPORT_FILES = support_files + ('default_submit_fn.txt',)
+        _, generated = generate(cache, {'status_survey': ['Active', 'Inactive', 'Paused']})
+        assert generated
+    finally:
+        generate_table.GENERATION_SUPPORT_FILES = support_files
+        generate_table.generation_cache = generation_cache
+    print("✅ Cached generations are keyed on resolved options and default files")
+
+if __name__ == "__main__":
+    test_cache_follows_inputs()
+    print("\n🎉 All generation cache tests passed!")
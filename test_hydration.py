@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test script for server-side hydration of /view pages.
+Checks that the record is embedded before the page's first script with
+</script> and line separators escaped, that a failed or unexpected fetch
+serves the page unchanged, and that ?hydrate=0 turns hydration off, with a
+stand-in for the mock data API.
+"""
+
+import json
+import re
+
+import server
+
+class StandInResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+        self.text = str(body)
+
+    def json(self):
+        if isinstance(self.body, Exception):
+            raise self.body
+        return self.body
+
+class StandInSession:
+    """Answers every GET with the configured response and counts the requests"""
+    def __init__(self, response):
+        self.response = response
+        self.requests = []
+
+    def get(self, url, timeout=None):
+        self.requests.append(url)
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+def view(response, query=''):
+    session = StandInSession(response)
+    original_session = server.http_session
+    server.http_session = session
+    server.hydration_cache.clear()
+    try:
+        page = server.app.test_client().get(f'/view/test1{query}')
+    finally:
+        server.http_session = original_session
+        server.hydration_cache.clear()
+    assert page.status_code == 200
+    return page.get_data(as_text=True), session.requests
+
+def plain_page():
+    page, requests = view(StandInResponse(200, {}), '?hydrate=0')
+    assert requests == []
+    return page
+
+RECORD = {
+    'success': True,
+    'data': {'full_name': 'Nguyễn Văn A</script><script>alert(1)</script>', 'note': 'line\u2028break\u2029end'}
+}
+
+def test_shim_before_first_script():
+    """Test that the record and fetch shim are inserted before the page's first script"""
+    print("Testing hydration shim placement...")
+    page, requests = view(StandInResponse(200, RECORD), '?hydrate=1')
+    assert requests == [server.build_api_endpoint('test1')]
+    shim = page.index('window.__INITIAL_DATA__')
+    scripts = [match.start() for match in re.finditer(r'<script', page)]
+    # The shim's own <script> is the first one, and the page's scripts follow it
+    assert len(scripts) == plain_page().count('<script') + 1
+    assert scripts[0] < shim < scripts[1]
+    print("✅ Shim runs before the page's own scripts")
+
+def test_embedded_json_escaped():
+    """Test that the embedded record cannot end the script block or break parsing"""
+    print("Testing embedded JSON escaping...")
+    page, _ = view(StandInResponse(200, RECORD), '?hydrate=1')
+    embedded = page[page.index('window.__INITIAL_DATA__ = ') + len('window.__INITIAL_DATA__ = '):]
+    embedded = embedded[:embedded.index(';\n')]
+    assert '</script>' not in embedded and '<' not in embedded
+    assert '\u2028' not in embedded and '\u2029' not in embedded
+    assert '\\u003c/script>' in embedded and '\\u2028' in embedded
+    # Still the same record once parsed
+    assert json.loads(embedded) == RECORD
+    # Only the page's own script closes after the shim
+    assert page.count('</script>') == plain_page().count('</script>') + 1
+    print("✅ </script> and line separators escaped in the embedded JSON")
+
+def test_fetch_failure_falls_back():
+    """Test that the page is served unchanged when the data cannot be fetched"""
+    print("Testing hydration fallback...")
+    plain = plain_page()
+    for response in (StandInResponse(500, {'error': 'boom'}),
+                     StandInResponse(200, ['not', 'an', 'object']),
+                     StandInResponse(200, ValueError("not JSON")),
+                     ConnectionError("mock API down")):
+        page, requests = view(response, '?hydrate=1')
+        assert len(requests) == 1
+        assert page == plain and '__INITIAL_DATA__' not in page, response
+    print("✅ Failed, non-object and unparsable fetches leave the page's own fetch in place")
+
+def test_hydrate_query_parameter():
+    """Test that ?hydrate=0 disables hydration even when it is on by default"""
+    print("Testing ?hydrate=0...")
+    original = server.HYDRATE_VIEWS
+    server.HYDRATE_VIEWS = True
+    try:
+        page, requests = view(StandInResponse(200, RECORD))
+        assert '__INITIAL_DATA__' in page and len(requests) == 1
+        page, requests = view(StandInResponse(200, RECORD), '?hydrate=0')
+        assert '__INITIAL_DATA__' not in page and requests == []
+    finally:
+        server.HYDRATE_VIEWS = original
+    print("✅ Hydration follows HYDRATE_VIEWS and ?hydrate=0 turns it off")
+
+if __name__ == "__main__":
+    test_shim_before_first_script()
+    test_embedded_json_escaped()
+    test_fetch_failure_falls_back()
+    test_hydrate_query_parameter()
+    print("\n🎉 All hydration tests passed!")
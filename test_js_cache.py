@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test script for the form script cache.
+Checks that forms differing only in cosmetics share a signature, that cached
+scripts get the new form's endpoint, and that old scripts are evicted.
+"""
+
+import os
+import tempfile
+
+import js_cache
+
+FORM = """<form id="mainForm">
+    <table>
+        <tr><td><label for="full_name">Họ và tên</label></td><td><input type="text" id="full_name" name="full_name" required></td></tr>
+        <tr><td>Giới tính</td><td><select id="gender" name="gender"><option value="Nam">Nam</option><option value="Nữ">Nữ</option></select></td></tr>
+    </table>
+    <button type="submit">Gửi</button>
+</form>"""
+
+SCRIPT = "async function fetchDataFromAPI() { const response = await fetch('http://localhost:5001/api/mock/form_a'); }"
+
+def test_signature():
+    """Test that labels and styling do not change the signature but controls do"""
+    print("Testing form signatures...")
+    signature, structure = js_cache.form_signature(FORM, 'http://localhost:5001/api/mock/form_a', 'form_a')
+    assert structure['endpoint'] == 'http://localhost:5001/api/mock/{template_name}'
+
+    restyled = FORM.replace('Họ và tên', 'Tên đầy đủ').replace('<table>', '<table class="wide">')
+    assert js_cache.form_signature(restyled, 'http://localhost:5001/api/mock/form_b', 'form_b')[0] == signature
+
+    for changed in (FORM.replace('type="text"', 'type="email"'),
+                    FORM.replace(' required', ''),
+                    FORM.replace('<option value="Nữ">Nữ</option>', ''),
+                    FORM.replace('id="mainForm"', 'id="otherForm"')):
+        assert js_cache.form_signature(changed, 'http://localhost:5001/api/mock/form_b', 'form_b')[0] != signature
+    print("✅ Cosmetic changes keep the signature, structural changes do not")
+
+def test_cache():
+    """Test endpoint substitution, scripts that cannot be reused, and eviction"""
+    print("Testing script cache...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = js_cache.ScriptCache(os.path.join(tmp_dir, 'scripts.db'), max_entries=2)
+        signature, structure = js_cache.form_signature(FORM, 'http://localhost:5001/api/mock/form_a', 'form_a')
+        assert cache.get(signature, 'http://localhost:5001/api/mock/form_b') is None
+        assert cache.set(signature, structure, SCRIPT, 'http://localhost:5001/api/mock/form_a', 'form_a')
+        assert cache.get(signature, 'http://localhost:5001/api/mock/form_b') == SCRIPT.replace('form_a', 'form_b')
+
+        # A script that names its template outside the endpoint is not cached
+        assert not cache.set('other', structure, SCRIPT + " localStorage.setItem('form_a', '1');",
+                             'http://localhost:5001/api/mock/form_a', 'form_a')
+
+        cache.set('second', structure, SCRIPT, '', None)
+        cache.set('third', structure, SCRIPT, '', None)
+        assert cache.get(signature, '') is None
+
+        stats = cache.stats()
+        assert stats['hits'] == 1 and stats['misses'] == 2 and stats['skipped'] == 1
+        assert stats['entries'] == 2 and stats['evictions'] == 1 and stats['hit_rate'] == 0.333
+    print("✅ Cached scripts reused with the new endpoint, least recently used evicted")
+
+if __name__ == "__main__":
+    test_signature()
+    test_cache()
+    print("\n🎉 All script cache tests passed!")
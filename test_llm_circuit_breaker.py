@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test script for the LLM circuit breaker.
+Drives the breaker with an injected clock through closed, open, half-open and
+back, checks that only probe results decide the half-open state, and that an
+open circuit sends callers to their fallback without calling the LLM.
+"""
+
+import llm_client
+import mocking_be
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class CountingClient:
+    """Stands in for the OpenAI client and counts the calls that reach it"""
+    def __init__(self):
+        self.calls = 0
+        self.chat = self
+        self.completions = self
+
+    def create(self, **kwargs):
+        self.calls += 1
+        raise RuntimeError("LLM unavailable")
+
+def make_breaker(clock):
+    return llm_client.CircuitBreaker('test', window_size=4, min_calls=4, failure_rate=0.5,
+                                     slow_call_seconds=10, slow_call_rate=0.5, open_seconds=30,
+                                     half_open_calls=1, clock=clock)
+
+def open_breaker(breaker):
+    for _ in range(4):
+        breaker.record(breaker.allow_request(), False, 0.1)
+    assert breaker.state == llm_client.CircuitBreaker.OPEN
+
+def test_state_transitions():
+    """Test closed -> open -> half-open -> closed, and a failed probe reopening"""
+    print("Testing breaker state transitions...")
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    assert breaker.state == llm_client.CircuitBreaker.CLOSED
+
+    # Failures below min_calls keep it closed
+    for _ in range(3):
+        breaker.record(breaker.allow_request(), False, 0.1)
+    assert breaker.state == llm_client.CircuitBreaker.CLOSED
+    breaker.record(breaker.allow_request(), True, 0.1)
+    assert breaker.state == llm_client.CircuitBreaker.OPEN
+    assert breaker.allow_request() is None
+
+    # Still open until the cool-down has passed
+    clock.now += 29
+    assert breaker.allow_request() is None
+    clock.now += 1
+    assert breaker.state == llm_client.CircuitBreaker.HALF_OPEN
+    probe = breaker.allow_request()
+    assert probe is not None and probe[1] is True
+    # Only one probe at a time
+    assert breaker.allow_request() is None
+
+    # A failed probe reopens the circuit for another cool-down
+    breaker.record(probe, False, 0.1)
+    assert breaker.state == llm_client.CircuitBreaker.OPEN
+    clock.now += 30
+    probe = breaker.allow_request()
+    # A successful but slow probe also reopens it
+    breaker.record(probe, True, 12)
+    assert breaker.state == llm_client.CircuitBreaker.OPEN
+
+    clock.now += 30
+    breaker.record(breaker.allow_request(), True, 0.1)
+    assert breaker.state == llm_client.CircuitBreaker.CLOSED
+    stats = breaker.stats()
+    assert stats['window_calls'] == 0 and stats['short_circuited_total'] == 3, stats
+    print("✅ Breaker opens, probes after the cool-down and closes on a good probe")
+
+def test_only_probes_decide_half_open():
+    """Test that calls admitted before the circuit opened do not act as probes"""
+    print("Testing calls from an earlier state...")
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    # A slow call is admitted while closed and is still running...
+    slow_call = breaker.allow_request()
+    assert slow_call[1] is False
+    open_breaker(breaker)
+    clock.now += 30
+    probe = breaker.allow_request()
+    assert breaker.state == llm_client.CircuitBreaker.HALF_OPEN
+
+    # ...and finishes (successfully, or with an error) while the probe runs
+    breaker.record(slow_call, True, 0.1)
+    assert breaker.state == llm_client.CircuitBreaker.HALF_OPEN
+    breaker.record(slow_call, False, 45)
+    assert breaker.state == llm_client.CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request() is None
+
+    breaker.record(probe, True, 0.1)
+    assert breaker.state == llm_client.CircuitBreaker.CLOSED
+    # A stale failure arriving after recovery is not counted in the new window
+    breaker.record(slow_call, False, 0.1)
+    assert breaker.stats()['window_calls'] == 0
+    print("✅ Only the probe closes or reopens a half-open circuit")
+
+def test_open_circuit_short_circuits_fallback():
+    """Test that an open circuit skips the LLM and callers use their fallback"""
+    print("Testing fallback short-circuiting...")
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    client = CountingClient()
+    saved_breaker, saved_client = llm_client.llm_breaker, llm_client._client
+    llm_client.llm_breaker, llm_client._client = breaker, client
+    try:
+        # Failing calls reach the client until the circuit opens
+        for _ in range(4):
+            try:
+                llm_client.chat_completion(model='test', messages=[])
+                assert False, "the call should fail"
+            except RuntimeError:
+                pass
+        assert client.calls == 4 and breaker.state == llm_client.CircuitBreaker.OPEN
+
+        try:
+            llm_client.chat_completion(model='test', messages=[])
+            assert False, "an open circuit should raise"
+        except llm_client.CircuitOpenError:
+            pass
+
+        specs = [{'ten_field': 'ho_ten', 'ten_hien_thi': 'Họ tên', 'kieu_du_lieu': 'text'},
+                 {'ten_field': 'ngay_sinh', 'ten_hien_thi': 'Ngày sinh', 'kieu_du_lieu': 'date'}]
+        data = mocking_be.generate_mock_data_with_llm(specs)
+        assert set(data) == {'ho_ten', 'ngay_sinh'}, data
+        assert client.calls == 4
+        assert breaker.stats()['short_circuited_total'] == 2
+    finally:
+        llm_client.llm_breaker, llm_client._client = saved_breaker, saved_client
+    print("✅ Open circuit skips the LLM and the mock API falls back")
+
+if __name__ == "__main__":
+    test_state_transitions()
+    test_only_probes_decide_half_open()
+    test_open_circuit_short_circuits_fallback()
+    print("\n🎉 All circuit breaker tests passed!")
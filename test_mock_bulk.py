@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test script for bulk mock data.
+Checks that several templates are generated concurrently and returned together
+or streamed as they finish, with a stand-in for the LLM generator.
+"""
+
+import json
+import time
+
+import mocking_be
+
+def slow_generator(field_specs):
+    time.sleep(0.2)
+    return {field['ten_field']: 'x' for field in field_specs}
+
+def post(body, query=''):
+    return mocking_be.app.test_client().post(f'/api/mock/bulk{query}', json=body)
+
+def test_bulk_combined():
+    """Test that templates run concurrently and results keep request order"""
+    print("Testing bulk mock data...")
+    original = mocking_be.generate_mock_data_with_llm
+    mocking_be.generate_mock_data_with_llm = slow_generator
+    try:
+        started = time.perf_counter()
+        response = post({'templates': ['test1', {'template': 'test1', 'count': 2}, 'missing', 'test1', 'test1']})
+        elapsed = time.perf_counter() - started
+    finally:
+        mocking_be.generate_mock_data_with_llm = original
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['count'] == 5 and body['success'] is False
+    assert [result['index'] for result in body['results']] == [0, 1, 2, 3, 4]
+    assert body['results'][0]['status'] == 200 and 'full_name' in body['results'][0]['data']
+    assert body['results'][1]['count'] == 2 and len(body['results'][1]['data']) == 2
+    assert body['results'][2]['status'] == 404 and body['results'][2]['template'] == 'missing'
+    # Bounded by the slowest template (two records), not the sum of all six
+    assert elapsed < 0.9, elapsed
+    print(f"✅ 5 templates in {elapsed:.2f}s, results in request order")
+
+def test_bulk_stream():
+    """Test NDJSON streaming and that the admission slot is held until the stream ends"""
+    print("Testing streamed bulk mock data...")
+    original = mocking_be.generate_mock_data_with_llm
+    mocking_be.generate_mock_data_with_llm = slow_generator
+    try:
+        response = post({'templates': [{'template': 'test1', 'count': 3}, 'test1'], 'stream': True})
+        assert response.mimetype == 'application/x-ndjson'
+        results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        response.close()
+    finally:
+        mocking_be.generate_mock_data_with_llm = original
+
+    # The single record finishes first
+    assert [result['index'] for result in results] == [1, 0]
+    assert mocking_be.mock_admission.stats()['in_flight'] == 0
+
+    assert post({'templates': []}).status_code == 400
+    assert post({'templates': ['../secret']}).status_code == 400
+    assert post({'templates': [{'template': 'test1', 'count': 0}]}).status_code == 400
+    too_many = [{'template': 'test1', 'count': 100}] * (mocking_be.MOCK_BULK_MAX_RECORDS // 100 + 1)
+    assert post({'templates': too_many}).status_code == 413
+    print("✅ Results streamed as they finish, bad requests rejected")
+
+def test_bulk_admission():
+    """Test that every template takes an admission slot and is rejected on its own"""
+    print("Testing bulk admission...")
+    original = mocking_be.generate_mock_data_with_llm
+    mocking_be.generate_mock_data_with_llm = slow_generator
+    admission = mocking_be.mock_admission
+    saved = admission.max_concurrent, admission.max_queue, admission.max_queue_time
+    admission.max_concurrent, admission.max_queue, admission.max_queue_time = 1, 1, 0.1
+    admitted = admission.stats()['admitted_total']
+    try:
+        body = post({'templates': ['test1'] * 3}).get_json()
+    finally:
+        mocking_be.generate_mock_data_with_llm = original
+        admission.max_concurrent, admission.max_queue, admission.max_queue_time = saved
+
+    statuses = sorted(result['status'] for result in body['results'])
+    assert statuses[0] == 200 and statuses[-1] == 429, statuses
+    assert all('retry_after' in result for result in body['results'] if result['status'] == 429)
+    assert admission.stats()['admitted_total'] - admitted == statuses.count(200)
+    assert admission.stats()['in_flight'] == 0
+    print(f"✅ Templates admitted one slot each: {statuses}")
+
+if __name__ == "__main__":
+    test_bulk_combined()
+    test_bulk_stream()
+    test_bulk_admission()
+    print("\n🎉 All bulk mock tests passed!")
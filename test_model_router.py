@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test script for the quality gates and routing counters of the model router.
+Checks that a page or a set of rows must cover every field definition line,
+so a field the model left out fails the gate and escalates to the next tier,
+that a chunked form whose stitched page fails the gate is rejected, and that
+requests on which every model failed are counted as failures.
+"""
+
+import json
+
+import field_contract
+import form_analyzer
+import generate_table
+import llm_client
+import mocking_be
+import model_router
+import template_update
+
+LINES = template_update.parse_field_lines("""full_name: text input for collecting customer's full name
+gender: select box with two options are F and M
+Số điện thoại: text
+Mức độ hài lòng: rating 1-5""")
+
+def gate(page, lines):
+    specs = template_update.attribute_specs(form_analyzer.derive_specs(page), LINES)
+    return model_router.check_generated_form(page, json.dumps(specs, ensure_ascii=False), lines)
+
+def test_field_line_coverage():
+    """Test that every definition line needs a field on the page"""
+    print("Testing field line coverage...")
+    page = field_contract.contract_html(field_contract.plan_contract(LINES))
+    assert gate(page, LINES) == []
+
+    # Dropping a row leaves specs.json consistent with the page, so only the
+    # definition lines show that a field is missing
+    start = page.index('<tr data-mo-ta="Số điện thoại: text"')
+    dropped = page[:start] + page[page.index('</tr>', start) + len('</tr>'):]
+    assert gate(dropped, None) == []
+    assert gate(dropped, LINES) == ["No field on the page for definition line: Số điện thoại: text"]
+    print("✅ Pages missing a definition line fail the gate")
+
+def test_rows_gate():
+    """Test the gate for rows generated for an existing page"""
+    print("Testing the rows gate...")
+    page = field_contract.contract_html(field_contract.plan_contract(LINES))
+    rows = "\n".join(page[start:page.index('</tr>', start) + len('</tr>')]
+                     for start in (page.index('<tr data-mo-ta="gender'), page.index('<tr data-mo-ta="Mức độ')))
+    assert model_router.check_generated_rows(rows, [LINES[1], LINES[3]]) == []
+    assert model_router.check_generated_rows(rows, LINES[1:]) == [
+        "No field on the page for definition line: Số điện thoại: text"
+    ]
+    assert model_router.check_generated_rows("", LINES) == ["No rows generated"]
+    print("✅ Rows must parse and cover every line they were generated for")
+
+def test_stitched_form_gate():
+    """Test that a chunked form is rejected when the stitched page fails the gate"""
+    print("Testing the stitched form gate...")
+    page = field_contract.contract_html(field_contract.plan_contract(LINES))
+    rows = {line: page[page.index(f'<tr data-mo-ta="{line.split(":")[0]}'):] for line in LINES[2:]}
+    rows = {line: row[:row.index('</tr>') + len('</tr>')] for line, row in rows.items()}
+    skeleton = field_contract.contract_html(field_contract.plan_contract(LINES[:2]))
+    skeleton_specs = template_update.attribute_specs(form_analyzer.derive_specs(skeleton), LINES[:2])
+
+    original = generate_table.generate_rows_in_chunks
+    try:
+        generate_table.generate_rows_in_chunks = lambda chunk_lines, html: {'rows': rows}
+        stitched = generate_table.stitch_chunked_form(skeleton, skeleton_specs, LINES, LINES, LINES[2:])
+        assert stitched is not None and gate(stitched[0], LINES) == []
+
+        # A chunk returned a row without its field
+        broken = dict(rows, **{LINES[3]: '<tr data-mo-ta="x"><td>Mức độ hài lòng</td><td></td></tr>'})
+        generate_table.generate_rows_in_chunks = lambda chunk_lines, html: {'rows': broken}
+        assert generate_table.stitch_chunked_form(skeleton, skeleton_specs, LINES, LINES, LINES[2:]) is None
+    finally:
+        generate_table.generate_rows_in_chunks = original
+    print("✅ Stitched pages that fail the gate are rejected")
+
+def test_failures_counted():
+    """Test that mock data on which every model raised is not recorded as a used tier"""
+    print("Testing routing failure counts...")
+    specs = [{'ten_field': 'full_name', 'ten_hien_thi': 'Họ tên', 'kieu_du_lieu': 'text'}]
+    before = model_router.routing_stats.snapshot().get('mock', {})
+
+    def unavailable(**kwargs):
+        raise RuntimeError("model unavailable")
+
+    original = llm_client.chat_completion
+    llm_client.chat_completion = unavailable
+    try:
+        data = mocking_be.generate_mock_data_with_llm(specs)
+    finally:
+        llm_client.chat_completion = original
+
+    after = model_router.routing_stats.snapshot()['mock']
+    assert 'full_name' in data
+    assert after['failures'] == before.get('failures', 0) + 1
+    assert after['gate_failures'] == before.get('gate_failures', 0)
+    assert after['escalations'] == before.get('escalations', 0)
+    print("✅ Requests on which every model failed are counted as failures")
+
+if __name__ == "__main__":
+    test_field_line_coverage()
+    test_rows_gate()
+    test_stitched_form_gate()
+    test_failures_counted()
+    print("\n🎉 All model router tests passed!")
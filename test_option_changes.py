@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Test script for the option change feed.
+Checks that If-None-Match is read as a version whether the ETag is quoted or
+weak, and that anything else is rejected instead of failing the request.
+"""
+
+import mocking_option_value
+
+def changes(etag):
+    client = mocking_option_value.app.test_client()
+    return client.get('/api/options/changes?timeout=0', headers={'If-None-Match': etag})
+
+def test_if_none_match():
+    """Test strong, weak, listed and invalid ETags"""
+    print("Testing If-None-Match on the change feed...")
+    version = mocking_option_value.store.version
+    assert mocking_option_value.parse_etag_version(f'W/"{version}"') == version
+    assert mocking_option_value.parse_etag_version(f'"1", W/"{version}"') == version
+    assert mocking_option_value.parse_etag_version('') == 0
+
+    for etag in (f'"{version}"', f'W/"{version}"', str(version)):
+        assert changes(etag).status_code == 304, etag
+    response = changes('W/"0"')
+    assert response.status_code == 200 and response.headers['ETag'] == f'"{version}"'
+    for etag in ('"abc"', 'W/"1.5"', '"-1"'):
+        response = changes(etag)
+        assert response.status_code == 400 and response.get_json()['success'] is False, etag
+    print("✅ Quoted and weak ETags accepted, invalid ones answered with 400")
+
+if __name__ == "__main__":
+    test_if_none_match()
+    print("\n🎉 All option change feed tests passed!")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test script for the post-generation page optimiser.
+Checks that JavaScript minification tells regex literals from division and
+never cuts into strings, that minified CSS stays safe to render through
+Jinja, that identical styles share one stylesheet and that the byte budget
+is reported.
+"""
+
+import os
+import tempfile
+
+import jinja2
+
+import page_optimizer
+
+def test_regex_and_division():
+    """Test that "/" after an operand divides and elsewhere starts a regex"""
+    print("Testing regex vs division...")
+    # After a postfix operator: division, so the comment is still removed
+    assert page_optimizer.minify_js("let y = i++ / 2; // half\nrun()") == "let y = i++ / 2;\nrun()"
+    assert page_optimizer.minify_js("let z = a++ / b-- / c; // c") == "let z = a++ / b-- / c;"
+    # After ")" and "]": division
+    assert page_optimizer.minify_js("x = (a + b) / total // share") == "x = (a + b) / total"
+    assert page_optimizer.minify_js("w = widths[i] / 2 /* half */") == "w = widths[i] / 2"
+    # After a keyword or an operator: a regex, copied verbatim even with "//" inside
+    assert page_optimizer.minify_js("function f(s) {\n  return /a\\/\\/b/g.test(s) // url\n}") == \
+        "function f(s) {\nreturn /a\\/\\/b/g.test(s)\n}"
+    assert page_optimizer.minify_js("const re = /[/]+/;  // slashes") == "const re = /[/]+/;"
+    assert page_optimizer.minify_js("ok = !/^\\d+$/.test(v)") == "ok = !/^\\d+$/.test(v)"
+    print("✅ Division and regex literals told apart")
+
+def test_strings_kept():
+    """Test that comment markers inside strings and templates are not comments"""
+    print("Testing string literals...")
+    source = 'fetch("https://example.com/api"); // load\nconst t = `a // ${b}`;\nconst s = \'/* x */\';'
+    assert page_optimizer.minify_js(source) == \
+        'fetch("https://example.com/api");\nconst t = `a // ${b}`;\nconst s = \'/* x */\';'
+    print("✅ Strings containing // and /* */ kept whole")
+
+def test_css_is_jinja_safe():
+    """Test that minified CSS never opens a Jinja block, expression or comment"""
+    print("Testing Jinja safety of CSS...")
+    for css in ("a {\n  {color: red}\n}", "a {\n  %x: 1\n}", "a {\n  #b {c: d}\n}"):
+        minified = page_optimizer.minify_css(css)
+        assert '{{' not in minified and '{%' not in minified and '{#' not in minified, minified
+        jinja2.Environment().from_string(f"<style>{minified}</style>").render()
+    page = "<html><head><style>\n.a {\n  {color: red}\n}\n</style></head><body></body></html>"
+    jinja2.Environment().from_string(page_optimizer.minify_html(page)).render()
+    print("✅ Minified CSS renders through Jinja")
+
+def test_extract_stylesheet_dedupe():
+    """Test that pages with the same styles share one stylesheet"""
+    print("Testing stylesheet extraction...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        first = "<html><head><style>body { color: red; }</style><style>p { margin: 0 }</style></head><body>a</body></html>"
+        second = "<html><head><style>body {color:red}</style><style>p{margin:0;}</style></head><body>b</body></html>"
+        html_a, path_a = page_optimizer.extract_stylesheet(first, tmp_dir, '/static/forms/')
+        html_b, path_b = page_optimizer.extract_stylesheet(second, tmp_dir, '/static/forms')
+        assert path_a == path_b and os.listdir(tmp_dir) == [os.path.basename(path_a)]
+        link = f'<link rel="stylesheet" href="/static/forms/{os.path.basename(path_a)}">'
+        assert html_a.count(link) == 1 and '<style' not in html_a
+        assert html_b.count(link) == 1 and '<style' not in html_b
+
+        unstyled = "<html><body>c</body></html>"
+        assert page_optimizer.extract_stylesheet(unstyled, tmp_dir, '/static/forms') == (unstyled, None)
+    print("✅ Identical styles stored once and linked from both pages")
+
+def test_budget():
+    """Test the size stats and the budget result"""
+    print("Testing page budget...")
+    page = "<html>\n  <!-- generated -->\n  <body>\n    <p>hello</p>\n  </body>\n</html>"
+    result = page_optimizer.optimize_page(page)
+    stats = result['stats']
+    assert stats['optimized_bytes'] == len(result['html'].encode('utf-8')) < stats['original_bytes']
+    assert stats['saved_bytes'] == stats['original_bytes'] - stats['optimized_bytes']
+    assert stats['within_budget'] and stats['budget'] == 0
+
+    assert page_optimizer.optimize_page(page, budget=stats['optimized_bytes'])['stats']['within_budget']
+    over = page_optimizer.optimize_page(page, budget=stats['optimized_bytes'] - 1)['stats']
+    assert over['within_budget'] is False
+    print("✅ Sizes reported, budget checked against the optimised page")
+
+if __name__ == "__main__":
+    test_regex_and_division()
+    test_strings_kept()
+    test_css_is_jinja_safe()
+    test_extract_stylesheet_dedupe()
+    test_budget()
+    print("\n🎉 All page optimizer tests passed!")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test script for request profiling.
+Checks that allowlisted requests with the profiling token get pstats and collapsed-stack output, and others do not.
+"""
+
+import os
+import pstats
+import tempfile
+
+import mocking_option_value
+import profiling
+
+def test_profiled_request():
+    """Test that a profiled request writes a pstats file and collapsed stacks"""
+    print("Testing on-demand profiling...")
+    client = mocking_option_value.app.test_client()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        profiling.PROFILE_DIR = tmp_dir
+        try:
+            # Without a token, on-demand profiling is off
+            profiling.PROFILE_TOKEN = ''
+            response = client.get('/health', headers={'X-Profile': '1'})
+            response.close()
+            assert 'X-Profile-Id' not in response.headers
+
+            profiling.PROFILE_TOKEN = 's3cret'
+            response = client.get('/health', headers={'X-Profile': '1'})
+            response.close()
+            assert 'X-Profile-Id' not in response.headers
+            response = client.get('/health', headers={'X-Profile': 's3cret'})
+            response.close()
+            profile_id = response.headers['X-Profile-Id']
+            assert profile_id.startswith('mocking_option_value-') and '-GET-health-' in profile_id
+
+            stats = pstats.Stats(os.path.join(tmp_dir, profile_id + '.pstats'))
+            assert any(name == 'health_check' for _, _, name in stats.stats)
+            with open(os.path.join(tmp_dir, profile_id + '.collapsed'), encoding='utf-8') as f:
+                for line in f:
+                    stack, count = line.rsplit(' ', 1)
+                    assert int(count) > 0 and stack
+
+            # Other clients, and requests without the header, are not profiled
+            response = client.get('/health?_profile=s3cret', environ_base={'REMOTE_ADDR': '203.0.113.7'})
+            response.close()
+            assert 'X-Profile-Id' not in response.headers
+            response = client.get('/health')
+            response.close()
+            assert 'X-Profile-Id' not in response.headers
+            assert len(os.listdir(tmp_dir)) == 2
+        finally:
+            profiling.PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+            profiling.PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+    print("✅ Profiles written only for allowlisted requests with the token")
+
+if __name__ == "__main__":
+    test_profiled_request()
+    print("\n🎉 All profiling tests passed!")
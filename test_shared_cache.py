@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Test script for the cross-worker cache.
+Checks that values cached in one process are seen by another and that entries expire.
+"""
+
+import multiprocessing
+import os
+import tempfile
+import time
+
+import shared_cache
+from ttl_cache import TTLCache
+
+def _store_options(path):
+    cache = shared_cache.SharedCache(path, 'options', ttl=60)
+    cache.set('province', ["Hà Nội", "Đà Nẵng"])
+
+def test_shared_between_processes():
+    """Test that a value set by another process is a hit, and namespaces stay apart"""
+    print("Testing cross-process hits...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'shared.db')
+        process = multiprocessing.get_context('spawn').Process(target=_store_options, args=(path,))
+        process.start()
+        process.join()
+        assert process.exitcode == 0
+
+        cache = shared_cache.SharedCache(path, 'options', ttl=60)
+        assert cache.get('province') == ["Hà Nội", "Đà Nẵng"]
+        assert shared_cache.SharedCache(path, 'hydration', ttl=60).get('province') is None
+
+        cache.delete('province')
+        assert cache.get('province', []) == []
+    print("✅ Values are shared across processes")
+
+def test_expiry_and_fallback():
+    """Test expiry, and that make_cache falls back to TTLCache without SHARED_CACHE"""
+    print("Testing expiry...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = shared_cache.SharedCache(os.path.join(tmp_dir, 'shared.db'), 'hydration', ttl=60)
+        cache.set('short', {'success': True}, ttl=0.05)
+        cache.set('long', {'success': True})
+        time.sleep(0.1)
+        assert cache.get('short') is None
+        assert cache.get('long') == {'success': True}
+
+    if not shared_cache.SHARED_CACHE_PATH:
+        assert isinstance(shared_cache.make_cache('options', ttl=60), TTLCache)
+    print("✅ Entries expire after their ttl")
+
+if __name__ == "__main__":
+    test_shared_between_processes()
+    test_expiry_and_fallback()
+    print("\n🎉 All shared cache tests passed!")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test script for the template similarity index.
+Checks paraphrase matching, incremental updates and line pairing, without calling the LLM.
+"""
+
+import similarity_index
+
+SATISFACTION = """độ hài lòng của khách hàng, thang điểm từ 1 tới 5
+đánh giá cụ thể cho khách hàng nhập chi tiết ý kiến khách hàng"""
+
+PARAPHRASE = """Mức độ hài lòng khách hàng (thang điểm 1-5)
+khách hàng nhập ý kiến chi tiết để đánh giá cụ thể"""
+
+def build_index():
+    index = similarity_index.SimilarityIndex()
+    index.add_many([
+        ("satisfaction", SATISFACTION, {'adaptable': True}),
+        ("loan", "số tiền vay\nkỳ hạn vay (tháng)\nthu nhập hàng tháng", {}),
+        ("referral", "họ tên người giới thiệu\nsố điện thoại người giới thiệu", {}),
+    ])
+    return index
+
+def test_paraphrase_query():
+    """Test that a paraphrase finds its template and unrelated fields do not"""
+    print("Testing paraphrase query...")
+    index = build_index()
+
+    results = index.query(PARAPHRASE, limit=3)
+    assert results[0][0] == "satisfaction"
+    assert results[0][1] >= 0.7
+    assert results[0][2] == {'adaptable': True}
+    assert all(score < 0.5 for _, score, _ in results[1:])
+
+    # Unaccented input matches accented templates
+    assert index.query("do hai long cua khach hang, thang diem tu 1 toi 5")[0][0] == "satisfaction"
+    print("✅ Paraphrases match, unrelated templates score low")
+
+def test_incremental_updates():
+    """Test that documents can be added, replaced and removed one at a time"""
+    print("Testing incremental updates...")
+    index = build_index()
+
+    index.add("satisfaction_v2", SATISFACTION)
+    assert {name for name, _, _ in index.query(SATISFACTION, limit=2)} == {"satisfaction", "satisfaction_v2"}
+
+    index.add("satisfaction_v2", "số tài khoản ngân hàng")
+    assert index.query("số tài khoản ngân hàng")[0][0] == "satisfaction_v2"
+
+    index.remove("satisfaction")
+    assert "satisfaction" not in index
+    assert all(name != "satisfaction" for name, _, _ in index.query(SATISFACTION))
+    assert len(index) == 3
+    print("✅ Add, replace and remove update the index")
+
+def test_match_lines():
+    """Test that paraphrased lines pair with their originals and different scales do not"""
+    print("Testing line matching...")
+    matches = similarity_index.match_lines(
+        PARAPHRASE.splitlines() + ["số điện thoại người thân"],
+        SATISFACTION.splitlines()
+    )
+    assert matches == dict(zip(PARAPHRASE.splitlines(), SATISFACTION.splitlines()))
+
+    assert similarity_index.match_lines(["độ hài lòng của khách hàng, thang điểm từ 1 tới 10"],
+                                        SATISFACTION.splitlines()) == {}
+    print("✅ Lines pair one to one, rating scales must agree")
+
+if __name__ == "__main__":
+    test_paraphrase_query()
+    test_incremental_updates()
+    test_match_lines()
+    print("\n🎉 All similarity index tests passed!")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test script for the submission log.
+Checks that submissions are readable right after they are queued, that
+queries filter and paginate, and that concurrent writers are group-committed.
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+import submission_store
+
+def test_append_and_query():
+    """Test ids, read-your-writes, filters and pagination"""
+    print("Testing submission log queries...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = submission_store.SubmissionStore(os.path.join(tmp_dir, 'submissions.db'))
+        first = store.append('form_a', {'ho_ten': 'Nguyễn Văn A'})
+        middle = time.time()
+        second = store.append('form_b', {'email': 'x'}, valid=False, errors=['Invalid email format: email'])
+        third = store.append('form_a', {'ho_ten': 'Trần Thị B'})
+        assert first['submission_id'].startswith('SUB_')
+        assert first['submission_id'] < second['submission_id'] < third['submission_id']
+
+        submission = store.get(second['submission_id'])
+        assert submission['template'] == 'form_b' and not submission['valid']
+        assert submission['errors'] == ['Invalid email format: email']
+        assert store.get('SUB_missing') is None
+
+        page = store.query(template='form_a', limit=1)
+        assert [s['data']['ho_ten'] for s in page['submissions']] == ['Nguyễn Văn A']
+        page = store.query(template='form_a', after=page['next_cursor'], limit=1)
+        assert [s['data']['ho_ten'] for s in page['submissions']] == ['Trần Thị B']
+        assert page['next_cursor'] is None
+
+        assert len(store.query(since=middle)['submissions']) == 2
+        assert len(store.query(until=middle)['submissions']) == 1
+        assert [s['template'] for s in store.query(valid=False)['submissions']] == ['form_b']
+        store.close()
+    print("✅ Submissions readable by id, template, time range and page")
+
+def test_concurrent_writes():
+    """Test that many request threads are group-committed without losing writes"""
+    print("Testing concurrent submissions...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = submission_store.SubmissionStore(os.path.join(tmp_dir, 'submissions.db'))
+        threads_count, per_thread = 8, 1000
+
+        def submit(worker):
+            for index in range(per_thread):
+                store.append(f'form_{worker}', {'index': index})
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=submit, args=(worker,)) for worker in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert store.flush()
+        elapsed = time.perf_counter() - start
+
+        stats = store.stats()
+        assert stats['stored'] == stats['committed'] == threads_count * per_thread
+        assert stats['batches'] < threads_count * per_thread and stats['errors'] == 0
+        assert len(store.query(template='form_3', limit=per_thread)['submissions']) == per_thread
+        store.close()
+    rate = threads_count * per_thread / elapsed
+    print(f"✅ {threads_count * per_thread} submissions in {stats['batches']} commits ({rate:.0f}/s)")
+
+if __name__ == "__main__":
+    test_append_and_query()
+    test_concurrent_writes()
+    print("\n🎉 All submission store tests passed!")
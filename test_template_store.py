@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Test script for template publishing.
+Checks that template names are reserved before generation, that new templates
+appear in one step and that updates replace the whole folder at once, without
+calling the LLM.
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+import template_store
+
+def use_dirs(tmp_dir):
+    template_store.TEMPLATES_DIR = os.path.join(tmp_dir, 'templates')
+    template_store.STAGING_DIR = os.path.join(tmp_dir, '.template_staging')
+    os.makedirs(template_store.TEMPLATES_DIR)
+
+def test_reserve_and_publish():
+    """Test that a name is held until published and duplicates fail fast"""
+    print("Testing template reservations...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        use_dirs(tmp_dir)
+        with template_store.reserve('loan_form') as reservation:
+            try:
+                template_store.reserve('loan_form')
+                assert False, "second reservation should fail"
+            except template_store.TemplateBusyError:
+                pass
+            assert not os.path.exists(template_store.template_dir('loan_form'))
+            reservation.publish({'index.html': '<form></form>', 'specs.json': '[]'})
+
+        assert sorted(os.listdir(template_store.template_dir('loan_form'))) == ['index.html', 'specs.json']
+        # Nothing left behind in staging once the reservation is released
+        assert os.listdir(template_store.STAGING_DIR) == []
+        try:
+            template_store.reserve('loan_form')
+            assert False, "reserving a published template should fail"
+        except template_store.TemplateExistsError:
+            pass
+
+        # A failed generation releases the name without publishing anything
+        try:
+            with template_store.reserve('broken_form'):
+                raise RuntimeError("generation failed")
+        except RuntimeError:
+            pass
+        assert not os.path.exists(template_store.template_dir('broken_form'))
+        template_store.reserve('broken_form').release()
+    print("✅ Names reserved up front, published in one step, released on failure")
+
+def test_concurrent_reservations():
+    """Test that exactly one of many concurrent requests gets the name"""
+    print("Testing concurrent reservations...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        use_dirs(tmp_dir)
+        results = []
+        start = threading.Barrier(8)
+
+        def create():
+            start.wait()
+            try:
+                with template_store.reserve('shared_name') as reservation:
+                    time.sleep(0.05)
+                    reservation.publish({'index.html': 'x'})
+                results.append('published')
+            except (template_store.TemplateBusyError, template_store.TemplateExistsError):
+                results.append('rejected')
+
+        threads = [threading.Thread(target=create) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results.count('published') == 1 and results.count('rejected') == 7
+    print("✅ One request wins, the others are rejected before generating")
+
+def test_update_and_stale_lock():
+    """Test atomic updates of existing templates and takeover of abandoned locks"""
+    print("Testing template updates...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        use_dirs(tmp_dir)
+        with template_store.reserve('form') as reservation:
+            reservation.publish({'index.html': 'v1', 'specs.json': '[]'})
+
+        with template_store.lock_existing('form') as reservation:
+            reservation.publish({'index.html': 'v2'})
+        with open(os.path.join(template_store.template_dir('form'), 'index.html'), encoding='utf-8') as f:
+            assert f.read() == 'v2'
+        assert sorted(os.listdir(template_store.template_dir('form'))) == ['index.html', 'specs.json']
+
+        try:
+            template_store.lock_existing('missing')
+            assert False, "locking a missing template should fail"
+        except template_store.TemplateNotFoundError:
+            pass
+
+        # A lock left by a crashed process is taken over once it expires
+        lock_path = os.path.join(template_store.STAGING_DIR, 'form.lock')
+        open(lock_path, 'w').close()
+        old = time.time() - template_store.TEMPLATE_RESERVATION_SECONDS - 1
+        os.utime(lock_path, (old, old))
+        template_store.lock_existing('form').release()
+        assert [name for name in os.listdir(template_store.STAGING_DIR) if not name.endswith('.retired')] == []
+    print("✅ Updates replace files whole, abandoned locks expire")
+
+def test_update_is_one_step():
+    """Test that readers never pair a new specs.json with an old index.html"""
+    print("Testing whole-folder updates...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        use_dirs(tmp_dir)
+        with template_store.reserve('form') as reservation:
+            reservation.publish({'index.html': 'v0', 'specs.json': 'v0', 'notes.txt': 'kept'})
+
+        published = {'v0'} | {f'v{version}' for version in range(1, 51)}
+        bad_reads = []
+        errors = []
+        reads = []
+        done = threading.Event()
+
+        def read():
+            folder = template_store.template_dir('form')
+            try:
+                while not done.is_set():
+                    # Both files through one directory handle, as a reader of one version would see them
+                    fd = os.open(folder, os.O_RDONLY)
+                    try:
+                        versions = []
+                        for file_name in ('specs.json', 'index.html'):
+                            file_fd = os.open(file_name, os.O_RDONLY, dir_fd=fd)
+                            with os.fdopen(file_fd, encoding='utf-8') as f:
+                                versions.append(f.read())
+                    finally:
+                        os.close(fd)
+                    reads.append(versions)
+                    if versions[0] != versions[1] or versions[0] not in published:
+                        bad_reads.append(versions)
+            except Exception as exc:
+                errors.append(exc)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        for version in range(1, 51):
+            with template_store.lock_existing('form') as reservation:
+                reservation.publish({'specs.json': f'v{version}', 'index.html': f'v{version}'})
+        done.set()
+        reader.join()
+
+        # Every read found the folder and both files of one published version
+        assert errors == [], errors[:3]
+        assert reads and bad_reads == [], bad_reads[:3]
+        with open(os.path.join(template_store.template_dir('form'), 'notes.txt'), encoding='utf-8') as f:
+            assert f.read() == 'kept'
+
+        # Replaced folders are kept for late readers, then removed by a later publish
+        assert all(name.endswith('.retired') for name in os.listdir(template_store.STAGING_DIR)
+                   if not name.endswith('.lock'))
+        retired_seconds = template_store.TEMPLATE_RETIRED_SECONDS
+        template_store.TEMPLATE_RETIRED_SECONDS = 0
+        try:
+            with template_store.lock_existing('form') as reservation:
+                reservation.publish({'specs.json': 'v51', 'index.html': 'v51'})
+        finally:
+            template_store.TEMPLATE_RETIRED_SECONDS = retired_seconds
+        assert os.listdir(template_store.STAGING_DIR) == []
+    print("✅ 50 updates exchanged in whole, the folder never missing, unchanged files kept")
+
+def test_fresh_lock_not_stolen():
+    """Test that a lock re-created while an expired one is taken over is left in place"""
+    print("Testing stale lock takeover race...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        use_dirs(tmp_dir)
+        os.makedirs(template_store.STAGING_DIR)
+        lock_path = os.path.join(template_store.STAGING_DIR, 'form.lock')
+        open(lock_path, 'w').close()
+        old = time.time() - template_store.TEMPLATE_RESERVATION_SECONDS - 1
+        os.utime(lock_path, (old, old))
+
+        # Another process takes the expired lock over right after this one saw its age
+        getmtime = os.path.getmtime
+        def racing_getmtime(path):
+            mtime = getmtime(path)
+            if path == lock_path:
+                os.remove(lock_path)
+                with open(lock_path, 'w') as f:
+                    f.write("other")
+                os.path.getmtime = getmtime
+            return mtime
+        os.path.getmtime = racing_getmtime
+        try:
+            template_store.reserve('form')
+            assert False, "a fresh lock must not be taken over"
+        except template_store.TemplateBusyError:
+            pass
+        finally:
+            os.path.getmtime = getmtime
+
+        with open(lock_path, encoding='utf-8') as f:
+            assert f.read() == "other"
+        assert os.listdir(template_store.STAGING_DIR) == ['form.lock']
+    print("✅ Fresh locks are restored instead of removed")
+
+if __name__ == "__main__":
+    test_reserve_and_publish()
+    test_concurrent_reservations()
+    test_update_and_stale_lock()
+    test_update_is_one_step()
+    test_fresh_lock_not_stolen()
+    print("\n🎉 All template store tests passed!")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test script for incremental template updates.
+Checks the field diff, the row splicing and the specs derivation used by the /update route, without calling the LLM.
+"""
+
+import form_analyzer
+import template_update
+
+PAGE = """<html>
+<body>
+    <form>
+        <table>
+            <tr>
+                <td><label for="full_name">Họ và tên:</label></td>
+                <td><input type="text" id="full_name" name="full_name"></td>
+            </tr>
+            <tr>
+                <td><label for="father_name">Họ tên bố:</label></td>
+                <td><input type="text" id="father_name" name="father_name"></td>
+            </tr>
+            <tr>
+                <td><label for="mother_name">Họ tên mẹ:</label></td>
+                <td><input type="text" id="mother_name" name="mother_name"></td>
+            </tr>
+        </table>
+    </form>
+</body>
+</html>"""
+
+SPECS = [
+    {"ten_hien_thi": "Họ và tên", "ten_field": "full_name", "kieu_du_lieu": "text",
+     "mo_ta": "full_name: text input for collecting customer's full name"},
+    {"ten_hien_thi": "Họ tên bố", "ten_field": "father_name", "kieu_du_lieu": "text",
+     "mo_ta": "father: họ tên bố"},
+    {"ten_hien_thi": "Họ tên mẹ", "ten_field": "mother_name", "kieu_du_lieu": "text",
+     "mo_ta": "Họ tên mẹ"},
+]
+
+def test_diff_fields():
+    """Test that added, changed and removed lines are detected by key"""
+    print("Testing field diff...")
+    diff = template_update.diff_fields(
+        ["father:  tên đầy đủ của bố", "email khách hàng"],
+        SPECS,
+        default_lines=["full_name: text input for collecting customer's full name"]
+    )
+
+    assert diff['added'] == ["email khách hàng"]
+    assert diff['changed'] == [("father:  tên đầy đủ của bố", ["father_name"])]
+    assert diff['removed'] == ["mother_name"]
+
+    # Whitespace and case differences are not changes
+    diff = template_update.diff_fields(["FATHER:  họ   tên bố", "họ tên mẹ"], SPECS)
+    assert diff['added'] == [] and diff['changed'] == []
+    assert diff['unchanged'] == ["father_name", "mother_name"]
+
+    # Without the default lines, the default field's row would be dropped
+    assert diff['removed'] == ["full_name"]
+    print("✅ Field diff detects added, changed and removed fields")
+
+def test_splice_rows():
+    """Test that only the edited rows change in the page"""
+    print("Testing row splicing...")
+    new_row = '<tr>\n    <td><input type="email" name="email"></td>\n</tr>'
+    changed_row = '<tr>\n    <td><input type="text" name="father_name" placeholder="Tên bố"></td>\n</tr>'
+    html = template_update.splice_rows(
+        PAGE,
+        removed=["mother_name"],
+        replaced=[(["father_name"], changed_row)],
+        added=[new_row]
+    )
+
+    assert 'name="mother_name"' not in html
+    assert 'placeholder="Tên bố"' in html
+    assert html.index('name="father_name"') < html.index('name="email"') < html.index('</table>')
+    assert '            <tr>\n                <td><input type="email" name="email"></td>\n            </tr>' in html
+
+    # Untouched rows stay byte-for-byte identical
+    full_name_start, full_name_end = template_update.find_field_rows(PAGE)['full_name']
+    assert PAGE[:full_name_end] in html
+    print("✅ Rows spliced without touching the rest of the page")
+
+def test_derived_specs():
+    """Test that specs derived from generated rows point back at the original lines"""
+    print("Testing derived specs...")
+    rows = """
+<tr data-mo-ta="trạng thái: chọn một trong [Active, Inactive]">
+    <td><label for="status">Trạng thái:</label></td>
+    <td><select id="status" name="status"><option>Active</option><option>Inactive</option></select></td>
+</tr>
+<tr data-mo-ta="Đánh giá dịch vụ">
+    <td>Đánh giá dịch vụ:</td>
+    <td>""" + "".join(f'<input type="radio" id="s{i}" name="service_rating" value="{i}"><label for="s{i}">★</label>' for i in range(1, 6)) + """</td>
+</tr>"""
+    specs = template_update.attribute_specs(
+        form_analyzer.derive_specs(rows),
+        ["trạng thái: chọn một trong {status_survey}", "Đánh giá dịch vụ"],
+        ["trạng thái: chọn một trong [Active, Inactive]", "Đánh giá dịch vụ"]
+    )
+
+    assert specs == [
+        {"ten_hien_thi": "Trạng thái", "ten_field": "status", "kieu_du_lieu": "select",
+         "mo_ta": "trạng thái: chọn một trong {status_survey}"},
+        {"ten_hien_thi": "Đánh giá dịch vụ", "ten_field": "service_rating", "kieu_du_lieu": "rating",
+         "mo_ta": "Đánh giá dịch vụ"},
+    ]
+    print("✅ Specs derived from the HTML with labels, types and source lines")
+
+def test_rows_by_line():
+    """Test that a page is cut into rows per definition line and rows can be renamed"""
+    print("Testing rows by line...")
+    rows = template_update.rows_by_line(PAGE, SPECS)
+    assert list(rows) == [entry['mo_ta'] for entry in SPECS]
+    assert rows["Họ tên mẹ"]['specs'] == [SPECS[2]]
+    assert rows["Họ tên mẹ"]['markup'].startswith('<tr>\n    <td><label for="mother_name">')
+
+    renamed = template_update.rename_field(rows["Họ tên mẹ"]['markup'], "mother_name", "mother_name_2")
+    assert 'for="mother_name_2"' in renamed and 'id="mother_name_2" name="mother_name_2"' in renamed
+    assert renamed.replace("mother_name_2", "mother_name") == rows["Họ tên mẹ"]['markup']
+    print("✅ Rows cut per line and renamed")
+
+if __name__ == "__main__":
+    test_diff_fields()
+    test_splice_rows()
+    test_derived_specs()
+    test_rows_by_line()
+    print("\n🎉 All incremental update tests passed!")